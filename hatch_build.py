@@ -1,3 +1,4 @@
+import importlib.util
 from pathlib import Path
 from hatchling.metadata.plugin.interface import MetadataHookInterface
 from pymodaq_utils.resources.hatch_build_plugins import update_metadata_from_toml
@@ -5,6 +6,20 @@ from pymodaq_utils.resources.hatch_build_plugins import update_metadata_from_tom
 here = Path(__file__).absolute().parent
 
 
+def write_plugin_manifest(package_name: str):
+    """Generate the static manifest of the instrument plugins (see plugin_manifest.py), no plugin is imported"""
+    package_path = here.joinpath('src', package_name.replace('-', '_'))
+    manifest_module_path = package_path.joinpath('plugin_manifest.py')
+    if not manifest_module_path.is_file():
+        return
+    # loaded by path: importing the package itself would require pymodaq in the build environment
+    spec = importlib.util.spec_from_file_location('_plugin_manifest', manifest_module_path)
+    plugin_manifest = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(plugin_manifest)
+    plugin_manifest.write_manifest(package_path)
+
+
 class PluginInfoTomlHook(MetadataHookInterface):
     def update(self, metadata: dict) -> None:
         update_metadata_from_toml(metadata, here)
+        write_plugin_manifest(metadata['name'])
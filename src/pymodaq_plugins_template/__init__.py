@@ -3,7 +3,7 @@ from .utils import Config
 from pymodaq_utils.utils import get_version, PackageNotFoundError
 from pymodaq_utils.logger import set_logger, get_module_name
 
-config = Config()
+config = Config()  # shared by the plugin modules, the files are read at the first access of a value
 try:
     __version__ = get_version(__package__)
 except PackageNotFoundError:
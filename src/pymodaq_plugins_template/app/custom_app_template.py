@@ -1,16 +1,18 @@
+import numpy as np
 from qtpy import QtWidgets
 
+from pymodaq_data.data import DataToExport
 from pymodaq_gui import utils as gutils
 from pymodaq_utils.config import Config
 from pymodaq_utils.logger import set_logger, get_module_name
 
 # todo: replace here *pymodaq_plugins_template* by your plugin package name
-from pymodaq_plugins_template.utils import Config as PluginConfig
+from pymodaq_plugins_template import config as plugin_config  # shared and loaded at the first access
+from pymodaq_plugins_template.app.history_plot import HistoryPlot
 
 logger = set_logger(get_module_name(__file__))
 
 main_config = Config()
-plugin_config = PluginConfig()
 
 
 # todo: modify the name of this class to reflect its application and change the name in the main
@@ -24,6 +26,7 @@ class CustomAppTemplate(gutils.CustomApp):
 
     def __init__(self, parent: gutils.DockArea):
         super().__init__(parent)
+        self.history: HistoryPlot = None
 
         self.setup_ui()
 
@@ -37,6 +40,14 @@ class CustomAppTemplate(gutils.CustomApp):
         >>>self.docks['AnotherDock'] = gutils.Dock('AnotherDock name')
         >>>self.dockarea.addDock(self.docks['AnotherDock'''], 'bottom', self.docks['ADock'])
 
+        Long histories of readings (days at 10 Hz) are shown with a HistoryPlot, only drawing a downsample of the
+        visible range, fed with the update_history method
+
+        >>>self.history = HistoryPlot()
+        >>>self.docks['History'] = gutils.Dock('History')
+        >>>self.dockarea.addDock(self.docks['History'], 'bottom', self.docks['ADock'])
+        >>>self.docks['History'].addWidget(self.history.widget)
+
         See Also
         --------
         pyqtgraph.dockarea.Dock
@@ -104,6 +115,15 @@ class CustomAppTemplate(gutils.CustomApp):
         """
         pass
 
+    def update_history(self, dte: DataToExport):
+        """ Append the 0D readings of a DataToExport (for instance from a DAQ_Viewer grab_done_signal) to the
+        history plot, one curve per channel"""
+        if self.history is None:
+            return
+        for dwa in dte.get_data_from_dim('Data0D'):
+            for label, array in zip(dwa.labels, dwa):
+                self.history.extend(f'{dwa.name}/{label}', np.array([dwa.timestamp]), array[:1])
+
 
 def main():
     from pymodaq_gui.utils.utils import mkQApp
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Plot of long reading histories (days of readings at 10 Hz) keeping the user interface responsive
+
+The full history is kept in a :class:`HistoryStore`, growing numpy arrays completed with a pyramid of min/max levels
+(each bucket of a level holding the min and max of factor consecutive buckets of the level below) updated
+incrementally as readings are appended. The :class:`HistoryPlot` only draws a downsample of the visible x range,
+recomputed on zoom, pan and when readings are appended: the coarsest pyramid level still having a few points per
+pixel is read then downsampled to the plot width (Largest-Triangle-Three-Buckets or min/max), so that the cost of a
+redraw is bounded by the screen width and not by the length of the history.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pyqtgraph as pg
+from qtpy import QtCore
+
+from pymodaq_utils.logger import set_logger, get_module_name
+
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+from pymodaq_plugins_template.hardware.decimation import decimate, decimate_axis, lttb
+
+logger = set_logger(get_module_name(__file__))
+
+HISTORY_METHODS = ('lttb', 'min/max')
+
+
+class _Level:
+    """Min and max (and their abscissa) of consecutive buckets of the level below"""
+
+    def __init__(self, capacity: int):
+        self.x_min = np.empty((capacity,))
+        self.y_min = np.empty((capacity,))
+        self.x_max = np.empty((capacity,))
+        self.y_max = np.empty((capacity,))
+        self.size = 0
+
+    def append(self, x_min: np.ndarray, y_min: np.ndarray, x_max: np.ndarray, y_max: np.ndarray):
+        if self.size + len(x_min) > len(self.x_min):
+            capacity = max(2 * len(self.x_min), self.size + len(x_min))
+            for name in ('x_min', 'y_min', 'x_max', 'y_max'):
+                array = np.empty((capacity,))
+                array[:self.size] = getattr(self, name)[:self.size]
+                setattr(self, name, array)
+        for name, values in zip(('x_min', 'y_min', 'x_max', 'y_max'), (x_min, y_min, x_max, y_max)):
+            getattr(self, name)[self.size:self.size + len(values)] = values
+        self.size += len(x_min)
+
+    def points(self, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The min and max of the buckets start to stop as points ordered along x"""
+        x_min, x_max = self.x_min[start:stop], self.x_max[start:stop]
+        y_min, y_max = self.y_min[start:stop], self.y_max[start:stop]
+        min_first = x_min <= x_max
+        x = np.stack([np.where(min_first, x_min, x_max), np.where(min_first, x_max, x_min)], axis=1).ravel()
+        y = np.stack([np.where(min_first, y_min, y_max), np.where(min_first, y_max, y_min)], axis=1).ravel()
+        return x, y
+
+
+class HistoryStore:
+    """ Append-only store of (x, y) points with a min/max pyramid giving the overview of any range in bounded time
+
+    Parameters
+    ----------
+    capacity: int
+        Initial number of points, the arrays double in size when full
+    factor: int
+        Number of buckets of a level summarized by a bucket of the level above
+    dtype: np.dtype
+        Type of the stored y values, float32 halves the memory of long histories
+    """
+
+    def __init__(self, capacity: int = 4096, factor: int = 8, dtype=np.float64):
+        if factor < 2:
+            raise ValueError('The factor between the levels should be at least 2')
+        self.factor = factor
+        self._x = np.empty((capacity,))
+        self._y = np.empty((capacity,), dtype=dtype)
+        self._size = 0
+        self._levels: List[_Level] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def x(self) -> np.ndarray:
+        return self._x[:self._size]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._y[:self._size]
+
+    @property
+    def n_levels(self) -> int:
+        """Number of min/max levels above the raw points"""
+        return len(self._levels)
+
+    def clear(self):
+        self._size = 0
+        self._levels = []
+
+    def append(self, x: float, y: float):
+        self.extend(np.array([x]), np.array([y]))
+
+    def extend(self, x: np.ndarray, y: np.ndarray):
+        """ Append points, their x should be increasing and larger than the ones already stored (timestamps)"""
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(y))
+        if self._size + len(x) > len(self._x):
+            capacity = max(2 * len(self._x), self._size + len(x))
+            for name in ('_x', '_y'):
+                array = np.empty((capacity,), dtype=getattr(self, name).dtype)
+                array[:self._size] = getattr(self, name)[:self._size]
+                setattr(self, name, array)
+        self._x[self._size:self._size + len(x)] = x
+        self._y[self._size:self._size + len(x)] = y
+        self._size += len(x)
+        self._update_levels()
+
+    def _update_levels(self):
+        """Summarize the buckets completed by the last appended points, level by level"""
+        below_size = self._size
+        for index in range(len(self._levels) + 1):
+            done = self._levels[index].size if index < len(self._levels) else 0
+            complete = below_size // self.factor
+            if complete == done:
+                return
+            if index == len(self._levels):
+                self._levels.append(_Level(max(complete, 64)))
+            start, stop = done * self.factor, complete * self.factor
+            if index == 0:
+                x_min = x_max = self._x[start:stop].reshape((-1, self.factor))
+                y_min = y_max = self._y[start:stop].reshape((-1, self.factor))
+            else:
+                below = self._levels[index - 1]
+                x_min = below.x_min[start:stop].reshape((-1, self.factor))
+                y_min = below.y_min[start:stop].reshape((-1, self.factor))
+                x_max = below.x_max[start:stop].reshape((-1, self.factor))
+                y_max = below.y_max[start:stop].reshape((-1, self.factor))
+            rows = np.arange(len(y_min))
+            arg_min = np.argmin(y_min, axis=1)
+            arg_max = np.argmax(y_max, axis=1)
+            self._levels[index].append(x_min[rows, arg_min], y_min[rows, arg_min],
+                                       x_max[rows, arg_max], y_max[rows, arg_max])
+            below_size = self._levels[index].size
+
+    def _points(self, level: int, start: int, stop: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """Points summarizing the raw points start to stop: complete buckets of level, the ends from the levels below"""
+        if level == 0:
+            return [self._x[start:stop]], [self._y[start:stop]]
+        size = self.factor ** level
+        first = -(-start // size)
+        last = min(stop // size, self._levels[level - 1].size)
+        if first >= last:
+            return self._points(level - 1, start, stop)
+        x_head, y_head = self._points(level - 1, start, first * size)
+        x, y = self._levels[level - 1].points(first, last)
+        x_tail, y_tail = self._points(level - 1, last * size, stop)
+        return x_head + [x] + x_tail, y_head + [y] + y_tail
+
+    def view(self, x_min: float = -np.inf, x_max: float = np.inf, n_points: int = 1000,
+             method: str = 'lttb', oversampling: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+        """ Downsample of the points within [x_min, x_max] (and the ones just around to draw the curve up to the edges)
+
+        Parameters
+        ----------
+        x_min: float
+        x_max: float
+        n_points: int
+            Maximum number of points returned, typically the width of the plot in pixels
+        method: str
+            One of HISTORY_METHODS
+        oversampling: int
+            The downsample is computed from the coarsest level having at least this number of points per returned
+            point, the cost is bounded by n_points * oversampling whatever the range
+
+        Returns
+        -------
+        tuple of ndarray: x and y of the downsample
+        """
+        if method not in HISTORY_METHODS:
+            raise ValueError(f'Unknown downsampling method {method}, should be one of {HISTORY_METHODS}')
+        start = max(int(np.searchsorted(self.x, x_min, side='left')) - 1, 0)
+        stop = min(int(np.searchsorted(self.x, x_max, side='right')) + 1, self._size)
+        level = 0
+        while level < len(self._levels) and 2 * (stop - start) // self.factor ** (level + 1) >= \
+                n_points * oversampling:
+            level += 1
+        x, y = self._points(level, start, stop)
+        x = np.concatenate(x) if len(x) > 0 else np.empty((0,))
+        y = np.concatenate(y).astype(np.float64) if len(y) > 0 else np.empty((0,))
+        if len(x) <= n_points:
+            return x, y
+        if method == 'lttb':
+            indices = lttb(x, y, n_points)
+            return x[indices], y[indices]
+        return decimate_axis(x, n_points, 'min/max'), decimate(y, n_points, 'min/max')
+
+
+class HistoryPlot(QtCore.QObject):
+    """ Plot widget of named reading histories, only drawing the downsample of the visible x range
+
+    The downsample is recomputed (at most once per event loop iteration) when the x range changes (zoom, pan) and when
+    readings are appended. While the x axis is auto ranged, the whole history is shown.
+
+    Parameters
+    ----------
+    method: str
+        One of HISTORY_METHODS
+    oversampling: float
+        Number of drawn points per pixel of the plot width
+
+    Attributes
+    ----------
+    widget: pg.PlotWidget
+        To be added to a dock
+    stores: dict of HistoryStore
+        The full history of each curve
+    """
+
+    def __init__(self, method: str = 'lttb', oversampling: float = 1.):
+        super().__init__()
+        self.method = method
+        self.oversampling = oversampling
+        self.stores: Dict[str, HistoryStore] = {}
+        self._curves: Dict[str, pg.PlotDataItem] = {}
+
+        self.widget = pg.PlotWidget()
+        self.widget.addLegend()
+        self.widget.setAxisItems({'bottom': pg.DateAxisItem()})
+        self.view_box: pg.ViewBox = self.widget.getPlotItem().getViewBox()
+        self._refresh_timer = QtCore.QTimer()
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self.refresh)
+        self.view_box.sigXRangeChanged.connect(self._refresh_timer.start)
+        self.view_box.sigResized.connect(self._refresh_timer.start)
+
+    def add_curve(self, name: str, dtype=np.float64) -> HistoryStore:
+        if name not in self.stores:
+            self.stores[name] = HistoryStore(dtype=dtype)
+            pen = pg.intColor(len(self._curves))
+            self._curves[name] = self.widget.plot(name=name, pen=pen)
+        return self.stores[name]
+
+    def extend(self, name: str, x: np.ndarray, y: np.ndarray):
+        """Append readings (x being timestamps in seconds since the epoch) to the curve name, created if needed"""
+        self.add_curve(name).extend(x, y)
+        self._refresh_timer.start()
+
+    def append(self, name: str, x: float, y: float):
+        self.extend(name, np.array([x]), np.array([y]))
+
+    def clear(self):
+        for store in self.stores.values():
+            store.clear()
+        self.refresh()
+
+    def refresh(self):
+        """Draw the downsample of the visible x range of each curve"""
+        n_points = max(int(self.view_box.width() * self.oversampling), 100)
+        if self.view_box.autoRangeEnabled()[0]:
+            x_min, x_max = -np.inf, np.inf
+        else:
+            x_min, x_max = self.view_box.viewRange()[0]
+        for name, store in self.stores.items():
+            x, y = store.view(x_min, x_max, n_points, self.method)
+            self._curves[name].setData(x, y)
@@ -1,11 +1,25 @@
 
+import functools
+import time
 from typing import Union, List, Dict
 from pymodaq.control_modules.move_utility_classes import (DAQ_Move_base, comon_parameters_fun,
                                                           main, DataActuatorType, DataActuator)
+from pymodaq.control_modules.thread_commands import ThreadStatus
+from qtpy import QtCore
 
 from pymodaq_utils.utils import ThreadCommand  # object used to send info back to the main thread
 from pymodaq_gui.parameter import Parameter
 
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+from pymodaq_plugins_template.hardware.coalescer import TargetCoalescer
+from pymodaq_plugins_template.hardware.connection_pool import controller_pool
+from pymodaq_plugins_template.hardware.diagnostics import Diagnostics, diagnostics_params, DIAGNOSTICS_PARAMS
+from pymodaq_plugins_template.hardware.move_batch import MoveBatcher
+from pymodaq_plugins_template.hardware.move_completion import AdaptivePolling, COMPLETION_MODES
+from pymodaq_plugins_template.hardware.settings_batch import SettingsBatch, settings_batch_params
+from pymodaq_plugins_template.hardware.settling import SettlingDetector
+from pymodaq_plugins_template.hardware.unit_conversion import AxisConversion, DimensionalityError
+
 
 class PythonWrapperOfYourInstrument:
     #  TODO Replace this fake class with the import of the real python wrapper of your instrument
@@ -34,8 +48,31 @@ class DAQ_Move_Template(DAQ_Move_base):
     -----------
     controller: object
         The particular object that allow the communication with the hardware, in general a python wrapper around the
-         hardware library.
-         
+         hardware library. For a master, it is wrapped into a SharedLink serializing the requests of all the plugins
+         using the same port.
+    conversion: AxisConversion
+        Float conversions between the positions (axis units, scaled) and the controller values, used in place of the
+        pint based DataActuator conversions on each move and poll. Updated by update_conversion when the axis, the
+        units or the scaling change
+    settling: SettlingDetector
+        Rolling settling criterion fed with the values polled during a move, see user_condition_to_reach_target
+    coalescer: TargetCoalescer
+        Sender of the absolute targets while the targets are coalesced (link settings): while a command is in flight,
+        a newer target replaces the waiting one and only the latest is sent, relative moves being sent as absolute
+        targets. The overwritten targets are counted in the diagnostics
+    polling: AdaptivePolling
+        Interval between the polls of the actuator value in the 'Adaptive polling' completion mode. In the 'Events'
+        mode the actuator value is not polled: the move is done when the controller pushes a position within epsilon
+        of the target (see position_pushed)
+    batcher: MoveBatcher or None
+        While the moves are batched (link settings), the batcher shared by all the axes plugins of the controller: the
+        targets of the axes moved together (for instance by DAQ_Scan) are sent as a single command (see send_targets)
+        and the positions of the moving axes are read with a single query per poll (see read_positions), each plugin
+        ending its move when the batcher pushes its position within epsilon of its target
+    settings_batch: SettingsBatch
+        Collects the changes of the batched_settings over the settings window, to be applied together by
+        apply_settings (preset loading, spinbox dragging)
+
     # TODO add your particular attributes here if any
 
     """
@@ -48,8 +85,46 @@ class DAQ_Move_Template(DAQ_Move_base):
     data_actuator_type = DataActuatorType.DataActuator  # wether you use the new data style for actuator otherwise set this
     # as  DataActuatorType.float  (or entirely remove the line)
 
+    diagnosed_methods = ['move_abs', 'move_rel', 'get_actuator_value', 'commit_settings']  # timed by the diagnostics
+    diagnosed_counters = ['overwritten_targets']  # counted by the diagnostics
+    # TODO for your custom plugin: the settings applied to the controller, together, by apply_settings
+    batched_settings = ["a_parameter_you've_added_in_self.params"]
+    position_pushed_signal = QtCore.Signal(float, bool)  # emitted (from any thread) with the position and moving state
     params = [   # TODO for your custom plugin: elements to be added here as dicts in order to control your custom stage
-                ] + comon_parameters_fun(is_multiaxes, axis_names=_axis_names, epsilon=_epsilon)
+        {'title': 'Link:', 'name': 'link', 'type': 'group', 'children': [
+            {'title': 'Port:', 'name': 'port', 'type': 'str', 'value': '',
+             'tip': 'All plugins using the same port (empty: not shared) share a single connection'},
+            {'title': 'Address:', 'name': 'address', 'type': 'int', 'value': 0, 'min': 0,
+             'tip': 'Address of the instrument on a multidrop bus'},
+            {'title': 'Request timeout (s):', 'name': 'request_timeout', 'type': 'float', 'value': 1., 'min': 0.},
+            {'title': 'Coalesce targets:', 'name': 'coalesce', 'type': 'bool', 'value': False,
+             'tip': 'While a command is in flight, a newer target replaces the waiting one and only the latest is '
+                    'sent when the link is free (for setpoints issued faster than the controller takes them)'},
+            {'title': 'Batch moves:', 'name': 'batch_moves', 'type': 'bool', 'value': False,
+             'tip': 'The targets of the axes of this controller moved together are sent as a single command and their '
+                    'positions read with a single query'},
+            {'title': 'Batch window (ms):', 'name': 'batch_window', 'type': 'float', 'value': 5., 'min': 0.,
+             'tip': 'Time the targets of the other axes are waited for, unless all the batched axes have one'},
+        ]},
+        {'title': 'Move completion:', 'name': 'completion', 'type': 'group', 'children': [
+            {'title': 'Mode:', 'name': 'completion_mode', 'type': 'list', 'limits': list(COMPLETION_MODES),
+             'value': 'Polling',
+             'tip': 'Polling: fixed interval, Adaptive polling: backed off during long moves and short near the '
+                    'target, Events: no polling, the move is done when the controller pushes its position'},
+            {'title': 'Min interval (ms):', 'name': 'min_interval', 'type': 'float', 'value': 5., 'min': 1.},
+            {'title': 'Max interval (ms):', 'name': 'max_interval', 'type': 'float', 'value': 500., 'min': 1.},
+            {'title': 'Backoff:', 'name': 'backoff', 'type': 'float', 'value': 2., 'min': 1.},
+        ]},
+        {'title': 'Settling:', 'name': 'settling', 'type': 'group', 'children': [
+            {'title': 'Wait settled:', 'name': 'wait_settled', 'type': 'bool', 'value': False,
+             'tip': 'The move is done as soon as the polled values are settled (on top of the epsilon condition)'},
+            {'title': 'Window:', 'name': 'window', 'type': 'int', 'value': 5, 'min': 2,
+             'tip': 'Number of consecutive polled values the settling criterion is evaluated on'},
+            {'title': 'Max std:', 'name': 'max_std', 'type': 'float', 'value': 0.001, 'min': 0.},
+            {'title': 'Max slope (/s):', 'name': 'max_slope', 'type': 'float', 'value': 0.001, 'min': 0.},
+        ]},
+                ] + comon_parameters_fun(is_multiaxes, axis_names=_axis_names, epsilon=_epsilon) + \
+        settings_batch_params() + diagnostics_params(diagnosed_methods, diagnosed_counters)
     # _epsilon is the initial default value for the epsilon parameter allowing pymodaq to know if the controller reached
     # the target value. It is the developer responsibility to put here a meaningful value
 
@@ -59,7 +134,20 @@ class DAQ_Move_Template(DAQ_Move_base):
         self.controller: PythonWrapperOfYourInstrument = None
 
         #TODO declare here attributes you want/need to init with a default value
-        pass
+        self.update_settling()
+        self.conversion = AxisConversion(self.axis_unit)
+        self.diagnostics = Diagnostics(self, self.diagnosed_methods, self.settings, counters=self.diagnosed_counters)
+        self.coalescer = TargetCoalescer(self.send_target, self.send_target_failed, name=f'{self._title}_targets')
+        self.update_polling()
+        self._polling_interval = self.poll_timer.interval()  # the fixed interval from the pymodaq config
+        self._events_timer = QtCore.QTimer(self)  # timeout of a move in the 'Events' mode
+        self._events_timer.setSingleShot(True)
+        self._events_timer.timeout.connect(self.events_timeout)
+        self.position_pushed_signal.connect(self.position_pushed)  # queued to the plugin thread
+        self.batcher: MoveBatcher = None
+        self._batch_axis: str = None
+        self.settings_batch = SettingsBatch(self.apply_settings,
+                                            self.settings['settings_batch', 'settings_window'] / 1000, parent=self)
 
     def get_actuator_value(self):
         """Get the current value from the hardware with scaling conversion.
@@ -70,10 +158,29 @@ class DAQ_Move_Template(DAQ_Move_base):
         """
         ## TODO for your custom plugin
         raise NotImplementedError  # when writing your own plugin remove this line
-        pos = DataActuator(data=self.controller.your_method_to_get_the_actuator_value(),  # when writing your own plugin replace this line
-                           units=self.axis_unit)
-        pos = self.get_position_with_scaling(pos)
-        return pos
+        value = self.conversion.from_controller(
+            self.controller.your_method_to_get_the_actuator_value())  # when writing your own plugin replace this line
+        if self.settings['settling', 'wait_settled']:
+            self.settling.update(value)
+        return DataActuator(data=value, units=self.axis_unit)
+
+    def distance_to_target(self) -> float:
+        """Absolute difference between the current and the target values in axis units"""
+        current, target = self.current_value, self.target_value
+        return abs(self.conversion.to_axis(current.value(), current.units) -
+                   self.conversion.to_axis(target.value(), target.units))
+
+    def absolute_difference_condition_to_reach_target(self) -> bool:
+        """ As in DAQ_Move_base (the target is reached at epsilon) with the float conversions, evaluated at each poll
+
+        The current and target values are both converted to the axis units before their difference, so that offset
+        units (°C, °F) are handled whatever the axis units. Values whose units are not compatible with the axis ones
+        are handled by DAQ_Move_base.
+        """
+        try:
+            return self.distance_to_target() < self.epsilon
+        except DimensionalityError:
+            return super().absolute_difference_condition_to_reach_target()
 
     def user_condition_to_reach_target(self) -> bool:
         """ Implement a condition for exiting the polling mechanism and specifying that the
@@ -87,15 +194,20 @@ class DAQ_Move_Template(DAQ_Move_base):
         #  add here some other condition to be fullfilled either a completely new one or
         #  using or/and operations between the epsilon_bool and some other custom booleans
         #  for a usage example see DAQ_Move_brushlessMotor from the Thorlabs plugin
+        if self.settings['settling', 'wait_settled']:
+            # the move is done as soon as the window of polled values is settled, no fixed settling delay needed
+            return self.settling.settled
         return True
 
     def close(self):
         """Terminate the communication protocol"""
         ## TODO for your custom plugin
         raise NotImplementedError  # when writing your own plugin remove this line
+        self.settings_batch.discard()
+        self.coalescer.close()
+        self.leave_batch()
         if self.is_master:
-            #  self.controller.your_method_to_terminate_the_communication()  # when writing your own plugin replace this line
-            ...
+            controller_pool.release(self.controller)  # the communication is terminated when no plugin uses it anymore
 
     def commit_settings(self, param: Parameter):
         """Apply the consequences of a change of value in the detector settings
@@ -106,17 +218,59 @@ class DAQ_Move_Template(DAQ_Move_base):
             A given parameter (within detector_settings) whose value has been changed by the user
         """
         ## TODO for your custom plugin
-        if param.name() == 'axis':
+        if param.name() in self.batched_settings:
+            self.settings_batch.submit(param)  # applied with the other changes of the window by apply_settings
+        elif param.name() == 'settings_window':
+            self.settings_batch.window = param.value() / 1000
+        elif param.name() in DIAGNOSTICS_PARAMS:
+            self.diagnostics.commit_settings(param)
+        elif param.name() == 'axis':
             self.axis_unit = self.controller.your_method_to_get_correct_axis_unit()
             # do this only if you can and if the units are not known beforehand, for instance
             # if the motors connected to the controller are of different type (mm, µm, nm, , etc...)
             # see BrushlessDCMotor from the thorlabs plugin for an exemple
-
-        elif param.name() == "a_parameter_you've_added_in_self.params":
-           self.controller.your_method_to_apply_this_param_change()
+            self.update_conversion()
+            if self.batcher is not None:
+                self.join_batch()  # as the new axis
+
+        elif param.name() in ('units', 'use_scaling', 'scaling', 'offset'):
+            self.update_conversion()
+        elif param.name() == 'request_timeout':
+            self.controller.timeout = param.value()
+        elif param.name() == 'coalesce' and not param.value():
+            self.coalescer.wait(self.settings['link', 'request_timeout'])  # the waiting target is still sent
+        elif param.name() == 'batch_moves':
+            self.join_batch() if param.value() else self.leave_batch()
+        elif param.name() == 'batch_window' and self.batcher is not None:
+            self.batcher.window = param.value() / 1000
+        elif param.name() in ('min_interval', 'max_interval'):
+            setattr(self.polling, param.name(), param.value() / 1000)
+        elif param.name() == 'backoff':
+            self.polling.backoff = param.value()
+        elif param.name() == 'window':
+            self.update_settling()
+        elif param.name() in ('max_std', 'max_slope'):
+            setattr(self.settling, param.name(), param.value())
         else:
             pass
 
+    def apply_settings(self, params: List[Parameter]):
+        """ Apply a batch of changed settings to the controller as one transaction
+
+        Called between two moves: a move applies the pending changes before being sent.
+
+        Parameters
+        ----------
+        params: list of Parameter
+            The batched_settings changed within the settings window, in the order of their first change, each to be
+            applied with its current (last) value
+        """
+        ## TODO for your custom plugin
+        for param in params:
+            if param.name() == "a_parameter_you've_added_in_self.params":
+                self.controller.your_method_to_apply_this_param_change()
+            #elif ...
+
     def ini_stage(self, controller=None):
         """Actuator communication initialization
 
@@ -132,8 +286,20 @@ class DAQ_Move_Template(DAQ_Move_base):
             False if initialization failed otherwise True
         """
         raise NotImplementedError  # TODO when writing your own plugin remove this line and modify the ones below
+        self.update_conversion()
+        self.update_settling()
+        self.update_polling()
+        self.diagnostics.update_from_settings()
         if self.is_master:  # is needed when controller is master
-            self.controller = PythonWrapperOfYourInstrument(arg1, arg2, ...) #  arguments for instantiation!)
+            # all the plugins using this port share one link serializing their requests, an already opened one
+            # (by another plugin or a previous initialization) is reused without opening the port again
+            self.controller = controller_pool.acquire(
+                self.settings['link', 'port'],
+                lambda: PythonWrapperOfYourInstrument(arg1, arg2, ...),  #  arguments for instantiation!)
+                lambda controller: controller.your_method_to_terminate_the_communication(),  # replace this line
+                timeout=self.settings['link', 'request_timeout'], wrapper=PythonWrapperOfYourInstrument,
+                address=self.settings['link', 'address'],  # todo: None if your controller is not on a multidrop bus
+                select_address=lambda controller, address: controller.your_method_to_select_the_address(address))
             initialized = self.controller.a_method_or_atttribute_to_check_if_init()  # todo
             # todo: enter here whatever is needed for your controller initialization and eventual
             #  opening of the communication channel
@@ -141,6 +307,13 @@ class DAQ_Move_Template(DAQ_Move_base):
             self.controller = controller
             initialized = True
 
+        # todo: if your controller pushes its position or status (events, callbacks, status frames), have it call
+        #  this with the position in controller units and whether the actuator is still moving, for the 'Events'
+        #  completion mode, else remove this line
+        self.controller.your_method_to_register_a_position_callback(self.position_pushed_signal.emit)
+        if self.settings['link', 'batch_moves']:
+            self.join_batch()
+
         info = "Whatever info you want to log"
         return info, initialized
 
@@ -152,12 +325,20 @@ class DAQ_Move_Template(DAQ_Move_base):
         value: (float) value of the absolute target positioning
         """
 
+        self.settings_batch.flush()  # the move uses the settings changed just before
         value = self.check_bound(value)  #if user checked bounds, the defined bounds are applied here
         self.target_value = value
-        value = self.set_position_with_scaling(value)  # apply scaling if the user specified one
+        target = self.conversion.to_controller(value.value(), value.units)  # apply scaling if the user specified one
+        self.settling.reset()
+        if self.batcher is not None:
+            self.batcher.submit(self._batch_axis, target, self.controller_epsilon(), self.settings['timeout'])
+            return
+        if self.settings['link', 'coalesce']:
+            self.coalesce(target)
+            return
         ## TODO for your custom plugin
         raise NotImplementedError  # when writing your own plugin remove this line
-        self.controller.your_method_to_set_an_absolute_value(value.value(self.axis_unit))  # when writing your own plugin replace this line
+        self.controller.your_method_to_set_an_absolute_value(target)  # when writing your own plugin replace this line
         self.emit_status(ThreadCommand('Update_Status', ['Some info you want to log']))
 
     def move_rel(self, value: DataActuator):
@@ -167,17 +348,152 @@ class DAQ_Move_Template(DAQ_Move_base):
         ----------
         value: (float) value of the relative target positioning
         """
-        value = self.check_bound(self.current_position + value) - self.current_position
-        self.target_value = value + self.current_position
-        value = self.set_position_relative_with_scaling(value)
+        self.settings_batch.flush()  # the move uses the settings changed just before
+        current_value = self.current_value
+        current = self.conversion.to_axis(current_value.value(), current_value.units)
+        target = current + self.conversion.relative_to_axis(value.value(), value.units)  # a delta: no offset
+        if self.settings['bounds', 'is_bounds']:  # as check_bound, with floats
+            bounded = min(max(target, self.settings['bounds', 'min_bound']), self.settings['bounds', 'max_bound'])
+            if bounded != target:
+                self.emit_status(ThreadCommand('outofbounds'))
+                target = bounded
+        self.target_value = DataActuator(data=target, units=self.axis_unit)
+        self.settling.reset()
+        # sent as an absolute target, so that it can replace (or be replaced by) the waiting one
+        if self.batcher is not None:
+            self.batcher.submit(self._batch_axis, self.conversion.to_controller(target), self.controller_epsilon(),
+                                self.settings['timeout'])
+            return
+        if self.settings['link', 'coalesce']:
+            self.coalesce(self.conversion.to_controller(target))
+            return
+        relative = self.conversion.relative_to_controller(target - current)
 
         ## TODO for your custom plugin
         raise NotImplementedError  # when writing your own plugin remove this line
-        self.controller.your_method_to_set_a_relative_value(value.value(self.axis_unit))  # when writing your own plugin replace this line
+        self.controller.your_method_to_set_a_relative_value(relative)  # when writing your own plugin replace this line
         self.emit_status(ThreadCommand('Update_Status', ['Some info you want to log']))
 
+    def coalesce(self, value: float):
+        """Send the absolute target (controller units) once the link is free, replacing the waiting target"""
+        if self.coalescer.submit(value):
+            self.diagnostics.count('overwritten_targets')
+
+    def send_target(self, value: float):
+        """Send an absolute target in controller units, called from the coalescer thread"""
+        ## TODO for your custom plugin
+        self.controller.your_method_to_set_an_absolute_value(value)  # when writing your own plugin replace this line
+
+    def send_target_failed(self, error: Exception):
+        self.emit_status(ThreadCommand('Update_Status', [f'The target could not be sent: {error}', 'log']))
+
+    def join_batch(self):
+        """Share the move batcher of the controller with the other axes plugins (master and slaves)"""
+        self.leave_batch()
+        self.batcher = MoveBatcher.shared(self.controller, functools.partial(self.send_targets, self.controller),
+                                          functools.partial(self.read_positions, self.controller),
+                                          window=self.settings['link', 'batch_window'] / 1000,
+                                          on_error=self.send_target_failed)
+        self._batch_axis = self.axis_name
+        self.batcher.join(self._batch_axis, self.position_pushed_signal.emit)
+
+    def leave_batch(self):
+        if self.batcher is not None:
+            self.batcher.leave(self._batch_axis)
+            self.batcher = None
+
+    def controller_epsilon(self) -> float:
+        """The epsilon in controller units"""
+        return abs(self.conversion.relative_to_controller(self.epsilon))
+
+    def update_settling(self):
+        """Build the settling detector from the settling settings, including the ones loaded from a preset"""
+        self.settling = SettlingDetector(self.settings['settling', 'window'], self.settings['settling', 'max_std'],
+                                         self.settings['settling', 'max_slope'])
+
+    def update_polling(self):
+        """Build the adaptive polling from the completion settings, including the ones loaded from a preset"""
+        self.polling = AdaptivePolling(self.settings['completion', 'min_interval'] / 1000,
+                                       self.settings['completion', 'max_interval'] / 1000,
+                                       self.settings['completion', 'backoff'])
+
+    def update_conversion(self):
+        """Precompute the conversions of the current axis, to be called when its units or the scaling change"""
+        if self.settings['scaling', 'use_scaling']:
+            self.conversion = AxisConversion(self.axis_unit, self.settings['scaling', 'scaling'],
+                                             self.settings['scaling', 'offset'])
+        else:
+            self.conversion = AxisConversion(self.axis_unit)
+
+    @staticmethod
+    def send_targets(controller: PythonWrapperOfYourInstrument, targets: Dict[str, float]):
+        """ Send the absolute targets (controller units) of several axes, called from the move batcher thread
+
+        Parameters
+        ----------
+        controller: PythonWrapperOfYourInstrument
+            The controller shared by the axes
+        targets: dict
+            The target of each axis name
+        """
+        ## TODO for your custom plugin: a single command if the protocol allows it, else one command per axis
+        controller.your_method_to_set_several_absolute_values(targets)  # when writing your own plugin replace this line
+
+    @staticmethod
+    def read_positions(controller: PythonWrapperOfYourInstrument, axes: List[str]) -> Dict[str, float]:
+        """ Read the positions (controller units) of several axes, called from the move batcher thread
+
+        Returns
+        -------
+        dict: the position of each axis name
+        """
+        ## TODO for your custom plugin: a single query if the protocol allows it, else one query per axis
+        return controller.your_method_to_get_several_actuator_values(axes)  # when writing your plugin replace this line
+
+    def poll_moving(self):
+        """Start the detection of the end of the move depending on the completion mode"""
+        if not self.ispolling:  # the move is done at once
+            super().poll_moving()
+            return
+        mode = self.settings['completion', 'completion_mode']
+        if mode == 'Events' or self.batcher is not None:  # the positions are pushed
+            self.start_time = time.perf_counter()
+            self._events_timer.start(int(self.settings['timeout'] * 1000))
+            return
+        self.poll_timer.setInterval(int(self.polling.start() * 1000) if mode == 'Adaptive polling' else
+                                    self._polling_interval)
+        super().poll_moving()
+
+    def check_target_reached(self):
+        super().check_target_reached()
+        if self.settings['completion', 'completion_mode'] == 'Adaptive polling' and self.poll_timer.isActive():
+            distance = self.distance_to_target()
+            self.poll_timer.setInterval(max(int(self.polling.next_interval(distance, self.epsilon) * 1000), 1))
+
+    def position_pushed(self, value: float, moving: bool):
+        """ Position (in controller units) pushed by the controller (or by the batcher), ends the move in the 'Events'
+        completion mode (or while the moves are batched) if the actuator stopped within epsilon of the target"""
+        if self.move_is_done or (self.settings['completion', 'completion_mode'] != 'Events' and self.batcher is None):
+            return
+        value = self.conversion.from_controller(value)
+        if self.settings['settling', 'wait_settled']:
+            self.settling.update(value)
+        position = DataActuator(data=value, units=self.axis_unit)
+        self.current_value = position
+        if not moving and self._condition_to_reach_target():
+            self._events_timer.stop()
+            self.move_done(position)
+        else:
+            self.emit_value(position)
+
+    def events_timeout(self):
+        if not self.move_is_done:
+            self.emit_status(ThreadCommand(ThreadStatus.RAISE_TIMEOUT))
+
     def move_home(self):
         """Call the reference method of the controller"""
+        self.settings_batch.flush()
+        self.settling.reset()
 
         ## TODO for your custom plugin
         raise NotImplementedError  # when writing your own plugin remove this line
@@ -187,6 +503,7 @@ class DAQ_Move_Template(DAQ_Move_base):
     def stop_motion(self):
         """Stop the actuator and emits move_done signal"""
 
+        self.coalescer.discard()
         ## TODO for your custom plugin
         raise NotImplementedError  # when writing your own plugin remove this line
         self.controller.your_method_to_stop_positioning()  # when writing your own plugin replace this line
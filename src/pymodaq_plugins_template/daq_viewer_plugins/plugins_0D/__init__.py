@@ -1,13 +1,16 @@
-import importlib
 from pathlib import Path
 from ... import set_logger
+from ...utils import PluginRegistry
 logger = set_logger('viewer0D_plugins', add_to_console=False)
 
-for path in Path(__file__).parent.iterdir():
-    try:
-        if '__init__' not in str(path):
-            importlib.import_module('.' + path.stem, __package__)
-    except Exception as e:
-        logger.warning("{:} plugin couldn't be loaded due to some missing packages or errors: {:}".format(path.stem, str(e)))
-        pass
+path = Path(__file__)  # pymodaq looks for the plugins in path.parent
+registry = PluginRegistry(__package__, path.parent, logger)
 
+
+def __getattr__(name: str):
+    """Plugin modules are only imported when first accessed"""
+    return registry.load(name)
+
+
+def __dir__():
+    return sorted(list(globals()) + registry.names)
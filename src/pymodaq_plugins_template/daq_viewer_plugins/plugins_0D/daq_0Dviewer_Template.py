@@ -1,3 +1,6 @@
+import time
+from typing import List
+
 import numpy as np
 
 from pymodaq_utils.utils import ThreadCommand
@@ -7,8 +10,21 @@ from pymodaq_gui.parameter import Parameter
 from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, comon_parameters, main
 from pymodaq.utils.data import DataFromPlugins
 
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+from pymodaq_plugins_template.exporters.ring_recorder import RingRecorder
+from pymodaq_plugins_template.hardware.connection_pool import controller_pool
+from pymodaq_plugins_template.hardware.diagnostics import Diagnostics, diagnostics_params, DIAGNOSTICS_PARAMS
+from pymodaq_plugins_template.hardware.decimation import DisplayDecimator, DECIMATION_METHODS
+from pymodaq_plugins_template.hardware.frame_decoder import FrameDecoder, FRAME_DTYPE
+from pymodaq_plugins_template.hardware.ring_buffer import RingBuffer
+from pymodaq_plugins_template.hardware.settings_batch import SettingsBatch, settings_batch_params
+from pymodaq_plugins_template.hardware.settling import SettlingDetector
+from pymodaq_plugins_template.hardware.stream_reader import StreamReader
+
 class PythonWrapperOfYourInstrument:
     #  TODO Replace this fake class with the import of the real python wrapper of your instrument
+    #   for a balance speaking the frame protocol, see hardware.balance.Balance that can be tried without the
+    #   instrument against hardware.simulator.BalanceSimulator
     pass
 
 # TODO:
@@ -35,14 +51,75 @@ class DAQ_0DViewer_Template(DAQ_Viewer_base):
     -----------
     controller: object
         The particular object that allow the communication with the hardware, in general a python wrapper around the
-         hardware library.
+         hardware library. For a master, it is wrapped into a SharedLink serializing the requests of all the plugins
+         using the same port.
          
+    decoder: FrameDecoder
+        Bulk decoder of the ASCII frames received from the instrument
+    ring_buffer: RingBuffer
+        In continuous mode, preallocated buffer filled by the reader thread with the decoded readings (FRAME_DTYPE)
+    reader: StreamReader
+        In continuous mode, thread reading the instrument output stream
+    decimator: DisplayDecimator
+        If display decimation is enabled, accumulates the readings between two refreshes of the live display
+    settling: SettlingDetector
+        Rolling settling criterion fed with every reading, its state is emitted in the settled channel
+    recorder: RingRecorder
+        If recording is enabled, memory-mapped ring file every raw reading is stored into as soon as received, to be
+        recovered after a crash
+    settings_batch: SettingsBatch
+        Collects the changes of the batched_settings over the settings window, to be applied together by
+        apply_settings (preset loading, spinbox dragging)
+
     # TODO add your particular attributes here if any
 
     """
+    hardware_averaging = True  # Naverage readings are reduced in the plugin and emitted once, see emit_average
+    diagnosed_methods = ['grab_data', 'callback', 'commit_settings']  # timed by the diagnostics
+    # TODO for your custom plugin: the settings applied to the controller, together, by apply_settings
+    batched_settings = ['acquisition_mode', 'buffer_size', "a_parameter_you've_added_in_self.params"]
     params = comon_parameters+[
         ## TODO for your custom plugin: elements to be added here as dicts in order to control your custom stage
-        ]
+        {'title': 'Link:', 'name': 'link', 'type': 'group', 'children': [
+            {'title': 'Port:', 'name': 'port', 'type': 'str', 'value': '',
+             'tip': 'All plugins using the same port (empty: not shared) share a single connection'},
+            {'title': 'Address:', 'name': 'address', 'type': 'int', 'value': 0, 'min': 0,
+             'tip': 'Address of the instrument on a multidrop bus'},
+            {'title': 'Request timeout (s):', 'name': 'request_timeout', 'type': 'float', 'value': 1., 'min': 0.},
+        ]},
+        {'title': 'Acquisition mode:', 'name': 'acquisition_mode', 'type': 'list', 'limits': ['Snap', 'Continuous'],
+         'value': 'Continuous',
+         'tip': 'Snap: one request/response per grab. Continuous: the instrument streams its readings into a buffer'},
+        {'title': 'Streaming:', 'name': 'streaming', 'type': 'group', 'children': [
+            {'title': 'Buffer size:', 'name': 'buffer_size', 'type': 'int', 'value': 10000, 'min': 1},
+            {'title': 'Grab timeout (ms):', 'name': 'grab_timeout', 'type': 'int', 'value': 1000, 'min': 0},
+        ]},
+        {'title': 'Settling:', 'name': 'settling', 'type': 'group', 'children': [
+            {'title': 'Window:', 'name': 'window', 'type': 'int', 'value': 20, 'min': 2,
+             'tip': 'Number of consecutive readings the settling criterion is evaluated on'},
+            {'title': 'Max std:', 'name': 'max_std', 'type': 'float', 'value': 0.001, 'min': 0.},
+            {'title': 'Max slope (/s):', 'name': 'max_slope', 'type': 'float', 'value': 0.001, 'min': 0.},
+            {'title': 'Wait settled:', 'name': 'wait_settled', 'type': 'bool', 'value': False,
+             'tip': 'In continuous mode, each grab (for instance after a scan step) restarts the settling window and '
+                    'is emitted as soon as the new readings are settled, instead of after a fixed delay'},
+            {'title': 'Settle timeout (ms):', 'name': 'settle_timeout', 'type': 'int', 'value': 10000, 'min': 0},
+        ]},
+        {'title': 'Recorder:', 'name': 'recorder', 'type': 'group', 'children': [
+            {'title': 'Record:', 'name': 'record', 'type': 'bool', 'value': False,
+             'tip': 'Store every raw reading into a memory-mapped ring file that can be replayed after a crash'},
+            {'title': 'File:', 'name': 'record_file', 'type': 'browsepath', 'value': '', 'filetype': True,
+             'tip': '<plugin class>.ring if empty, an existing ring file is reopened and the recording goes on'},
+            {'title': 'Capacity:', 'name': 'record_capacity', 'type': 'int', 'value': 3_600_000, 'min': 1,
+             'tip': 'Number of readings kept when creating the file, 24 bytes each (one hour at 1 kHz)'},
+        ]},
+        {'title': 'Display:', 'name': 'display', 'type': 'group', 'children': [
+            {'title': 'Decimate:', 'name': 'decimate', 'type': 'bool', 'value': False,
+             'tip': 'Save the full-rate data but send a decimated copy to the live display at the refresh rate'},
+            {'title': 'Refresh rate (Hz):', 'name': 'refresh_rate', 'type': 'float', 'value': 10., 'min': 0.1},
+            {'title': 'Method:', 'name': 'method', 'type': 'list', 'limits': list(DECIMATION_METHODS),
+             'value': 'min/max'},
+        ]},
+        ] + settings_batch_params() + diagnostics_params(diagnosed_methods)
 
     def ini_attributes(self):
         #  TODO declare the type of the wrapper (and assign it to self.controller) you're going to use for easy
@@ -50,7 +127,16 @@ class DAQ_0DViewer_Template(DAQ_Viewer_base):
         self.controller: PythonWrapperOfYourInstrument = None
 
         #TODO declare here attributes you want/need to init with a default value
-        pass
+        self.decoder = FrameDecoder()
+        self.ring_buffer: RingBuffer = None
+        self.reader: StreamReader = None
+        self._n_average = 1
+        self.update_decimator()
+        self.update_settling()
+        self.recorder: RingRecorder = None
+        self.diagnostics = Diagnostics(self, self.diagnosed_methods, self.settings)
+        self.settings_batch = SettingsBatch(self.apply_settings,
+                                            self.settings['settings_batch', 'settings_window'] / 1000, parent=self)
 
     def commit_settings(self, param: Parameter):
         """Apply the consequences of a change of value in the detector settings
@@ -61,11 +147,97 @@ class DAQ_0DViewer_Template(DAQ_Viewer_base):
             A given parameter (within detector_settings) whose value has been changed by the user
         """
         ## TODO for your custom plugin
-        if param.name() == "a_parameter_you've_added_in_self.params":
-           self.controller.your_method_to_apply_this_param_change()  # when writing your own plugin replace this line
+        if param.name() in self.batched_settings:
+            self.settings_batch.submit(param)  # applied with the other changes of the window by apply_settings
+        elif param.name() == 'settings_window':
+            self.settings_batch.window = param.value() / 1000
+        elif param.name() in DIAGNOSTICS_PARAMS:
+            self.diagnostics.commit_settings(param)
+        elif param.name() == 'request_timeout':
+            self.controller.timeout = param.value()
+        elif param.name() == 'window':
+            self.update_settling()
+        elif param.name() in ('max_std', 'max_slope'):
+            setattr(self.settling, param.name(), param.value())
+        elif param.name() in ('record', 'record_file', 'record_capacity'):
+            self.open_recorder()
+        elif param.name() in ('refresh_rate', 'method'):
+            setattr(self.decimator, param.name(), param.value())
+            self.decimator.force_refresh()
 #        elif ...
         ##
 
+    def apply_settings(self, params: List[Parameter]):
+        """ Apply a batch of changed settings to the controller as one transaction
+
+        The instrument continuous output is stopped once for the whole batch and restarted (with the last buffer size)
+        if the acquisition mode is still continuous.
+
+        Parameters
+        ----------
+        params: list of Parameter
+            The batched_settings changed within the settings window, in the order of their first change, each to be
+            applied with its current (last) value
+        """
+        ## TODO for your custom plugin
+        self.stop_streaming()
+        try:
+            for param in params:
+                if param.name() == "a_parameter_you've_added_in_self.params":
+                    self.controller.your_method_to_apply_this_param_change()  # replace this line
+#                elif ...
+        finally:
+            if self.settings['acquisition_mode'] == 'Continuous':
+                self.start_streaming()
+        ##
+
+    def start_streaming(self):
+        """Put the instrument in continuous output mode once and start the thread filling the ring buffer"""
+        self.stop_streaming()
+        self.ring_buffer = RingBuffer(self.settings['streaming', 'buffer_size'], dtype=FRAME_DTYPE)
+        self.decoder.reset()
+        # TODO for your custom plugin: the read method should block at most a short time (serial timeout) and
+        #  return the bytes received since its last call
+        self.controller.your_method_to_start_continuous_output()  # when writing your own plugin replace this line
+
+        def read() -> np.ndarray:
+            readings = self.decoder.decode(self.controller.your_method_to_read_the_output_stream())  # replace this line
+            self.record(readings)  # persisted as soon as received, whether grabbed or not
+            return readings
+        self.reader = StreamReader(read, self.ring_buffer)
+        self.reader.start()
+
+    def stop_streaming(self):
+        """Stop the reader thread and the instrument continuous output mode"""
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+            self.controller.your_method_to_stop_continuous_output()  # when writing your own plugin replace this line
+
+    def update_settling(self):
+        """Build the settling detector from the settling settings, including the ones loaded from a preset"""
+        self.settling = SettlingDetector(self.settings['settling', 'window'], self.settings['settling', 'max_std'],
+                                         self.settings['settling', 'max_slope'])
+
+    def update_decimator(self):
+        """Build the display decimator from the display settings, including the ones loaded from a preset"""
+        self.decimator = DisplayDecimator(self.settings['display', 'refresh_rate'], self.settings['display', 'method'])
+
+    def open_recorder(self):
+        """(Re)open the ring recorder file following the recorder settings, or close it if recording is disabled"""
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+        if self.settings['recorder', 'record']:
+            self.recorder = RingRecorder(self.settings['recorder', 'record_file'] or f'{type(self).__name__}.ring',
+                                         capacity=self.settings['recorder', 'record_capacity'])
+
+    def record(self, readings: np.ndarray, timestamps: np.ndarray = None):
+        """Store raw readings (FRAME_DTYPE) in the ring recorder file, if recording"""
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.extend(readings, timestamps)
+
     def ini_detector(self, controller=None):
         """Detector communication initialization
 
@@ -84,19 +256,38 @@ class DAQ_0DViewer_Template(DAQ_Viewer_base):
 
         raise NotImplementedError  # TODO when writing your own plugin remove this line and modify the one below
         if self.is_master:
-            self.controller = PythonWrapperOfYourInstrument()  #instantiate you driver with whatever arguments are needed
-            self.controller.open_communication() # call eventual methods
+            def open_instrument():
+                instrument = PythonWrapperOfYourInstrument()  #instantiate you driver with whatever arguments are needed
+                instrument.open_communication() # call eventual methods
+                return instrument
+
+            # all the plugins using this port (for instance several balances on a multidrop bus) share one link
+            # serializing their requests, an already opened one is reused without opening the port again
+            self.controller = controller_pool.acquire(
+                self.settings['link', 'port'], open_instrument,
+                lambda instrument: instrument.your_method_to_terminate_the_communication(),  # replace this line
+                timeout=self.settings['link', 'request_timeout'], wrapper=PythonWrapperOfYourInstrument,
+                address=self.settings['link', 'address'],  # TODO None if your instrument is not on a multidrop bus
+                select_address=lambda instrument, address: instrument.your_method_to_select_the_address(address))
             initialized = self.controller.a_method_or_atttribute_to_check_if_init()  # TODO
         else:
             self.controller = controller
             initialized = True
 
+        self.update_settling()
+        self.update_decimator()
+        self.diagnostics.update_from_settings()
+        self.open_recorder()
+        if self.settings['acquisition_mode'] == 'Continuous':
+            self.start_streaming()
+
         # TODO for your custom plugin (optional) initialize viewers panel with the future type of data
         self.dte_signal_temp.emit(DataToExport(name='myplugin',
                                                data=[DataFromPlugins(name='Mock1',
-                                                                    data=[np.array([0]), np.array([0])],
+                                                                    data=[np.array([0]), np.array([0]),
+                                                                          np.array([0]), np.array([0])],
                                                                     dim='Data0D',
-                                                                    labels=['Mock1', 'label2'])]))
+                                                                    labels=['Mock1', 'std', 'stable', 'settled'])]))
 
         info = "Whatever info you want to log"
         return info, initialized
@@ -105,9 +296,13 @@ class DAQ_0DViewer_Template(DAQ_Viewer_base):
         """Terminate the communication protocol"""
         ## TODO for your custom plugin
         raise NotImplementedError  # when writing your own plugin remove this line
+        self.settings_batch.discard()
+        self.stop_streaming()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
         if self.is_master:
-            #  self.controller.your_method_to_terminate_the_communication()  # when writing your own plugin replace this line
-            ...
+            controller_pool.release(self.controller)  # the communication is terminated when no plugin uses it anymore
 
     def grab_data(self, Naverage=1, **kwargs):
         """Start a grab from the detector
@@ -120,14 +315,28 @@ class DAQ_0DViewer_Template(DAQ_Viewer_base):
         kwargs: dict
             others optionals arguments
         """
+        self._n_average = Naverage
+        self.settings_batch.flush()  # the grab uses the settings changed just before
+        # continuous version: the reader thread is already filling the ring buffer, just wait for the readings and
+        # drain the buffer, the grab latency doesn't depend on the serial round-trip anymore
+        if self.reader is not None:
+            if self.settings['settling', 'wait_settled'] and not self.wait_settled():
+                self.emit_status(ThreadCommand('Update_Status', ['Readings not settled before the settle timeout']))
+            if not self.ring_buffer.wait(Naverage,
+                                         timeout=Naverage * self.settings['streaming', 'grab_timeout'] / 1000):
+                self.emit_status(ThreadCommand('Update_Status', ['No reading received from the instrument stream']))
+            self.callback()  # always emits (the readings received, if any), else the live grab would stop
+            return
+
         ## TODO for your custom plugin: you should choose EITHER the synchrone or the asynchrone version following
 
         # synchrone version (blocking function)
         raise NotImplementedError  # when writing your own plugin remove this line
-        data_tot = self.controller.your_method_to_start_a_grab_snap()
-        self.dte_signal.emit(DataToExport(name='myplugin',
-                                          data=[DataFromPlugins(name='Mock1', data=data_tot,
-                                                                dim='Data0D', labels=['dat0', 'data1'])]))
+        readings = np.concatenate([self.decoder.decode(self.controller.your_method_to_start_a_grab_snap())
+                                   for _ in range(Naverage)])  # when writing your own plugin replace this line
+        self.record(readings)
+        self.settling.extend(readings['value'])
+        self.emit_average(readings)
         #########################################################
 
         # asynchrone version (non-blocking function with callback)
@@ -138,15 +347,67 @@ class DAQ_0DViewer_Template(DAQ_Viewer_base):
 
     def callback(self):
         """optional asynchrone method called when the detector has finished its acquisition of data"""
-        data_tot = self.controller.your_method_to_get_data_from_buffer()
-        self.dte_signal.emit(DataToExport(name='myplugin',
-                                          data=[DataFromPlugins(name='Mock1', data=data_tot,
-                                                                dim='Data0D', labels=['dat0', 'data1'])]))
+        timestamps = None
+        if self.reader is not None:
+            readings, timestamps = self.ring_buffer.drain()
+        else:
+            # all the frames received are decoded at once, one vectorized pass instead of a python loop per line
+            readings = self.decoder.decode(self.controller.your_method_to_get_data_from_buffer())  # replace this line
+            self.record(readings)  # in continuous mode, already recorded by the reader thread
+        self.settling.extend(readings['value'], timestamps)  # every reading goes through the settling criterion
+        self.emit_average(readings[-self._n_average:])
+
+    def wait_settled(self) -> bool:
+        """ Restart the settling window and consume the incoming readings until they are settled
+
+        Returns
+        -------
+        bool: False if the readings were not settled before the settle timeout
+        """
+        self.ring_buffer.clear()  # readings older than the grab (for instance before an actuator move) are discarded
+        self.settling.reset()
+        deadline = time.perf_counter() + self.settings['settling', 'settle_timeout'] / 1000
+        while not self.settling.settled:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not self.ring_buffer.wait(1, timeout=remaining):
+                return False
+            readings, timestamps = self.ring_buffer.drain()
+            self.settling.extend(readings['value'], timestamps)
+        return True
+
+    def emit_average(self, readings: np.ndarray):
+        """ Emit the mean, standard deviation, stability and settling state of a set of readings (FRAME_DTYPE) as a
+        single Data0D
+
+        Without readings (the stream timed out), nan is emitted as not stable and not settled, so that the viewer
+        still gets data and grabs again.
+        """
+        values = readings['value']
+        received = len(values) > 0
+        decimate = self.settings['display', 'decimate']
+        dte = DataToExport(name='myplugin',
+                           data=[DataFromPlugins(name='Mock1',
+                                                 data=[np.array([values.mean() if received else np.nan]),
+                                                       np.array([values.std() if received else np.nan]),
+                                                       np.array([float(received and readings['stable'].all())]),
+                                                       np.array([float(received and self.settling.settled)])],
+                                                 dim='Data0D', labels=['dat0', 'std', 'stable', 'settled'],
+                                                 do_plot=not decimate)])
+        if decimate and received:
+            # the full-rate data above are saved but not plotted, the display gets the min/max/mean of all the
+            # readings received since its last refresh, only at the refresh rate
+            self.decimator.accumulate(values[:, np.newaxis])
+            if self.decimator.ready():
+                dte.append(DataFromPlugins(name='Mock1_display', data=self.decimator.reduce(), dim='Data0D',
+                                           labels=self.decimator.labels(['dat0']), do_save=False))
+        self.dte_signal.emit(dte)
 
     def stop(self):
         """Stop the current grab hardware wise if necessary"""
         ## TODO for your custom plugin
         raise NotImplementedError  # when writing your own plugin remove this line
+        if self.reader is not None:  # the instrument keeps on streaming, nothing to stop
+            return ''
         self.controller.your_method_to_stop_acquisition()  # when writing your own plugin replace this line
         self.emit_status(ThreadCommand('Update_Status', ['Some info you want to log']))
         ##############################
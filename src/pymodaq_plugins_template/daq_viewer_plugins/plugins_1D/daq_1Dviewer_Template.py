@@ -1,3 +1,6 @@
+import time
+from typing import List
+
 import numpy as np
 
 from pymodaq_utils.utils import ThreadCommand
@@ -7,6 +10,14 @@ from pymodaq_gui.parameter import Parameter
 from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, comon_parameters, main
 from pymodaq.utils.data import DataFromPlugins
 
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+from pymodaq_plugins_template.hardware.diagnostics import Diagnostics, diagnostics_params, DIAGNOSTICS_PARAMS
+from pymodaq_plugins_template.hardware.decimation import (DisplayDecimator, DECIMATION_METHODS, decimate,
+                                                           decimate_axis)
+from pymodaq_plugins_template.hardware.ring_buffer import RingBuffer
+from pymodaq_plugins_template.hardware.settings_batch import SettingsBatch, settings_batch_params
+from pymodaq_plugins_template.hardware.stream_reader import StreamReader
+
 
 class PythonWrapperOfYourInstrument:
     #  TODO Replace this fake class with the import of the real python wrapper of your instrument
@@ -39,14 +50,52 @@ class DAQ_1DViewer_Template(DAQ_Viewer_base):
         The particular object that allow the communication with the hardware, in general a python wrapper around the
          hardware library.
          
+    frames: RingBuffer
+        Preallocated stack of the Naverage data to be averaged
+    trace_buffer: RingBuffer
+        In time trace mode, buffer filled by the reader thread with the scalar readings of the instrument
+    reader: StreamReader
+        In time trace mode, thread reading the instrument output stream
+    trace_axis: Axis
+        In time trace mode, time axis of the last emitted block of readings (x_axis keeps the spectral axis)
+    decimator: DisplayDecimator
+        If display decimation is enabled, limits the refresh rate and the number of points of the live display
+    settings_batch: SettingsBatch
+        Collects the changes of the batched_settings over the settings window, to be applied together by
+        apply_settings (preset loading, spinbox dragging)
+
     # TODO add your particular attributes here if any
 
     """
+    hardware_averaging = True  # Naverage data are reduced in the plugin and emitted once, see emit_average
+    diagnosed_methods = ['grab_data', 'callback', 'commit_settings']  # timed by the diagnostics
+    # TODO for your custom plugin: the settings applied to the controller, together, by apply_settings
+    batched_settings = ['trace_enabled', 'buffer_size', "a_parameter_you've_added_in_self.params"]
     params = comon_parameters+[
         ## TODO for your custom plugin
         # elements to be added here as dicts in order to control your custom stage
+        {'title': 'Time trace:', 'name': 'time_trace', 'type': 'group', 'children': [
+            {'title': 'Enabled:', 'name': 'trace_enabled', 'type': 'bool', 'value': False,
+             'tip': 'Emit blocks of consecutive readings as a Data1D time trace instead of one emission per reading'},
+            {'title': 'Block size:', 'name': 'block_size', 'type': 'int', 'value': 100, 'min': 1,
+             'tip': 'Number of readings emitted at once'},
+            {'title': 'Max latency (ms):', 'name': 'max_latency', 'type': 'int', 'value': 500, 'min': 1,
+             'tip': 'An incomplete block is emitted if its readings wait longer than this'},
+            {'title': 'Grab timeout (ms):', 'name': 'grab_timeout', 'type': 'int', 'value': 1000, 'min': 0,
+             'tip': 'Time a grab waits for a first reading, a nan reading is emitted if none is received'},
+            {'title': 'Buffer size:', 'name': 'buffer_size', 'type': 'int', 'value': 100000, 'min': 1},
+        ]},
+        {'title': 'Display:', 'name': 'display', 'type': 'group', 'children': [
+            {'title': 'Decimate:', 'name': 'decimate', 'type': 'bool', 'value': False,
+             'tip': 'Save the full-rate data but send a decimated copy to the live display at the refresh rate'},
+            {'title': 'Refresh rate (Hz):', 'name': 'refresh_rate', 'type': 'float', 'value': 10., 'min': 0.1},
+            {'title': 'Method:', 'name': 'method', 'type': 'list', 'limits': list(DECIMATION_METHODS),
+             'value': 'min/max'},
+            {'title': 'Max points:', 'name': 'max_points', 'type': 'int', 'value': 2000, 'min': 2,
+             'tip': 'Maximum number of displayed points, the min/max method uses two per bucket'},
+        ]},
         ############
-        ]
+        ] + settings_batch_params() + diagnostics_params(diagnosed_methods)
 
     def ini_attributes(self):
         #  TODO declare the type of the wrapper (and assign it to self.controller) you're going to use for easy
@@ -56,6 +105,16 @@ class DAQ_1DViewer_Template(DAQ_Viewer_base):
         # TODO declare here attributes you want/need to init with a default value
 
         self.x_axis = None
+        self.frames: RingBuffer = None
+        self._n_average = 1
+        self.trace_buffer: RingBuffer = None
+        self.reader: StreamReader = None
+        self.trace_axis: Axis = None
+        self._trace_origin = 0.
+        self.update_decimator()
+        self.diagnostics = Diagnostics(self, self.diagnosed_methods, self.settings)
+        self.settings_batch = SettingsBatch(self.apply_settings,
+                                            self.settings['settings_batch', 'settings_window'] / 1000, parent=self)
 
     def commit_settings(self, param: Parameter):
         """Apply the consequences of a change of value in the detector settings
@@ -66,11 +125,65 @@ class DAQ_1DViewer_Template(DAQ_Viewer_base):
             A given parameter (within detector_settings) whose value has been changed by the user
         """
         ## TODO for your custom plugin
-        if param.name() == "a_parameter_you've_added_in_self.params":
-           self.controller.your_method_to_apply_this_param_change()
+        if param.name() in self.batched_settings:
+            self.settings_batch.submit(param)  # applied with the other changes of the window by apply_settings
+        elif param.name() == 'settings_window':
+            self.settings_batch.window = param.value() / 1000
+        elif param.name() in DIAGNOSTICS_PARAMS:
+            self.diagnostics.commit_settings(param)
+        elif param.name() in ('refresh_rate', 'method', 'max_points'):
+            setattr(self.decimator, param.name(), param.value())
+            self.decimator.force_refresh()
 #        elif ...
         ##
 
+    def apply_settings(self, params: List[Parameter]):
+        """ Apply a batch of changed settings to the controller as one transaction
+
+        The time trace is stopped once for the whole batch and restarted (with the last buffer size) if still enabled.
+
+        Parameters
+        ----------
+        params: list of Parameter
+            The batched_settings changed within the settings window, in the order of their first change, each to be
+            applied with its current (last) value
+        """
+        ## TODO for your custom plugin
+        self.stop_time_trace()
+        try:
+            for param in params:
+                if param.name() == "a_parameter_you've_added_in_self.params":
+                    self.controller.your_method_to_apply_this_param_change()
+#                elif ...
+        finally:
+            if self.settings['time_trace', 'trace_enabled']:
+                self.start_time_trace()
+        ##
+
+    def start_time_trace(self):
+        """Start the instrument continuous output and the thread filling the trace buffer with its readings"""
+        self.stop_time_trace()
+        self.trace_buffer = RingBuffer(self.settings['time_trace', 'buffer_size'])
+        self._trace_origin = time.time()
+        # TODO for your custom plugin: the read method should block at most a short time (serial timeout) and
+        #  return the readings received since its last call as a 1D numpy array
+        self.controller.your_method_to_start_continuous_output()  # when writing your own plugin replace this line
+        self.reader = StreamReader(self.controller.your_method_to_read_the_output_stream,  # replace this line
+                                   self.trace_buffer)
+        self.reader.start()
+
+    def stop_time_trace(self):
+        """Stop the reader thread and the instrument continuous output"""
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+            self.controller.your_method_to_stop_continuous_output()  # when writing your own plugin replace this line
+
+    def update_decimator(self):
+        """Build the display decimator from the display settings, including the ones loaded from a preset"""
+        self.decimator = DisplayDecimator(self.settings['display', 'refresh_rate'], self.settings['display', 'method'],
+                                          self.settings['display', 'max_points'])
+
     def ini_detector(self, controller=None):
         """Detector communication initialization
 
@@ -96,6 +209,11 @@ class DAQ_1DViewer_Template(DAQ_Viewer_base):
             self.controller = controller
             initialized = True
 
+        self.update_decimator()
+        self.diagnostics.update_from_settings()
+        if self.settings['time_trace', 'trace_enabled']:
+            self.start_time_trace()
+
         ## TODO for your custom plugin
         # get the x_axis (you may want to to this also in the commit settings if x_axis may have changed
         data_x_axis = self.controller.your_method_to_get_the_x_axis()  # if possible
@@ -106,7 +224,7 @@ class DAQ_1DViewer_Template(DAQ_Viewer_base):
                                                data=[DataFromPlugins(name='Mock1',
                                                                      data=[np.array([0., 0., ...]),
                                                                            np.array([0., 0., ...])],
-                                                                     dim='Data1D', labels=['Mock1', 'label2'],
+                                                                     dim='Data1D', labels=['Mock1', 'std'],
                                                                      axes=[self.x_axis])]))
 
         info = "Whatever info you want to log"
@@ -116,6 +234,8 @@ class DAQ_1DViewer_Template(DAQ_Viewer_base):
         """Terminate the communication protocol"""
         ## TODO for your custom plugin
         raise NotImplementedError  # when writing your own plugin remove this line
+        self.settings_batch.discard()
+        self.stop_time_trace()
         if self.is_master:
             #  self.controller.your_method_to_terminate_the_communication()  # when writing your own plugin replace this line
             ...
@@ -131,14 +251,30 @@ class DAQ_1DViewer_Template(DAQ_Viewer_base):
         kwargs: dict
             others optionals arguments
         """
+        self.settings_batch.flush()  # the grab uses the settings changed just before
+        # time trace version: wait until a block of readings is ready (or the max latency is reached) and emit at most
+        # block_size readings at once, the emission rate is bounded whatever the instrument rate
+        if self.reader is not None:
+            start = time.perf_counter()
+            if not self.trace_buffer.wait(self.settings['time_trace', 'block_size'],
+                                          timeout=self.settings['time_trace', 'max_latency'] / 1000):
+                self.trace_buffer.wait(1, timeout=max(self.settings['time_trace', 'grab_timeout'] / 1000 -
+                                                      (time.perf_counter() - start), 0.))
+            readings, timestamps = self.trace_buffer.drain(self.settings['time_trace', 'block_size'])
+            if len(readings) == 0:  # always emit, else the viewer would not grab again
+                self.emit_status(ThreadCommand('Update_Status', ['No reading received from the instrument stream']))
+                readings, timestamps = np.array([np.nan]), np.array([time.time()])
+            self.emit_trace(readings, timestamps)
+            return
+
+        self.prepare_averaging(Naverage)
+
         ## TODO for your custom plugin: you should choose EITHER the synchrone or the asynchrone version following
 
         ##synchrone version (blocking function)
-        data_tot = self.controller.your_method_to_start_a_grab_snap()
-        self.dte_signal.emit(DataToExport('myplugin',
-                                          data=[DataFromPlugins(name='Mock1', data=data_tot,
-                                                                dim='Data1D', labels=['dat0', 'data1'],
-                                                                axes=[self.x_axis])]))
+        for _ in range(Naverage):
+            self.frames.append(self.controller.your_method_to_start_a_grab_snap())  # one spectrum as a 1D ndarray
+        self.emit_average()
 
         ##asynchrone version (non-blocking function with callback)
         self.controller.your_method_to_start_a_grab_snap(self.callback)
@@ -147,15 +283,62 @@ class DAQ_1DViewer_Template(DAQ_Viewer_base):
 
     def callback(self):
         """optional asynchrone method called when the detector has finished its acquisition of data"""
-        data_tot = self.controller.your_method_to_get_data_from_buffer()
-        self.dte_signal.emit(DataToExport('myplugin',
-                                          data=[DataFromPlugins(name='Mock1', data=data_tot,
-                                                                dim='Data1D', labels=['dat0', 'data1'])]))
+        self.frames.append(self.controller.your_method_to_get_data_from_buffer())
+        if len(self.frames) < self._n_average:
+            self.controller.your_method_to_start_a_grab_snap(self.callback)  # next spectrum to be averaged
+        else:
+            self.emit_average()
+
+    def prepare_averaging(self, Naverage: int):
+        """Allocate the stack of spectra to be averaged, only if Naverage or the spectrum size changed"""
+        self._n_average = Naverage
+        shape = (self.x_axis.size,)
+        if self.frames is None or self.frames.capacity != Naverage or self.frames.sample_shape != shape:
+            self.frames = RingBuffer(Naverage, sample_shape=shape)
+        self.frames.clear()
+
+    def emit_average(self):
+        """Reduce the stacked spectra in one vectorized pass and emit their mean and standard deviation"""
+        frames, _ = self.frames.drain()
+        self.emit_data([DataFromPlugins(name='Mock1', data=[frames.mean(axis=0), frames.std(axis=0)],
+                                        dim='Data1D', labels=['dat0', 'std'], axes=[self.x_axis],
+                                        do_plot=not self.settings['display', 'decimate'])])
+
+    def emit_trace(self, readings: np.ndarray, timestamps: np.ndarray):
+        """Emit a block of consecutive readings as a Data1D whose axis is their time since the start of the trace"""
+        self.trace_axis = Axis(data=timestamps - self._trace_origin, label='Time', units='s', index=0)
+        self.emit_data([DataFromPlugins(name='Trace', data=[readings], dim='Data1D', labels=['reading'],
+                                        axes=[self.trace_axis], do_plot=not self.settings['display', 'decimate'])])
+
+    def emit_data(self, data: List[DataFromPlugins]):
+        """ Emit data at full rate for saving and, if display decimation is enabled, their decimated copy
+
+        The DataFromPlugins should have been created with do_plot=False when decimation is enabled. Their displayed
+        copy is only computed and sent at the decimation refresh rate.
+        """
+        dte = DataToExport('myplugin', data=data)
+        if self.settings['display', 'decimate'] and self.decimator.ready():
+            for dwa in data:
+                dte.append(self.decimate_for_display(dwa))
+        self.dte_signal.emit(dte)
+
+    def decimate_for_display(self, dwa: DataFromPlugins) -> DataFromPlugins:
+        """Reduce each spectrum of dwa (and its axis) to the maximum number of displayed points"""
+        method, max_points = self.decimator.method, self.decimator.max_points
+        axis = dwa.axes[0]
+        return DataFromPlugins(name=f'{dwa.name}_display',
+                               data=[decimate(array, max_points, method) for array in dwa],
+                               dim='Data1D', labels=dwa.labels,
+                               axes=[Axis(data=decimate_axis(axis.get_data(), max_points, method),
+                                          label=axis.label, units=axis.units, index=0)],
+                               do_save=False)
 
     def stop(self):
         """Stop the current grab hardware wise if necessary"""
         ## TODO for your custom plugin
         raise NotImplementedError  # when writing your own plugin remove this line
+        if self.reader is not None:  # the instrument keeps on streaming, nothing to stop
+            return ''
         self.controller.your_method_to_stop_acquisition()  # when writing your own plugin replace this line
         self.emit_status(ThreadCommand('Update_Status', ['Some info you want to log']))
         ##############################
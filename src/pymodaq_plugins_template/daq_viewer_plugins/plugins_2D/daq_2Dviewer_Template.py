@@ -1,11 +1,25 @@
+from typing import List
+
 import numpy as np
 
 from pymodaq_utils.utils import ThreadCommand
 from pymodaq_data.data import DataToExport, Axis
 from pymodaq_gui.parameter import Parameter
+from pymodaq_gui.plotting.items.roi import RoiInfo
 
 from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, comon_parameters, main
 from pymodaq.utils.data import DataFromPlugins
+
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+from pymodaq_plugins_template.hardware.diagnostics import Diagnostics, diagnostics_params, DIAGNOSTICS_PARAMS
+from pymodaq_plugins_template.hardware.decimation import (DisplayDecimator, DECIMATION_METHODS, decimate,
+                                                           decimate_axis)
+from pymodaq_plugins_template.hardware.frame_pool import FramePool
+from pymodaq_plugins_template.hardware.ring_buffer import RingBuffer
+from pymodaq_plugins_template.hardware.roi_binning import RoiBinning
+from pymodaq_plugins_template.hardware.settings_batch import SettingsBatch, settings_batch_params
+
+
 class PythonWrapperOfYourInstrument:
     #  TODO Replace this fake class with the import of the real python wrapper of your instrument
     pass
@@ -35,14 +49,62 @@ class DAQ_2DViewer_Template(DAQ_Viewer_base):
         The particular object that allow the communication with the hardware, in general a python wrapper around the
          hardware library.
          
+    pool: FramePool
+        Preallocated images the driver reads into, emitted without copy when not averaging and reused once the
+        consumers of the emitted data released them
+    average_pool: FramePool
+        Preallocated images the mean and standard deviation are computed into when averaging
+    frames: RingBuffer
+        Preallocated stack of the Naverage data to be averaged
+    roi: RoiBinning
+        Cropping and binning of the images before their emission (ROI & binning settings), roi_x_axis and roi_y_axis
+        being the axes of the emitted images. Both are only computed again when the settings or the sensor axes
+        change
+    decimator: DisplayDecimator
+        If display decimation is enabled, limits the refresh rate and the number of pixels of the live display
+    settings_batch: SettingsBatch
+        Collects the changes of the batched_settings over the settings window, to be applied together by
+        apply_settings (preset loading, spinbox dragging)
+
     # TODO add your particular attributes here if any
 
     """
+    hardware_averaging = True  # Naverage data are reduced in the plugin and emitted once, see emit_average
+    frame_dtype = np.float64  # TODO for your custom plugin: the dtype of the camera images (np.uint16...)
+    diagnosed_methods = ['grab_data', 'callback', 'commit_settings']  # timed by the diagnostics
+    # TODO for your custom plugin: the settings applied to the camera, together, by apply_settings
+    batched_settings = ["a_parameter_you've_added_in_self.params"]
     params = comon_parameters + [
         ## TODO for your custom plugin
         # elements to be added here as dicts in order to control your custom stage
+        # TODO for your custom plugin: if the camera can crop and bin on chip (also reducing its readout time), apply
+        #  the ROI & binning settings to the camera (see batched_settings) and keep the ROI of the plugin to the whole
+        #  image
+        {'title': 'ROI & binning:', 'name': 'roi', 'type': 'group', 'children': [
+            {'title': 'Follow ROIselect:', 'name': 'follow_roi_select', 'type': 'bool', 'value': False,
+             'tip': 'The ROI follows the ROIselect of the viewer (on release)'},
+            {'title': 'x0:', 'name': 'roi_x0', 'type': 'int', 'value': 0, 'min': 0},
+            {'title': 'y0:', 'name': 'roi_y0', 'type': 'int', 'value': 0, 'min': 0},
+            {'title': 'Width:', 'name': 'roi_width', 'type': 'int', 'value': 0, 'min': 0,
+             'tip': 'In pixels, 0 up to the edge of the image'},
+            {'title': 'Height:', 'name': 'roi_height', 'type': 'int', 'value': 0, 'min': 0,
+             'tip': 'In pixels, 0 up to the edge of the image'},
+            {'title': 'x binning:', 'name': 'x_binning', 'type': 'int', 'value': 1, 'min': 1,
+             'tip': 'Number of consecutive columns summed into one'},
+            {'title': 'y binning:', 'name': 'y_binning', 'type': 'int', 'value': 1, 'min': 1,
+             'tip': 'Number of consecutive rows summed into one'},
+        ]},
+        {'title': 'Display:', 'name': 'display', 'type': 'group', 'children': [
+            {'title': 'Decimate:', 'name': 'decimate', 'type': 'bool', 'value': False,
+             'tip': 'Save the full-rate data but send a decimated copy to the live display at the refresh rate'},
+            {'title': 'Refresh rate (Hz):', 'name': 'refresh_rate', 'type': 'float', 'value': 10., 'min': 0.1},
+            {'title': 'Method:', 'name': 'method', 'type': 'list', 'limits': list(DECIMATION_METHODS[1:]),
+             'value': 'mean'},
+            {'title': 'Max points:', 'name': 'max_points', 'type': 'int', 'value': 500, 'min': 2,
+             'tip': 'Maximum number of displayed points per dimension'},
+        ]},
         ############
-    ]
+    ] + settings_batch_params() + diagnostics_params(diagnosed_methods)
 
     def ini_attributes(self):
         #  TODO declare the type of the wrapper (and assign it to self.controller) you're going to use for easy
@@ -53,6 +115,18 @@ class DAQ_2DViewer_Template(DAQ_Viewer_base):
 
         self.x_axis = None
         self.y_axis = None
+        self.roi: RoiBinning = None
+        self.roi_x_axis: Axis = None
+        self.roi_y_axis: Axis = None
+        self.pool: FramePool = None
+        self.average_pool: FramePool = None
+        self._frame: np.ndarray = None  # the last image read, when not averaging
+        self.frames: RingBuffer = None
+        self._n_average = 1
+        self.update_decimator()
+        self.diagnostics = Diagnostics(self, self.diagnosed_methods, self.settings)
+        self.settings_batch = SettingsBatch(self.apply_settings,
+                                            self.settings['settings_batch', 'settings_window'] / 1000, parent=self)
 
     def commit_settings(self, param: Parameter):
         """Apply the consequences of a change of value in the detector settings
@@ -63,10 +137,70 @@ class DAQ_2DViewer_Template(DAQ_Viewer_base):
             A given parameter (within detector_settings) whose value has been changed by the user
         """
         # TODO for your custom plugin
-        if param.name() == "a_parameter_you've_added_in_self.params":
-            self.controller.your_method_to_apply_this_param_change()
+        if param.name() in self.batched_settings:
+            self.settings_batch.submit(param)  # applied with the other changes of the window by apply_settings
+        elif param.name() == 'settings_window':
+            self.settings_batch.window = param.value() / 1000
+        elif param.name() in DIAGNOSTICS_PARAMS:
+            self.diagnostics.commit_settings(param)
+        elif param.name() in ('roi_x0', 'roi_y0', 'roi_width', 'roi_height', 'x_binning', 'y_binning'):
+            self.update_roi()
+        elif param.name() in ('refresh_rate', 'method', 'max_points'):
+            setattr(self.decimator, param.name(), param.value())
+            self.decimator.force_refresh()
         #elif ...
 
+    def apply_settings(self, params: List[Parameter]):
+        """ Apply a batch of changed settings to the camera as one transaction
+
+        The acquisition is stopped once for the whole batch (exposure, ROI, binning... often can't be changed while
+        acquiring and the camera re-arms after each change) and the axes are read again.
+
+        Parameters
+        ----------
+        params: list of Parameter
+            The batched_settings changed within the settings window, in the order of their first change, each to be
+            applied with its current (last) value
+        """
+        # TODO for your custom plugin
+        self.controller.your_method_to_stop_acquisition()  # when writing your own plugin replace this line
+        for param in params:
+            if param.name() == "a_parameter_you've_added_in_self.params":
+                self.controller.your_method_to_apply_this_param_change()
+            #elif ...
+        self.x_axis = Axis(data=self.controller.your_method_to_get_the_x_axis(), label='', units='', index=1)
+        self.y_axis = Axis(data=self.controller.your_method_to_get_the_y_axis(), label='', units='', index=0)
+        self.update_roi()
+
+    def update_decimator(self):
+        """Build the display decimator from the display settings, including the ones loaded from a preset"""
+        self.decimator = DisplayDecimator(self.settings['display', 'refresh_rate'], self.settings['display', 'method'],
+                                          self.settings['display', 'max_points'])
+
+    def update_roi(self):
+        """Compute the cropping and binning of the images and the emitted axes from the settings and the sensor axes"""
+        if self.x_axis is None:
+            return
+        roi = [self.settings['roi', name] for name in ('roi_x0', 'roi_y0', 'roi_width', 'roi_height')]
+        self.roi = RoiBinning(self.x_axis.get_data(), self.y_axis.get_data(), roi=roi,
+                              binning=(self.settings['roi', 'x_binning'], self.settings['roi', 'y_binning']))
+        self.roi_x_axis = Axis(data=self.roi.x, label=self.x_axis.label, units=self.x_axis.units, index=1)
+        self.roi_y_axis = Axis(data=self.roi.y, label=self.y_axis.label, units=self.y_axis.units, index=0)
+        self.decimator.force_refresh()
+
+    def roi_select(self, roi_info: RoiInfo, ind_viewer: int = 0):
+        """Crop the images to the ROIselect of the viewer, if the ROI follows it"""
+        if not self.settings['roi', 'follow_roi_select'] or self.x_axis is None:
+            return
+        (y, x), (height, width) = roi_info.origin, roi_info.size  # in the units of the axes, (y, x) ordered
+        columns = sorted(int(np.argmin(np.abs(self.x_axis.get_data() - bound))) for bound in (x, x + width))
+        rows = sorted(int(np.argmin(np.abs(self.y_axis.get_data() - bound))) for bound in (y, y + height))
+        with self.settings.treeChangeBlocker():  # the four changes sent to the user interface at once
+            for name, value in (('roi_x0', columns[0]), ('roi_y0', rows[0]),
+                                ('roi_width', columns[1] - columns[0] + 1), ('roi_height', rows[1] - rows[0] + 1)):
+                self.settings.child('roi', name).setValue(value)
+        self.update_roi()  # once for the whole ROI
+
     def ini_detector(self, controller=None):
         """Detector communication initialization
 
@@ -99,12 +233,18 @@ class DAQ_2DViewer_Template(DAQ_Viewer_base):
         # get the y_axis (you may want to to this also in the commit settings if y_axis may have changed
         data_y_axis = self.controller.your_method_to_get_the_y_axis()  # if possible
         self.y_axis = Axis(data=data_y_axis, label='', units='', index=0)
+        self.update_decimator()
+        self.diagnostics.update_from_settings()
+        self.update_roi()
 
         ## TODO for your custom plugin. Initialize viewers pannel with the future type of data
         self.dte_signal_temp.emit(DataToExport('myplugin',
                                                data=[DataFromPlugins(name='Mock1', data=["2D numpy array"],
                                                                      dim='Data2D', labels=['dat0'],
-                                                                     axes=[self.x_axis, self.y_axis]), ]))
+                                                                     axes=[self.roi_x_axis, self.roi_y_axis]),
+                                                     DataFromPlugins(name='Mock1_std', data=["2D numpy array"],
+                                                                     dim='Data2D', labels=['std'],
+                                                                     axes=[self.roi_x_axis, self.roi_y_axis]), ]))
 
         info = "Whatever info you want to log"
         return info, initialized
@@ -113,6 +253,7 @@ class DAQ_2DViewer_Template(DAQ_Viewer_base):
         """Terminate the communication protocol"""
         ## TODO for your custom plugin
         raise NotImplementedError  # when writing your own plugin remove this line
+        self.settings_batch.discard()
         if self.is_master:
             #  self.controller.your_method_to_terminate_the_communication()  # when writing your own plugin replace this line
             ...
@@ -128,15 +269,16 @@ class DAQ_2DViewer_Template(DAQ_Viewer_base):
         kwargs: dict
             others optionals arguments
         """
+        self.settings_batch.flush()  # the grab uses the settings changed just before
+        self.prepare_averaging(Naverage)
+
         ## TODO for your custom plugin: you should choose EITHER the synchrone or the asynchrone version following
 
         ##synchrone version (blocking function)
-        data_tot = self.controller.your_method_to_start_a_grab_snap()
-        self.dte_signal.emit(DataToExport('myplugin',
-                                          data=[DataFromPlugins(name='Mock1', data=data_tot,
-                                                                dim='Data2D', labels=['label1'],
-                                                                x_axis=self.x_axis,
-                                                                y_axis=self.y_axis), ]))
+        for _ in range(Naverage):
+            self.controller.your_method_to_start_a_grab_snap()  # blocking until the image is acquired
+            self.read_frame()
+        self.emit_average()
 
         ##asynchrone version (non-blocking function with callback)
         self.controller.your_method_to_start_a_grab_snap(self.callback)
@@ -144,12 +286,87 @@ class DAQ_2DViewer_Template(DAQ_Viewer_base):
 
     def callback(self):
         """optional asynchrone method called when the detector has finished its acquisition of data"""
-        data_tot = self.controller.your_method_to_get_data_from_buffer()
-        self.dte_signal.emit(DataToExport('myplugin',
-                                          data=[DataFromPlugins(name='Mock1', data=data_tot,
-                                                                dim='Data2D', labels=['label1'],
-                                                                x_axis=self.x_axis,
-                                                                y_axis=self.y_axis), ]))
+        self.read_frame()
+        if self._n_average > 1 and len(self.frames) < self._n_average:
+            self.controller.your_method_to_start_a_grab_snap(self.callback)  # next image to be averaged
+        else:
+            self.emit_average()
+
+    def read_frame(self):
+        """Read the acquired image into a free image of the pool, stacked to be averaged if Naverage > 1"""
+        frame = self.pool.acquire()
+        self.controller.your_method_to_get_data_from_buffer(frame)  # TODO for your custom plugin: fills frame in place
+        if self._n_average > 1:
+            self.frames.append(frame)  # the pool image is free again as soon as copied
+        else:
+            self._frame = frame
+
+    def prepare_averaging(self, Naverage: int):
+        """Allocate the image pools and the stack of images to average, only if Naverage or the image shape changed"""
+        self._n_average = Naverage
+        shape = (self.y_axis.size, self.x_axis.size)
+        if self.pool is None or self.pool.shape != shape or self.pool.dtype != self.frame_dtype:
+            self.pool = FramePool(shape, self.frame_dtype)
+            self.average_pool = FramePool(shape)
+        if Naverage > 1 and (self.frames is None or self.frames.capacity != Naverage or
+                             self.frames.sample_shape != shape):
+            self.frames = RingBuffer(Naverage, sample_shape=shape)
+        if self.frames is not None:
+            self.frames.clear()
+
+    def emit_average(self):
+        """ Emit the mean and standard deviation of the Naverage images, cropped and binned following the ROI
+
+        A single image is emitted as is (a view of its pool image, without copy) and without standard deviation, else
+        the stacked images are reduced in one vectorized pass into images of the average pool.
+        """
+        do_plot = not self.settings['display', 'decimate']
+        if self._n_average == 1:
+            mean, self._frame = self.roi.reduce(self._frame), None  # only the emitted data refer to the image
+            self.emit_data([DataFromPlugins(name='Mock1', data=[mean],
+                                            dim='Data2D', labels=['label1'],
+                                            x_axis=self.roi_x_axis,
+                                            y_axis=self.roi_y_axis, do_plot=do_plot)])
+            return
+        frames, _ = self.frames.drain()
+        mean = np.mean(frames, axis=0, out=self.average_pool.acquire())
+        std = np.std(frames, axis=0, out=self.average_pool.acquire())
+        if not self.roi.identity:
+            mean, std = self.roi.reduce(mean), self.roi.reduce(std, quadrature=True)
+        self.emit_data([DataFromPlugins(name='Mock1', data=[mean],
+                                        dim='Data2D', labels=['label1'],
+                                        x_axis=self.roi_x_axis,
+                                        y_axis=self.roi_y_axis, do_plot=do_plot),
+                        DataFromPlugins(name='Mock1_std', data=[std],
+                                        dim='Data2D', labels=['std'],
+                                        x_axis=self.roi_x_axis,
+                                        y_axis=self.roi_y_axis, do_plot=do_plot), ])
+
+    def emit_data(self, data: List[DataFromPlugins]):
+        """ Emit data at full rate for saving and, if display decimation is enabled, their decimated copy
+
+        The DataFromPlugins should have been created with do_plot=False when decimation is enabled. Their displayed
+        copy is only computed and sent at the decimation refresh rate.
+        """
+        dte = DataToExport('myplugin', data=data)
+        if self.settings['display', 'decimate'] and self.decimator.ready():
+            for dwa in data:
+                dte.append(self.decimate_for_display(dwa))
+        self.dte_signal.emit(dte)
+
+    def decimate_for_display(self, dwa: DataFromPlugins) -> DataFromPlugins:
+        """Bin each image of dwa (and its axes) down to the maximum number of displayed pixels per dimension"""
+        method, max_points = self.decimator.method, self.decimator.max_points
+        return DataFromPlugins(name=f'{dwa.name}_display',
+                               data=[decimate(decimate(array, max_points, method, axis=0), max_points, method, axis=1)
+                                     for array in dwa],
+                               dim='Data2D', labels=dwa.labels,
+                               axes=[Axis(data=decimate_axis(self.roi_y_axis.get_data(), max_points, method),
+                                          label=self.roi_y_axis.label, units=self.roi_y_axis.units, index=0),
+                                     Axis(data=decimate_axis(self.roi_x_axis.get_data(), max_points, method),
+                                          label=self.roi_x_axis.label, units=self.roi_x_axis.units, index=1)],
+                               do_save=False)
+
     def stop(self):
         """Stop the current grab hardware wise if necessary"""
         ## TODO for your custom plugin
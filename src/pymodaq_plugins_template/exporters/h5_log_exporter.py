@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming of long weighing logs into chunked and compressed HDF5 datasets
+
+:class:`H5LogWriter` appends the readings (timestamp, value, stable flag and unit code) to extendable datasets of an
+HDF5 file. The readings are copied into one of a few preallocated blocks of chunk_size readings, full blocks (or
+partial ones, every flush_interval) being written as whole chunks by a write-behind thread: the memory used is the
+same whatever the length of the run and the acquisition never waits for the disk, unless all the blocks are pending.
+
+:class:`H5LogExporter` is the matching h5 exporter (see the h5exporters feature of the pyproject.toml file):
+exported from the h5 browser, the 1D arrays of a node are converted to the same log layout.
+
+Layout of a log group::
+
+    /log/timestamp  float64  seconds (time.time() if not given)
+    /log/value      float64
+    /log/stable     bool
+    /log/unit       uint8    codes of the frame decoder, the attribute units holds their names
+"""
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+import h5py
+import numpy as np
+
+from pymodaq_data.h5modules.backends import Node
+from pymodaq_data.h5modules.exporter import ExporterFactory, H5Exporter
+from pymodaq_utils.logger import set_logger, get_module_name
+
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+from pymodaq_plugins_template.hardware.frame_decoder import UNITS, unit_code
+
+logger = set_logger(get_module_name(__file__))
+
+LOG_DTYPE = np.dtype([('timestamp', np.float64), ('value', np.float64), ('stable', np.bool_), ('unit', np.uint8)])
+
+
+class H5LogWriter:
+    """ Appends readings to extendable, chunked and compressed datasets of an HDF5 file
+
+    append, extend and flush are meant to be called from a single thread (the one acquiring the readings), the
+    datasets being written by the writer thread.
+
+    Parameters
+    ----------
+    path: str or Path
+        The HDF5 file, created if it does not exist
+    group: str
+        Group holding the datasets, readings are appended to already existing datasets
+    chunk_size: int
+        Number of readings per HDF5 chunk and per write
+    compression: str or None
+        h5py compression filter ('gzip', 'lzf' or None)
+    compression_opts: int or None
+        Compression level for gzip
+    max_pending: int
+        Number of blocks of chunk_size readings that may wait to be written before append blocks
+    flush_interval: float
+        Maximum time in seconds a reading stays in memory before being written (and the file flushed)
+
+    Attributes
+    ----------
+    written: int
+        Number of readings written to the file by this writer
+    errors: int
+        Number of blocks that could not be written
+
+    Examples
+    --------
+    >>> with H5LogWriter('weighing.h5') as writer:
+    ...     frames, timestamps = ring_buffer.drain()
+    ...     writer.extend(frames, timestamps)
+    """
+
+    def __init__(self, path: Union[str, Path], group: str = 'log', chunk_size: int = 4096,
+                 compression: Optional[str] = 'gzip', compression_opts: Optional[int] = 4, max_pending: int = 4,
+                 flush_interval: float = 5.):
+        if chunk_size < 1 or max_pending < 1:
+            raise ValueError('chunk_size and max_pending should be strictly positive')
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.errors = 0
+        self._flushed = 0
+        self._file = h5py.File(path, 'a')
+        self._group = self._file.require_group(group)
+        self._datasets = {}
+        for name in LOG_DTYPE.names:
+            if name not in self._group:
+                self._group.create_dataset(name, shape=(0,), maxshape=(None,), dtype=LOG_DTYPE[name],
+                                           chunks=(chunk_size,), compression=compression,
+                                           compression_opts=compression_opts if compression == 'gzip' else None,
+                                           shuffle=compression is not None)
+            self._datasets[name] = self._group[name]
+        self._size = self._datasets['value'].shape[0]
+        self._datasets['unit'].attrs['units'] = list(UNITS)
+        self._datasets['timestamp'].attrs['units'] = 's'
+
+        # write-behind: blocks are filled by the acquisition and written then recycled by the writer thread
+        self._free: queue.Queue = queue.Queue()
+        for _ in range(max_pending):
+            self._free.put(np.zeros((chunk_size,), dtype=LOG_DTYPE))
+        self._pending: queue.Queue = queue.Queue()
+        self._block = np.zeros((chunk_size,), dtype=LOG_DTYPE)
+        self._count = 0
+        self._block_start = time.perf_counter()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='h5_log_writer', daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> 'H5LogWriter':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        """Number of readings appended, written or not"""
+        return self._flushed + self._count
+
+    def append(self, value: float, timestamp: Optional[float] = None, stable: bool = True,
+               unit: Union[int, str] = 0):
+        """ Append a single reading
+
+        Parameters
+        ----------
+        value: float
+        timestamp: float or None
+            time.time() if None
+        stable: bool
+        unit: int or str
+            Unit code of the frame decoder or unit name
+        """
+        index = self._count
+        block = self._block
+        block['timestamp'][index] = time.time() if timestamp is None else timestamp
+        block['value'][index] = value
+        block['stable'][index] = stable
+        block['unit'][index] = unit_code(unit) if isinstance(unit, str) else unit
+        self._count = index + 1
+        if self._count == self.chunk_size or time.perf_counter() - self._block_start > self.flush_interval:
+            self.flush()
+
+    def extend(self, values: np.ndarray, timestamps: Optional[np.ndarray] = None, stable=True,
+               unit: Union[int, str] = 0):
+        """ Append many readings
+
+        Parameters
+        ----------
+        values: ndarray
+            The values or a FRAME_DTYPE array (as drained from the ring buffer of the 0D viewer) whose value, stable
+            and unit fields are then used
+        timestamps: ndarray or None
+            time.time() for all the readings if None
+        stable: bool or ndarray of bool
+            Ignored for FRAME_DTYPE values
+        unit: int or str
+            Unit code of the frame decoder or unit name, ignored for FRAME_DTYPE values
+        """
+        values = np.asarray(values)
+        if values.dtype.names is not None:
+            stable = values['stable']
+            unit = values['unit']
+            values = values['value']
+        elif isinstance(unit, str):
+            unit = unit_code(unit)
+        if timestamps is None:
+            timestamps = time.time()
+        values, timestamps, stable, unit = np.broadcast_arrays(values.ravel(), timestamps, stable, unit)
+        start = 0
+        while start < values.size:
+            stop = min(start + self.chunk_size - self._count, values.size)
+            block = self._block[self._count:self._count + stop - start]
+            block['timestamp'] = timestamps[start:stop]
+            block['value'] = values[start:stop]
+            block['stable'] = stable[start:stop]
+            block['unit'] = unit[start:stop]
+            self._count += stop - start
+            start = stop
+            if self._count == self.chunk_size:
+                self.flush()
+        if self._count > 0 and time.perf_counter() - self._block_start > self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Hand the readings in memory to the writer thread, waiting for a free block if all are pending"""
+        if self._count > 0:
+            self._pending.put((self._block, self._count))
+            self._flushed += self._count
+            self._block = self._free.get()
+            self._count = 0
+        self._block_start = time.perf_counter()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """ Flush and wait until everything has been written
+
+        Returns
+        -------
+        bool: False if the readings are still not all written after timeout seconds
+        """
+        self.flush()
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._pending.all_tasks_done:
+            while self._pending.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._pending.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self):
+        """Write the remaining readings, stop the writer thread and close the file"""
+        if self._closed:
+            return
+        self.flush()
+        self._pending.put((None, 0))
+        self._thread.join()
+        self._file.close()
+        self._closed = True
+
+    def _write(self, block: np.ndarray):
+        start = self._size
+        for name, dataset in self._datasets.items():
+            dataset.resize((start + block.size,))
+            dataset[start:] = block[name]
+        self._size += block.size
+        self.written += block.size
+        self._file.flush()
+
+    def _run(self):
+        while True:
+            block, count = self._pending.get()
+            try:
+                if block is None:
+                    return
+                self._write(block[:count])
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f'Could not write {count} readings to {self._file.filename}: {str(e)}')
+            finally:
+                if block is not None:
+                    self._free.put(block)
+                self._pending.task_done()
+
+
+@ExporterFactory.register_exporter()
+class H5LogExporter(H5Exporter):
+    """ Exporter of the 1D arrays of a node (for instance 0D data acquired as a function of time) as chunked and
+    compressed logs, one group per array, see H5LogWriter"""
+
+    FORMAT_DESCRIPTION = "Chunked compressed log"
+    FORMAT_EXTENSION = "h5"
+
+    chunk_size = 4096
+
+    def export_data(self, node: Node, filename: str) -> None:
+        """Export the 1D data arrays of the node, the first 1D axis array of the same length is used as timestamps"""
+        if 'ARRAY' in node.attrs['CLASS']:
+            arrays = {node.name: node}
+        else:
+            arrays = {name: child for name, child in node.children().items()
+                      if 'ARRAY' in child.attrs['CLASS'] and len(child.attrs['shape']) == 1}
+        axes = {name: array for name, array in arrays.items() if name.startswith('Axis')}
+        for name, array in arrays.items():
+            if name in axes:
+                continue
+            length = array.attrs['shape'][0]
+            timestamps = next((axis for axis in axes.values() if axis.attrs['shape'][0] == length), None)
+            unit = array.attrs['units'] if 'units' in array.attrs.attrs_name else ''
+            with H5LogWriter(filename, group=name, chunk_size=self.chunk_size) as writer:
+                for start in range(0, length, self.chunk_size):  # chunk by chunk, whatever the length
+                    stop = min(start + self.chunk_size, length)
+                    writer.extend(array[start:stop],
+                                  np.arange(start, stop, dtype=float) if timestamps is None else
+                                  timestamps[start:stop],
+                                  unit=unit if isinstance(unit, str) else 0)
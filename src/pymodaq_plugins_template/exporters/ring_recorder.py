@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Crash-safe recording of the raw readings into a memory-mapped ring file
+
+:class:`RingRecorder` preallocates a file of fixed-size records (timestamp, value, flags) and maps it in memory: storing
+readings is a copy into the page cache, without any system call, and the operating system writes the pages to the disk
+even if the process crashes or is killed. A small header holds the write cursor, updated after the records, so that
+the last capacity readings can be recovered and replayed from the file after a crash. The content is exposed as
+zero-copy numpy views of the mapping.
+
+File layout::
+
+    header (64 bytes)   magic b'PMDRING1', version, record size, capacity, cursor (readings ever written)
+    records             capacity * RECORD_DTYPE, the reading number n being at index n % capacity
+"""
+import mmap
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+from pymodaq_utils.logger import set_logger, get_module_name
+
+logger = set_logger(get_module_name(__file__))
+
+MAGIC = b'PMDRING1'
+VERSION = 1
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4'), ('record_size', '<u4'), ('capacity', '<u8'),
+                         ('cursor', '<u8')])
+RECORD_DTYPE = np.dtype([('timestamp', '<f8'), ('value', '<f8'), ('flags', '<u8')])
+
+FLAG_STABLE = 0x1
+FLAG_NET = 0x2
+UNIT_SHIFT = 8  # the unit code of the frame decoder is stored in the bits 8 to 15 of the flags
+
+
+def frame_flags(frames: np.ndarray) -> np.ndarray:
+    """Flags of the records corresponding to the readings of a FRAME_DTYPE array"""
+    return (frames['stable'].astype(np.uint64) * FLAG_STABLE | frames['net'].astype(np.uint64) * FLAG_NET |
+            frames['unit'].astype(np.uint64) << UNIT_SHIFT)
+
+
+class RingRecorder:
+    """ Fixed-size records stored in a preallocated memory-mapped file used as a ring
+
+    Parameters
+    ----------
+    path: str or Path
+        The ring file. An existing one is reopened (with its own capacity) and the recording goes on after its last
+        reading
+    capacity: int
+        Number of readings kept when creating the file, 24 bytes each (3600000 is one hour at 1 kHz)
+    readonly: bool
+        Open an existing file for recovery only
+    sync_interval: float or None
+        Minimum time in seconds between two explicit writes of the mapping to the disk, only needed to survive an
+        operating system crash or a power loss (the page cache survives a crash of the process). None to let the
+        operating system decide
+
+    Examples
+    --------
+    >>> recorder = RingRecorder('balance.ring', capacity=3_600_000)
+    >>> recorder.extend(frames)
+    ... # after a crash
+    >>> for records in RingRecorder('balance.ring', readonly=True).replay(since=time.time() - 3600):
+    ...     process(records['timestamp'], records['value'])
+    """
+
+    def __init__(self, path: Union[str, Path], capacity: int = 3_600_000, readonly: bool = False,
+                 sync_interval: Optional[float] = 10.):
+        self.path = Path(path)
+        self.readonly = readonly
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._closed = False
+        self._last_sync = time.perf_counter()
+        if not self._valid_file():
+            if readonly:
+                raise ValueError(f'{self.path} is not a ring recorder file')
+            if capacity < 1:
+                raise ValueError(f'The capacity of a RingRecorder should be strictly positive, not {capacity}')
+            self._create(capacity)
+        with open(self.path, 'rb' if readonly else 'r+b') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE)
+        self._header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self._mmap)
+        self.capacity = int(self._header['capacity'])
+        self._records = np.ndarray((self.capacity,), dtype=RECORD_DTYPE, buffer=self._mmap, offset=HEADER_SIZE)
+        if not readonly and capacity != self.capacity:
+            logger.warning(f'{self.path} reopened with its capacity of {self.capacity} readings')
+
+    def _valid_file(self) -> bool:
+        if not self.path.is_file() or self.path.stat().st_size < HEADER_SIZE:
+            return False
+        header = np.fromfile(self.path, dtype=HEADER_DTYPE, count=1)[0]
+        return header['magic'] == MAGIC and header['version'] == VERSION and \
+            header['record_size'] == RECORD_DTYPE.itemsize and \
+            self.path.stat().st_size >= HEADER_SIZE + int(header['capacity']) * RECORD_DTYPE.itemsize
+
+    def _create(self, capacity: int):
+        header = np.zeros((), dtype=HEADER_DTYPE)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['record_size'] = RECORD_DTYPE.itemsize
+        header['capacity'] = capacity
+        with open(self.path, 'wb') as file:
+            file.write(header.tobytes().ljust(HEADER_SIZE, b'\0'))
+            file.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)  # preallocated (sparse) records
+
+    def __enter__(self) -> 'RingRecorder':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def cursor(self) -> int:
+        """Number of readings ever written in the file"""
+        return int(self._header['cursor'])
+
+    def __len__(self) -> int:
+        """Number of readings that can be recovered"""
+        return min(self.cursor, self.capacity)
+
+    @property
+    def records(self) -> np.ndarray:
+        """Zero-copy view of the whole ring, in storage order (see segments for the chronological order)"""
+        return self._records
+
+    def append(self, value: float, timestamp: Optional[float] = None, flags: int = 0):
+        with self._lock:
+            self._check_open()
+            cursor = self.cursor
+            index = cursor % self.capacity
+            self._records['timestamp'][index] = time.time() if timestamp is None else timestamp
+            self._records['value'][index] = value
+            self._records['flags'][index] = flags
+            self._header['cursor'] = cursor + 1  # only after the record is complete
+        self._sync_if_due()
+
+    def extend(self, values: np.ndarray, timestamps: Optional[np.ndarray] = None, flags=0):
+        """ Store many readings
+
+        Parameters
+        ----------
+        values: ndarray
+            The values or a FRAME_DTYPE array, whose flags are then obtained with frame_flags
+        timestamps: ndarray or None
+            time.time() for all the readings if None
+        flags: int or ndarray of int
+            Ignored for FRAME_DTYPE values
+        """
+        values = np.asarray(values)
+        if values.dtype.names is not None:
+            flags = frame_flags(values)
+            values = values['value']
+        values, timestamps, flags = np.broadcast_arrays(values.ravel(),
+                                                        time.time() if timestamps is None else timestamps, flags)
+        if values.size > self.capacity:  # only the last capacity readings would be kept anyway
+            values, timestamps, flags = values[-self.capacity:], timestamps[-self.capacity:], flags[-self.capacity:]
+        with self._lock:
+            self._check_open()
+            cursor = self.cursor
+            start = cursor % self.capacity
+            first = min(values.size, self.capacity - start)
+            for destination, source in ((self._records[start:start + first], slice(0, first)),
+                                        (self._records[:values.size - first], slice(first, values.size))):
+                destination['timestamp'] = timestamps[source]
+                destination['value'] = values[source]
+                destination['flags'] = flags[source]
+            self._header['cursor'] = cursor + values.size
+        self._sync_if_due()
+
+    def _check_open(self):
+        if self._closed:
+            raise ValueError(f'The ring recorder {self.path} is closed')
+
+    def _sync_if_due(self):
+        if self.sync_interval is not None and time.perf_counter() - self._last_sync > self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """Write the mapping to the disk (msync), blocking"""
+        self._last_sync = time.perf_counter()
+        if not self.readonly:
+            self._mmap.flush()
+
+    def segments(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ Zero-copy views of the last n readings (all the recoverable ones if None) in chronological order
+
+        The ring wraps around, hence two views: the oldest readings then the newest ones (possibly empty). The views
+        are overwritten by the following readings, copy them if they have to outlive the recording.
+        """
+        cursor = self.cursor
+        n = len(self) if n is None else min(n, len(self))
+        stop = cursor % self.capacity
+        if n <= stop:
+            return self._records[stop - n:stop], self._records[:0]
+        return self._records[self.capacity - (n - stop):], self._records[:stop]
+
+    def read(self, n: Optional[int] = None) -> np.ndarray:
+        """Copy of the last n readings (all the recoverable ones if None) in chronological order"""
+        return np.concatenate(self.segments(n))
+
+    def replay(self, since: Optional[float] = None, chunk_size: int = 100_000) -> Iterator[np.ndarray]:
+        """ Zero-copy chunks of the recovered readings in chronological order
+
+        Parameters
+        ----------
+        since: float or None
+            Only the readings whose timestamp is not older are replayed
+        chunk_size: int
+            Maximum number of readings per chunk
+        """
+        for segment in self.segments():
+            if since is not None:  # timestamps are increasing within a segment
+                segment = segment[np.searchsorted(segment['timestamp'], since):]
+            for start in range(0, segment.size, chunk_size):
+                yield segment[start:start + chunk_size]
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if not self.readonly:
+                self._mmap.flush()
+            del self._header, self._records
+            try:
+                self._mmap.close()
+            except BufferError:  # views obtained from segments or replay are still used, closed with the last one
+                pass
@@ -0,0 +1,232 @@
+import time
+from typing import Dict
+
+from qtpy import QtCore
+
+from pymodaq_data.data import DataToExport
+from pymodaq_gui import utils as gutils
+from pymodaq_utils.config import Config, ConfigError
+from pymodaq_utils.logger import set_logger, get_module_name
+
+from pymodaq.extensions.utils import CustomExt
+
+
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+from pymodaq_plugins_template import config as plugin_config  # shared and loaded at the first access
+
+logger = set_logger(get_module_name(__file__))
+
+main_config = Config()
+
+EXTENSION_NAME = 'Acquisition scheduler'  # the name that will be displayed in the extension list in the dashboard
+CLASS_NAME = 'AcquisitionScheduler'  # this should be the name of your class defined below
+
+
+class LagStatistics:
+    """Running statistics (last, mean, max) of the lag of one detector, in seconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.
+        self.last = float('nan')
+        self.max = 0.
+
+    def record(self, lag: float):
+        self.count += 1
+        self.total += lag
+        self.last = lag
+        self.max = max(self.max, lag)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else float('nan')
+
+    def __str__(self):
+        return f'last={self.last * 1000:.3g} mean={self.mean * 1000:.3g} max={self.max * 1000:.3g}'
+
+
+class AcquisitionScheduler(CustomExt):
+    """ Synchronized acquisition of all the selected detectors from a single scheduler
+
+    Instead of each DAQ_Viewer running its own free grab loop (and drifting apart from the others), each cycle sends
+    one grab command to all the selected detectors at once, so that they acquire in parallel in their own threads,
+    then waits for all of them. The data of a cycle are emitted as a single merged DataToExport (merged_signal), all
+    stamped with the time the cycle started. The duration of the cycles and the lag of each detector (time between
+    the start of the cycle and the reception of its data) are shown in the statistics.
+    """
+
+    merged_signal = QtCore.Signal(DataToExport)
+
+    params = [
+        {'title': 'Period (ms):', 'name': 'period', 'type': 'int', 'value': 0, 'min': 0,
+         'tip': 'Minimum time between the starts of two cycles, 0 to start a cycle as soon as the previous one is '
+                'complete'},
+        {'title': 'Cycles:', 'name': 'n_cycles', 'type': 'int', 'value': 0, 'min': 0,
+         'tip': 'Number of cycles to run, 0 to run until stopped'},
+        {'title': 'Statistics:', 'name': 'statistics', 'type': 'group', 'children': [
+            {'title': 'Cycles done:', 'name': 'cycles_done', 'type': 'int', 'value': 0, 'readonly': True},
+            {'title': 'Cycle time (ms):', 'name': 'cycle_time', 'type': 'float', 'value': 0., 'readonly': True},
+            {'title': 'Rate (Hz):', 'name': 'rate', 'type': 'float', 'value': 0., 'readonly': True,
+             'tip': 'Number of cycles per second, each one holding a reading of every detector'},
+            {'title': 'Lags (ms):', 'name': 'lags', 'type': 'group', 'children': []},
+        ]},
+    ]
+    report_interval = 0.5  # minimum time in seconds between two updates of the statistics
+
+    def __init__(self, parent: gutils.DockArea, dashboard):
+        super().__init__(parent, dashboard)
+        self._running = False
+        self._cycles_done = 0
+        self._cycle_start = 0.
+        self._cycle_timestamp = 0.
+        self._run_start = 0.
+        self._last_report = 0.
+        self._cycle_time = float('nan')
+        self._arrivals: Dict[str, float] = {}
+        self.lags: Dict[str, LagStatistics] = {}
+
+        self.setup_ui()
+
+    def setup_docks_and_widgets(self):
+        self.docks['settings'] = gutils.Dock('Settings')
+        self.dockarea.addDock(self.docks['settings'])
+        self.docks['settings'].addWidget(self.settings_tree)
+        if self.modules_manager is not None:
+            self.docks['modules'] = gutils.Dock('Detectors')
+            self.dockarea.addDock(self.docks['modules'], 'right', self.docks['settings'])
+            self.docks['modules'].addWidget(self.modules_manager.settings_tree)
+
+    def setup_actions(self):
+        self.add_action('run', 'Run', 'run2', 'Run the synchronized acquisition of the selected detectors',
+                        checkable=True)
+        self.add_action('stop', 'Stop', 'stop', 'Stop the acquisition at the end of the current cycle')
+
+    def connect_things(self):
+        self.connect_action('run', self.run)
+        self.connect_action('stop', self.stop)
+
+    def run(self, run: bool = True):
+        if not run:
+            self.stop()
+        elif not self._running:
+            self.start()
+
+    def start(self):
+        """Connect the selected detectors and start the cycles"""
+        detectors = self.modules_manager.detectors
+        if len(detectors) == 0:
+            self.status_signal.emit('No detector selected')
+            self.set_action_checked('run', False)
+            return
+        self.lags = {detector.title: LagStatistics() for detector in detectors}
+        self.settings.child('statistics', 'lags').clearChildren()
+        self.settings.child('statistics', 'lags').addChildren([
+            {'title': f'{title}:', 'name': title, 'type': 'str', 'value': '', 'readonly': True}
+            for title in self.lags])
+        # connected before the modules manager: the lags are known when the cycle done callback is called
+        for detector in detectors:
+            detector.grab_done_signal.connect(self._on_detector_done)
+        self.modules_manager.connect_detectors(True)
+        self.modules_manager.timeout_signal.connect(self._on_timeout)
+        self._running = True
+        self._cycles_done = 0
+        self._run_start = time.perf_counter()
+        self.set_action_checked('run', True)
+        self._start_cycle()
+
+    def stop(self):
+        """Stop the cycles, the current one is not interrupted but its data are not emitted"""
+        if not self._running:
+            return
+        self._running = False
+        self.modules_manager.forget_callback(self._on_cycle_done, disconnect_modules=True)
+        try:
+            self.modules_manager.timeout_signal.disconnect(self._on_timeout)
+        except TypeError:
+            pass
+        for detector in self.modules_manager.detectors:
+            try:
+                detector.grab_done_signal.disconnect(self._on_detector_done)
+            except TypeError:
+                pass
+        self.set_action_checked('run', False)
+        self.report()
+
+    def _start_cycle(self):
+        if not self._running:
+            return
+        self._arrivals = {}
+        self._cycle_timestamp = time.time()
+        self._cycle_start = time.perf_counter()
+        # one grab command sent to every selected detector, each one acquiring in its own thread
+        self.modules_manager.grab_data_with_callback(callback=self._on_cycle_done, do_connect_modules=False)
+
+    def _on_detector_done(self, dte: DataToExport):
+        lag = time.perf_counter() - self._cycle_start
+        for dwa in dte:
+            self._arrivals.setdefault(dwa.origin, lag)
+
+    def _on_cycle_done(self, dte: DataToExport):
+        self.modules_manager.forget_callback(self._on_cycle_done, disconnect_modules=False)
+        if not self._running:
+            return
+        self._cycle_time = time.perf_counter() - self._cycle_start
+        for title, lag in self._arrivals.items():
+            if title in self.lags:
+                self.lags[title].record(lag)
+        merged = DataToExport('AcquisitionScheduler', data=list(dte))
+        for dwa in merged:
+            dwa.timestamp = self._cycle_timestamp  # common timestamp of the cycle
+        self._cycles_done += 1
+        self.merged_signal.emit(merged)
+        if time.perf_counter() - self._last_report > self.report_interval:
+            self.report()
+
+        if 0 < self.settings['n_cycles'] <= self._cycles_done:
+            self.stop()
+            self.status_signal.emit(f'{self._cycles_done} cycles done')
+            return
+        delay = max(self.settings['period'] / 1000 - self._cycle_time, 0.)
+        QtCore.QTimer.singleShot(int(delay * 1000), self._start_cycle)
+
+    def _on_timeout(self, missing_detectors: list):
+        # going on would mix the late data of a detector with the next cycle
+        self.status_signal.emit(f'Acquisition stopped, no data from {", ".join(missing_detectors)}')
+        self.stop()
+
+    def report(self):
+        """Show the current statistics in the settings"""
+        self._last_report = time.perf_counter()
+        elapsed = self._last_report - self._run_start
+        self.settings.child('statistics', 'cycles_done').setValue(self._cycles_done)
+        self.settings.child('statistics', 'cycle_time').setValue(self._cycle_time * 1000)
+        self.settings.child('statistics', 'rate').setValue(self._cycles_done / elapsed if elapsed > 0 else 0.)
+        for title, statistics in self.lags.items():
+            self.settings.child('statistics', 'lags', title).setValue(str(statistics))
+
+    def _quit_fun(self) -> bool:
+        self.stop()
+        return True
+
+
+def main():
+    from pymodaq.utils.gui_utils.utils import mkQApp
+    from pymodaq.utils.gui_utils.loader_utils import load_dashboard_with_preset
+    from pymodaq.utils.messenger import messagebox
+
+    app = mkQApp(EXTENSION_NAME)
+    try:
+        preset_file_name = plugin_config('presets', f'preset_for_{CLASS_NAME.lower()}')
+        load_dashboard_with_preset(preset_file_name, EXTENSION_NAME)
+        app.exec()
+
+    except ConfigError as e:
+        messagebox(f'No entry with name f"preset_for_{CLASS_NAME.lower()}" has been configured'
+                   f'in the plugin config file. The toml entry should be:\n'
+                   f'[presets]'
+                   f"preset_for_{CLASS_NAME.lower()} = {'a name for an existing preset'}"
+                   )
+
+
+if __name__ == '__main__':
+    main()
@@ -9,12 +9,11 @@ from pymodaq.extensions.utils import CustomExt
 
 
 # todo: replace here *pymodaq_plugins_template* by your plugin package name
-from pymodaq_plugins_template.utils import Config as PluginConfig
+from pymodaq_plugins_template import config as plugin_config  # shared and loaded at the first access
 
 logger = set_logger(get_module_name(__file__))
 
 main_config = Config()
-plugin_config = PluginConfig()
 
 # todo: modify this as you wish
 EXTENSION_NAME = 'MY_EXTENSION_NAME'  # the name that will be displayed in the extension list in the
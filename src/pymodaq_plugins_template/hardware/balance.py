@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Python wrapper of a balance speaking the frame protocol over a serial port
+
+See simulator.py for the command set. The readings are returned as raw frames (bytes) to be decoded in bulk by
+:class:`~pymodaq_plugins_template.hardware.frame_decoder.FrameDecoder`. The same wrapper talks to a real balance or to
+a :class:`~pymodaq_plugins_template.hardware.simulator.BalanceSimulator`, whose port is opened as any serial port.
+"""
+import time
+from typing import Optional
+
+import serial
+
+
+class BalanceError(Exception):
+    """The balance answered with an error frame (EC,Exx)"""
+
+
+class Balance:
+    """ Serial communication with a balance
+
+    Examples
+    --------
+    >>> balance = Balance()
+    >>> balance.open_communication('/dev/ttyUSB0', baudrate=9600)
+    >>> FrameDecoder().decode(balance.weigh())['value']
+    array([12.345])
+    """
+
+    def __init__(self):
+        self._serial: Optional[serial.Serial] = None
+
+    def open_communication(self, port: str, baudrate: int = 9600, timeout: float = 1.):
+        self._serial = serial.Serial(port, baudrate=baudrate, timeout=timeout)
+
+    def close_communication(self):
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._serial is not None and self._serial.is_open
+
+    @property
+    def timeout(self) -> float:
+        """Maximum time in seconds to wait for an answer"""
+        return self._serial.timeout
+
+    @timeout.setter
+    def timeout(self, timeout: float):
+        self._serial.timeout = timeout
+
+    def request(self, command: bytes) -> bytes:
+        """ Send a command and read its one line answer (with its line termination)
+
+        Raises
+        ------
+        TimeoutError: no complete answer within the timeout
+        BalanceError: the answer is an error frame
+        """
+        self._serial.reset_input_buffer()
+        self._serial.write(command + b'\r\n')
+        answer = self._serial.read_until(b'\n')
+        if not answer.endswith(b'\n'):
+            raise TimeoutError(f'No answer of the balance to {command.decode()}')
+        if answer.startswith(b'EC,'):
+            raise BalanceError(answer.strip().decode())
+        return answer
+
+    def weigh(self) -> bytes:
+        """Get one reading as a raw frame"""
+        return self.request(b'Q')
+
+    def tare(self):
+        self.request(b'T')
+
+    def zero(self):
+        self.request(b'Z')
+
+    def start_continuous(self):
+        """Start the continuous output, the frames are then obtained with read_stream"""
+        self.request(b'C')
+
+    def read_stream(self) -> bytes:
+        """ Bytes received since the last call, waiting at most the timeout for the first ones
+
+        Frames may be split between two calls, see FrameDecoder.decode
+        """
+        data = self._serial.read(max(self._serial.in_waiting, 1))
+        return data + self._serial.read(self._serial.in_waiting)
+
+    def stop_continuous(self):
+        """Stop the continuous output and discard the frames still in transit"""
+        self._serial.write(b'S\r\n')
+        deadline = time.perf_counter() + (self._serial.timeout or 1.)
+        while time.perf_counter() < deadline:
+            if self._serial.read_until(b'\n').startswith(b'S,OK'):
+                return
+        raise TimeoutError('The balance did not acknowledge the end of the continuous output')
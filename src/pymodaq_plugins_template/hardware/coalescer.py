@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Coalescing of the targets sent to an actuator faster than it can take them
+
+When a closed loop (PID extension) or a fast scan issues setpoints faster than the controller answers, sending each of
+them builds a backlog and the actuator lags further and further behind the latest target. A :class:`TargetCoalescer`
+sends the targets from its own thread, one at a time: while a command is in flight, a newer target replaces the one
+waiting (if any) and only the latest one is sent when the link is free. The latency of a target is then bounded by
+the duration of two commands, whatever the rate at which they are issued.
+"""
+import threading
+from typing import Any, Callable, Optional
+
+from pymodaq_utils.logger import set_logger, get_module_name
+
+logger = set_logger(get_module_name(__file__))
+
+_EMPTY = object()
+
+
+class TargetCoalescer:
+    """ Sender of the latest target, the waiting targets being overwritten by newer ones
+
+    Parameters
+    ----------
+    send: Callable[[Any], None]
+        Sends one target to the controller, blocking until the controller took it (called from the coalescer thread)
+    on_error: Callable[[Exception], None] or None
+        Called (from the coalescer thread) with the exception raised by send, it is logged if None
+    name: str
+        Name of the sending thread
+
+    Attributes
+    ----------
+    sent: int
+        Number of targets sent
+    overwritten: int
+        Number of targets replaced by a newer one before being sent
+    """
+
+    def __init__(self, send: Callable[[Any], None], on_error: Optional[Callable[[Exception], None]] = None,
+                 name: str = 'coalescer'):
+        self._send = send
+        self._on_error = on_error
+        self._name = name
+        self._condition = threading.Condition()
+        self._pending = _EMPTY
+        self._in_flight = False
+        self._thread: Optional[threading.Thread] = None
+        self.sent = 0
+        self.overwritten = 0
+
+    @property
+    def busy(self) -> bool:
+        """True while a target is being sent or waiting to be"""
+        with self._condition:
+            return self._in_flight or self._pending is not _EMPTY
+
+    def submit(self, target: Any) -> bool:
+        """ Send target as soon as the previous command is done, replacing the target waiting if any
+
+        Returns
+        -------
+        bool: True if a waiting target has been overwritten
+        """
+        with self._condition:
+            overwritten = self._pending is not _EMPTY
+            if overwritten:
+                self.overwritten += 1
+            self._pending = target
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+        return overwritten
+
+    def discard(self) -> bool:
+        """Forget the waiting target (for instance when the motion is stopped), returns True if there was one"""
+        with self._condition:
+            discarded = self._pending is not _EMPTY
+            self._pending = _EMPTY
+            self._condition.notify_all()
+        return discarded
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until all the targets are sent, returns False if they are not after timeout seconds"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._in_flight and self._pending is _EMPTY, timeout)
+
+    def close(self, timeout: Optional[float] = 1.):
+        """Stop the sending thread after the command in flight, the waiting target is discarded
+
+        A new thread is started by the next submit
+        """
+        with self._condition:
+            self._pending = _EMPTY
+            self._condition.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run(self):
+        thread = threading.current_thread()
+        while True:
+            with self._condition:
+                self._in_flight = False
+                self._condition.notify_all()
+                self._condition.wait_for(lambda: self._thread is not thread or self._pending is not _EMPTY)
+                if self._thread is not thread:  # closed
+                    return
+                target, self._pending = self._pending, _EMPTY
+                self._in_flight = True
+            try:
+                self._send(target)
+                self.sent += 1
+            except Exception as e:
+                if self._on_error is not None:
+                    self._on_error(e)
+                else:
+                    logger.exception(f'Sending the target {target} failed: {e}')
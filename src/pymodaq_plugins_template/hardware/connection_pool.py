@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+Pool of communication links (serial port, RS-485 multidrop bus...) shared by several plugin instances
+
+All the plugins (masters and slaves, actuators and detectors) talking through the same port with the same instrument
+wrapper get the same :class:`SharedLink`. Its requests are executed one at a time, in order, by a single worker thread
+so that concurrent plugins never interleave their frames on the wire, while each caller may queue several requests
+(pipelining) and wait for them with its own timeout. Each plugin uses the link through its own :class:`PluginLink`,
+holding its request timeout and, on a multidrop bus, selecting the address of its instrument before each of its
+requests.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+from pymodaq_utils.logger import set_logger, get_module_name
+
+logger = set_logger(get_module_name(__file__))
+
+
+def _serialized_attribute(link: Union['SharedLink', 'PluginLink'], name: str) -> Any:
+    """The attribute name of the wrapper within link, its methods being executed as requests of the link"""
+    attribute = getattr(link.controller, name)
+    if not callable(attribute):
+        return attribute
+
+    def serialized(*args, **kwargs):
+        return link.request(lambda controller: getattr(controller, name)(*args, **kwargs))
+    return serialized
+
+
+class SharedLink:
+    """ A communication link shared by several plugins, all requests being serialized
+
+    The link can be used in place of the instrument wrapper it holds: calling one of the wrapper methods on the link
+    executes it on the link worker thread and waits (at most timeout seconds) for its result.
+
+    Parameters
+    ----------
+    key: Hashable
+        The key of the link in the pool, for instance the name of the port
+    controller: object
+        The opened instrument wrapper
+    close_controller: Callable[[object], None] or None
+        Function closing the wrapper when the link is not used anymore
+    timeout: float or None
+        Default timeout of a request in seconds
+    select_address: Callable[[object, int], None] or None
+        Function selecting (with the wrapper) the instrument addressed by the next requests of a multidrop bus
+
+    Attributes
+    ----------
+    users: int
+        Number of plugins currently using the link
+    """
+
+    def __init__(self, key: Hashable, controller: Any, close_controller: Optional[Callable[[Any], None]] = None,
+                 timeout: Optional[float] = 1., select_address: Optional[Callable[[Any, int], None]] = None):
+        self.key = key
+        self.controller = controller
+        self.timeout = timeout
+        self.users = 0
+        self._close_controller = close_controller
+        self._select_address = select_address
+        self._address: Optional[int] = None  # selected on the bus, only accessed from the worker thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'link_{key}')
+        self._close_timer: Optional[threading.Timer] = None
+
+    def submit(self, function: Callable[[Any], Any], address: Optional[int] = None) -> Future:
+        """ Queue a request without waiting for it
+
+        Parameters
+        ----------
+        function: Callable[[object], Any]
+            Called with the instrument wrapper as argument on the link worker thread
+        address: int or None
+            Address of the instrument on a multidrop bus, selected before executing function if another one was
+            selected by the previous request
+
+        Returns
+        -------
+        Future: holding the result of function
+        """
+        if address is None:
+            return self._executor.submit(function, self.controller)
+        return self._executor.submit(self._addressed, function, address)
+
+    def _addressed(self, function: Callable[[Any], Any], address: int) -> Any:
+        if address != self._address and self._select_address is not None:
+            self._address = None  # unknown if the selection fails
+            self._select_address(self.controller, address)
+            self._address = address
+        return function(self.controller)
+
+    def request(self, function: Callable[[Any], Any], timeout: Optional[float] = -1,
+                address: Optional[int] = None) -> Any:
+        """ Execute a request and wait for its result
+
+        Parameters
+        ----------
+        function: Callable[[object], Any]
+            Called with the instrument wrapper as argument on the link worker thread
+        timeout: float or None
+            Maximum time in seconds to wait for the request to be executed (including the time spent waiting for the
+            previous requests of the queue), None to wait forever, -1 for the link default timeout
+        address: int or None
+            Address of the instrument on a multidrop bus, see submit
+
+        Raises
+        ------
+        TimeoutError: the request is cancelled if it didn't start yet
+        """
+        future = self.submit(function, address)
+        try:
+            return future.result(self.timeout if timeout == -1 else timeout)
+        except TimeoutError:
+            future.cancel()
+            raise TimeoutError(f'Request on link {self.key} timed out')
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_') or name == 'controller':  # not (yet) defined attributes of the link itself
+            raise AttributeError(name)
+        return _serialized_attribute(self, name)
+
+    def close(self):
+        """Close the underlying wrapper after the requests already queued"""
+        self._executor.shutdown(wait=True)
+        if self._close_controller is not None:
+            try:
+                self._close_controller(self.controller)
+            except Exception as e:
+                logger.warning(f'Error while closing the link {self.key}: {str(e)}')
+
+
+class PluginLink:
+    """ A SharedLink as used by one plugin: with its own request timeout and the address of its instrument
+
+    As the link itself, it can be used in place of the instrument wrapper. Changing its timeout doesn't change the
+    timeout of the other plugins sharing the link.
+
+    Parameters
+    ----------
+    link: SharedLink
+    address: int or None
+        Address of the instrument on a multidrop bus, sent with each request. None if not on a multidrop bus
+    timeout: float or None
+        Timeout of the requests in seconds, None to wait forever
+    """
+
+    def __init__(self, link: SharedLink, address: Optional[int] = None, timeout: Optional[float] = 1.):
+        self.link = link
+        self.address = address
+        self.timeout = timeout
+
+    @property
+    def controller(self) -> Any:
+        """The instrument wrapper of the link"""
+        return self.link.controller
+
+    def submit(self, function: Callable[[Any], Any]) -> Future:
+        """Queue a request to the instrument without waiting for it, see SharedLink.submit"""
+        return self.link.submit(function, self.address)
+
+    def request(self, function: Callable[[Any], Any], timeout: Optional[float] = -1) -> Any:
+        """Execute a request to the instrument and wait for its result, see SharedLink.request (-1 for the timeout
+        of this plugin)"""
+        return self.link.request(function, self.timeout if timeout == -1 else timeout, self.address)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_') or name in ('link', 'address', 'timeout'):
+            raise AttributeError(name)
+        return _serialized_attribute(self, name)
+
+
+class ControllerPool:
+    """ Registry of the opened SharedLink, keyed by port and instrument wrapper type
+
+    Parameters
+    ----------
+    linger: float
+        Time in seconds a link no longer used is kept open, so that a plugin re-initialization reuses it instead of
+        opening the port and handshaking again
+    """
+
+    def __init__(self, linger: float = 10.):
+        self.linger = linger
+        self._links: Dict[Tuple[str, Optional[type]], SharedLink] = {}
+        self._opening: Dict[Tuple[str, Optional[type]], Future] = {}  # links being opened, outside the lock
+        self._lock = threading.Lock()
+
+    def __contains__(self, port: str) -> bool:
+        """True if a link is opened on port"""
+        return any(key[0] == port for key in self._links)
+
+    def acquire(self, port: str, open_controller: Callable[[], Any],
+                close_controller: Optional[Callable[[Any], None]] = None, timeout: Optional[float] = 1.,
+                wrapper: Optional[type] = None, address: Optional[int] = None,
+                select_address: Optional[Callable[[Any, int], None]] = None) -> PluginLink:
+        """ Get the link corresponding to port and wrapper, opening it only if it is not already, for one plugin
+
+        The port is opened without holding the pool, so that a slow opening only delays the plugins waiting for this
+        same link. A link without port (empty string) is never shared: each call opens a new one.
+
+        Parameters
+        ----------
+        port: str
+            The name of the port
+        open_controller: Callable[[], object]
+            Function opening the communication and returning the instrument wrapper
+        close_controller: Callable[[object], None]
+            Function closing the wrapper
+        timeout: float or None
+            Timeout of the requests of this plugin
+        wrapper: type or None
+            Type of the instrument wrapper returned by open_controller: plugins using the same port with different
+            wrappers get different links
+        address: int or None
+            Address of the instrument on a multidrop bus, the returned PluginLink sending it with each request
+        select_address: Callable[[object, int], None] or None
+            Function selecting the addressed instrument with the wrapper, for a newly opened link
+        """
+        key = (port, wrapper)
+        if port == '':
+            link = SharedLink(key, open_controller(), close_controller, timeout, select_address)
+            link.users += 1
+            return PluginLink(link, address, timeout)
+        while True:
+            with self._lock:
+                link = self._links.get(key)
+                if link is not None:
+                    if link._close_timer is not None:
+                        link._close_timer.cancel()
+                        link._close_timer = None
+                    link.users += 1
+                    return PluginLink(link, address, timeout)
+                opening = self._opening.get(key)
+                if opening is None:
+                    opening = self._opening[key] = Future()
+                    break
+            opening.result()  # opened by another plugin meanwhile (raising its error), registered unless closed since
+        try:
+            link = SharedLink(key, open_controller(), close_controller, timeout, select_address)
+        except Exception as e:
+            with self._lock:
+                del self._opening[key]
+            opening.set_exception(e)
+            raise
+        with self._lock:
+            self._links[key] = link
+            del self._opening[key]
+            link.users += 1
+        opening.set_result(link)
+        return PluginLink(link, address, timeout)
+
+    def release(self, link: Union[SharedLink, PluginLink]):
+        """Stop using a link, it is closed after the linger time if no other plugin uses it meanwhile"""
+        if isinstance(link, PluginLink):
+            link = link.link
+        with self._lock:
+            link.users -= 1
+            if link.users > 0:
+                return
+            if self._links.get(link.key) is link:  # else a link without port, never shared
+                if self.linger > 0:
+                    link._close_timer = threading.Timer(self.linger, self._close_if_unused, (link,))
+                    link._close_timer.daemon = True
+                    link._close_timer.start()
+                    return
+                del self._links[link.key]
+        link.close()
+
+    def _close_if_unused(self, link: SharedLink):
+        with self._lock:
+            if link.users > 0 or self._links.get(link.key) is not link:
+                return
+            del self._links[link.key]
+            link._close_timer = None
+        link.close()
+
+    def close_all(self):
+        """Close all the links whatever their users"""
+        with self._lock:
+            links = list(self._links.values())
+            self._links.clear()
+        for link in links:
+            if link._close_timer is not None:
+                link._close_timer.cancel()
+            link.close()
+
+
+controller_pool = ControllerPool()
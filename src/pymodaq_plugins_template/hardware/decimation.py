@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Reduction of the data sent to the live display, independently of the acquisition rate
+
+The full-rate data are still emitted for saving (with the *do_plot* extra attribute set to False) while the display
+gets a decimated copy (with *do_save* set to False) recomputed at most refresh_rate times per second:
+
+* successive 0D readings are accumulated between two refreshes and shown as their mean, min and/or max
+* 1D/2D data are reduced to at most max_points points per dimension by taking the mean, min, max or the min/max
+  envelope of consecutive buckets, so that peaks and glitches remain visible
+"""
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+DECIMATION_METHODS = ('min/max', 'mean', 'min', 'max')
+
+
+def _bucket_starts(size: int, max_points: int) -> np.ndarray:
+    bucket = -(-size // max(max_points, 1))  # ceil
+    return np.arange(0, size, bucket)
+
+
+def decimate(data: np.ndarray, max_points: int, method: str = 'min/max', axis: int = -1) -> np.ndarray:
+    """ Reduce data along axis to at most max_points buckets of consecutive points
+
+    Parameters
+    ----------
+    data: np.ndarray
+    max_points: int
+        Maximum number of buckets, data already small enough are returned as is
+    method: str
+        One of DECIMATION_METHODS. 'min/max' returns the min and max of each bucket interleaved (two points per bucket)
+    axis: int
+
+    Returns
+    -------
+    np.ndarray
+    """
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f'Unknown decimation method {method}, should be one of {DECIMATION_METHODS}')
+    size = data.shape[axis]
+    if method == 'min/max':
+        max_points //= 2
+    if size <= max(max_points, 1):
+        return data
+    starts = _bucket_starts(size, max_points)
+    if method == 'mean':
+        counts = np.diff(np.append(starts, size))
+        shape = [1] * data.ndim
+        shape[axis] = len(starts)
+        return np.add.reduceat(data, starts, axis=axis, dtype=np.float64) / counts.reshape(shape)
+    if method == 'min':
+        return np.minimum.reduceat(data, starts, axis=axis)
+    if method == 'max':
+        return np.maximum.reduceat(data, starts, axis=axis)
+    envelope = np.stack([np.minimum.reduceat(data, starts, axis=axis),
+                         np.maximum.reduceat(data, starts, axis=axis)], axis=axis % data.ndim + 1)
+    shape = list(data.shape)
+    shape[axis] = 2 * len(starts)
+    return envelope.reshape(shape)
+
+
+def decimate_axis(axis_data: np.ndarray, max_points: int, method: str = 'min/max') -> np.ndarray:
+    """ Axis values matching the data decimated with the same max_points and method: the bucket centers"""
+    centers = decimate(axis_data, max_points // 2 if method == 'min/max' else max_points, 'mean')
+    if method == 'min/max' and len(centers) < len(axis_data):
+        return np.repeat(centers, 2)
+    return centers
+
+
+class DisplayDecimator:
+    """ Rate limiter and accumulator of the data sent to the live display
+
+    Parameters
+    ----------
+    refresh_rate: float
+        Maximum number of display refreshes per second
+    method: str
+        One of DECIMATION_METHODS
+    max_points: int
+        Maximum number of displayed points per dimension (1D/2D)
+    """
+
+    def __init__(self, refresh_rate: float = 10., method: str = 'min/max', max_points: int = 1000):
+        self.refresh_rate = refresh_rate
+        self.method = method
+        self.max_points = max_points
+        self._last_refresh = -np.inf
+        self._count = 0
+        self._sum: Optional[np.ndarray] = None
+        self._min: Optional[np.ndarray] = None
+        self._max: Optional[np.ndarray] = None
+
+    def ready(self, now: float = None) -> bool:
+        """True (and the refresh time reset) if the display may be refreshed"""
+        now = time.perf_counter() if now is None else now
+        if now - self._last_refresh < 1 / self.refresh_rate:
+            return False
+        self._last_refresh = now
+        return True
+
+    def force_refresh(self):
+        """Let the next call to ready return True, for instance when the display settings changed"""
+        self._last_refresh = -np.inf
+
+    def accumulate(self, values: Sequence[float]):
+        """Add one 0D reading per channel (or an array (n_readings, n_channels)) to the current refresh period"""
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        if self._count == 0:
+            self._sum = values.sum(axis=0)
+            self._min = values.min(axis=0)
+            self._max = values.max(axis=0)
+        else:
+            self._sum += values.sum(axis=0)
+            np.minimum(self._min, values.min(axis=0), out=self._min)
+            np.maximum(self._max, values.max(axis=0), out=self._max)
+        self._count += len(values)
+
+    def reduce(self) -> List[np.ndarray]:
+        """ Reduce the readings accumulated since the last call as a list of 0D arrays
+
+        One array per channel, or two (min then max) with the 'min/max' method, see labels
+        """
+        if self._count == 0:
+            return []
+        count, self._count = self._count, 0
+        if self.method == 'min/max':
+            return [np.array([value]) for pair in zip(self._min, self._max) for value in pair]
+        reduced = dict(mean=self._sum / count, min=self._min, max=self._max)[self.method]
+        return [np.array([value]) for value in reduced]
+
+    def labels(self, labels: Sequence[str]) -> List[str]:
+        """Labels of the arrays returned by reduce from the labels of the accumulated channels"""
+        if self.method == 'min/max':
+            return [f'{label}_{suffix}' for label in labels for suffix in ('min', 'max')]
+        return [f'{label}_{self.method}' for label in labels]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """ Indices of the points kept by the Largest-Triangle-Three-Buckets downsampling
+
+    The first and last points are kept, the others are split in n_out - 2 buckets of consecutive points and the point
+    of each bucket forming the largest triangle with the point kept in the previous bucket and the mean of the next
+    bucket is kept, so that the downsampled curve keeps the visual shape (peaks included) of the full one.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        Increasing abscissa
+    y: np.ndarray
+    n_out: int
+        Number of points to keep, all the points are kept if there are not more of them (or if n_out < 3)
+
+    Returns
+    -------
+    np.ndarray: the sorted indices of the kept points
+    """
+    size = len(x)
+    if n_out >= size or n_out < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=np.float64) - x[0]  # relative values for the cumulated sums
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, size - 1, n_out - 1).astype(np.intp)
+    cum_x = np.concatenate(([0.], np.cumsum(x)))
+    cum_y = np.concatenate(([0.], np.cumsum(y)))
+    counts = np.append(np.diff(edges), 1)
+    # mean of the next bucket of each bucket, the last point for the last bucket
+    next_x = np.append((cum_x[edges[2:]] - cum_x[edges[1:-1]]) / counts[1:-1], x[-1])
+    next_y = np.append((cum_y[edges[2:]] - cum_y[edges[1:-1]]) / counts[1:-1], y[-1])
+    indices = np.empty((n_out,), dtype=np.intp)
+    indices[0] = 0
+    indices[-1] = size - 1
+    kept = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        x_kept, y_kept = x[kept], y[kept]
+        # twice the triangle areas, the common factor does not change the largest one
+        areas = np.abs((x_kept - next_x[bucket]) * (y[start:stop] - y_kept)
+                       - (x_kept - x[start:stop]) * (next_y[bucket] - y_kept))
+        kept = start + int(np.argmax(areas))
+        indices[bucket + 1] = kept
+    return indices
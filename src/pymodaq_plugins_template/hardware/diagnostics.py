@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in timing instrumentation of the plugin hot paths
+
+:class:`Diagnostics` records the duration of each call of some plugin methods (grab_data, callback, move_abs...) in
+log-binned :class:`LatencyHistogram` and shows their percentiles in the read-only diagnostics group of the plugin
+settings (see :func:`diagnostics_params`), at most once per report interval. The timed wrappers are only installed on
+the plugin instance while the diagnostics are enabled: disabled, the methods are called exactly as without
+instrumentation. Events worth counting (for instance the targets overwritten by newer ones) are shown along with them.
+"""
+import functools
+import json
+import math
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Union
+
+import numpy as np
+
+from pymodaq_utils.logger import set_logger, get_module_name
+
+logger = set_logger(get_module_name(__file__))
+
+DIAGNOSTICS_PARAMS = ('diagnostics_enabled', 'overrun_threshold', 'dump', 'reset_diagnostics')
+
+
+def diagnostics_params(methods: Sequence[str], counters: Sequence[str] = ()) -> List[dict]:
+    """ The diagnostics group to be added to the plugin params
+
+    Parameters
+    ----------
+    methods: list of str
+        Names of the instrumented methods, one read-only entry is shown for each
+    counters: list of str
+        Names of the counted events, one read-only entry is shown for each
+    """
+    return [{'title': 'Diagnostics:', 'name': 'diagnostics', 'type': 'group', 'expanded': False, 'children': [
+        {'title': 'Enabled:', 'name': 'diagnostics_enabled', 'type': 'bool', 'value': False,
+         'tip': 'Record the duration of each call of the methods below'},
+        {'title': 'Overrun threshold (ms):', 'name': 'overrun_threshold', 'type': 'float', 'value': 100., 'min': 0.,
+         'tip': 'Calls lasting longer are counted as overruns'},
+        {'title': 'Dump file:', 'name': 'dump_file', 'type': 'browsepath', 'value': '', 'filetype': True,
+         'tip': 'json file the histograms are dumped to, <plugin class>_diagnostics.json if empty'},
+        {'title': 'Dump:', 'name': 'dump', 'type': 'bool_push', 'value': False, 'label': 'Dump'},
+        {'title': 'Reset:', 'name': 'reset_diagnostics', 'type': 'bool_push', 'value': False, 'label': 'Reset'},
+        {'title': 'Latencies (ms):', 'name': 'latencies', 'type': 'group', 'children': [
+            {'title': f'{method}:', 'name': method, 'type': 'str', 'value': '', 'readonly': True}
+            for method in methods]},
+        {'title': 'Counters:', 'name': 'counters', 'type': 'group', 'visible': len(counters) > 0, 'children': [
+            {'title': f'{counter}:', 'name': counter, 'type': 'int', 'value': 0, 'readonly': True}
+            for counter in counters]},
+    ]}]
+
+
+class LatencyHistogram:
+    """ Histogram of durations with logarithmic bins, from 1 µs to 100 s
+
+    Recording a duration is O(1) and the memory is constant whatever the number of calls
+
+    Parameters
+    ----------
+    overrun_threshold: float
+        Durations (in seconds) above are counted as overruns
+    """
+    bins_per_decade = 20
+    min_duration = 1e-6
+    decades = 8
+
+    def __init__(self, overrun_threshold: float = 0.1):
+        self.overrun_threshold = overrun_threshold
+        # bin 0 holds the durations below min_duration, the last one those above the maximum
+        self.counts = np.zeros(self.bins_per_decade * self.decades + 2, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        self.counts[:] = 0
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+        self.overruns = 0
+
+    @classmethod
+    def edges(cls) -> np.ndarray:
+        """Upper edges (in seconds) of the bins"""
+        edges = cls.min_duration * 10 ** (np.arange(cls.bins_per_decade * cls.decades + 1) / cls.bins_per_decade)
+        return np.append(edges, np.inf)
+
+    def record(self, duration: float):
+        if duration < self.min_duration:
+            index = 0
+        else:
+            index = min(int(math.log10(duration / self.min_duration) * self.bins_per_decade) + 1,
+                        self.counts.size - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        if duration > self.overrun_threshold:
+            self.overruns += 1
+
+    def percentile(self, q: float) -> float:
+        """Upper edge (in seconds, capped by the maximum duration) of the bin holding the q-th percentile"""
+        if self.count == 0:
+            return math.nan
+        index = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.count))
+        return min(self.edges()[index], self.max)
+
+    def summary(self) -> Dict[str, Union[int, float]]:
+        """Count, overruns and mean, p50, p95, p99, max durations in ms"""
+        mean = self.total / self.count if self.count else math.nan
+        return dict(count=self.count, overruns=self.overruns, mean_ms=mean * 1000,
+                    p50_ms=self.percentile(50) * 1000, p95_ms=self.percentile(95) * 1000,
+                    p99_ms=self.percentile(99) * 1000, max_ms=self.max * 1000)
+
+
+class Diagnostics:
+    """ Timing of some methods of a plugin
+
+    Parameters
+    ----------
+    plugin: object
+        The instrument plugin (or any object) whose methods are timed
+    methods: list of str
+        Names of the timed methods
+    settings: Parameter or None
+        The plugin settings holding the group created by diagnostics_params, updated every report_interval. Its
+        enabled and overrun threshold values are applied at once
+    report_interval: float
+        Minimum time in seconds between two updates of the settings
+    counters: list of str
+        Names of the events counted with the count method, whether the timing is enabled or not
+    """
+
+    def __init__(self, plugin: Any, methods: Sequence[str], settings=None, report_interval: float = 1.,
+                 counters: Sequence[str] = ()):
+        self.plugin = plugin
+        self.methods = list(methods)
+        self.settings = settings
+        self.report_interval = report_interval
+        self.histograms = {method: LatencyHistogram() for method in self.methods}
+        self.counters: Dict[str, int] = {counter: 0 for counter in counters}
+        self._enabled = False
+        self._last_report = 0.
+        self.update_from_settings()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, enabled: bool):
+        if enabled and not self._enabled:
+            for method in self.methods:
+                setattr(self.plugin, method, self._timed(method))
+        elif not enabled and self._enabled:
+            for method in self.methods:
+                self.plugin.__dict__.pop(method, None)  # back to the class method, no overhead left
+        self._enabled = enabled
+
+    @property
+    def overrun_threshold(self) -> float:
+        return self.histograms[self.methods[0]].overrun_threshold if self.methods else math.nan
+
+    @overrun_threshold.setter
+    def overrun_threshold(self, threshold: float):
+        for histogram in self.histograms.values():
+            histogram.overrun_threshold = threshold
+
+    def _timed(self, method: str):
+        function = getattr(type(self.plugin), method).__get__(self.plugin)
+        histogram = self.histograms[method]
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                histogram.record(end - start)
+                if end - self._last_report > self.report_interval:
+                    self._last_report = end
+                    self.report()
+        return timed
+
+    def count(self, counter: str, increment: int = 1):
+        """Count increment events of one of the counters, shown at the next report (at most every report_interval)"""
+        self.counters[counter] += increment
+        now = time.perf_counter()
+        if now - self._last_report > self.report_interval:
+            self._last_report = now
+            self.report()
+
+    def summary(self) -> Dict[str, Dict[str, Union[int, float]]]:
+        return {method: histogram.summary() for method, histogram in self.histograms.items()}
+
+    def report(self):
+        """Show the current percentiles in the read-only entries of the diagnostics group"""
+        if self.settings is None:
+            return
+        for method, summary in self.summary().items():
+            self.settings.child('diagnostics', 'latencies', method).setValue(
+                f"n={summary['count']} p50={summary['p50_ms']:.3g} p95={summary['p95_ms']:.3g} "
+                f"p99={summary['p99_ms']:.3g} max={summary['max_ms']:.3g} overruns={summary['overruns']}")
+        for counter, value in self.counters.items():
+            self.settings.child('diagnostics', 'counters', counter).setValue(value)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.counters = dict.fromkeys(self.counters, 0)
+        self.report()
+
+    def dump(self, path: Union[str, Path] = '') -> Path:
+        """Save the summaries and the histograms as json, returns the file path"""
+        path = Path(path) if str(path) else Path(f'{type(self.plugin).__name__}_diagnostics.json')
+        # upper edges of the bins, the last bin (durations above the last edge) has none
+        content = dict(plugin=type(self.plugin).__name__, time=time.time(),
+                       bin_edges_s=LatencyHistogram.edges()[:-1].tolist(),
+                       methods={method: dict(self.histograms[method].summary(),
+                                             counts=self.histograms[method].counts.tolist())
+                                for method in self.methods},
+                       counters=self.counters)
+        path.write_text(json.dumps(content, indent=2))
+        logger.info(f'Diagnostics of {content["plugin"]} dumped to {path}')
+        return path
+
+    def update_from_settings(self):
+        """Apply the enabled and overrun threshold settings, including the ones loaded from a preset"""
+        if self.settings is None:
+            return
+        self.overrun_threshold = self.settings['diagnostics', 'overrun_threshold'] / 1000
+        self.enabled = self.settings['diagnostics', 'diagnostics_enabled']
+
+    def commit_settings(self, param):
+        """Apply a change of one of the DIAGNOSTICS_PARAMS"""
+        if param.name() == 'diagnostics_enabled':
+            self.enabled = param.value()
+        elif param.name() == 'overrun_threshold':
+            self.overrun_threshold = param.value() / 1000
+        elif param.name() == 'dump' and param.value():
+            self.dump(self.settings['diagnostics', 'dump_file'] if self.settings is not None else '')
+        elif param.name() == 'reset_diagnostics' and param.value():
+            self.reset()
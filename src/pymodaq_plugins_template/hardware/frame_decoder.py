@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Decoding of the ASCII frames output by balances, such as ``b'ST,GS,   12.345 g\\r\\n'``
+
+A frame is made of a stability field (ST: stable, US: unstable, OL: overload), a gross/net field (GS or NT), the
+value (optionally signed, blank padded, at most one decimal point and no exponent), one or more blanks and its unit
+(one of UNITS, lower case). :class:`FrameDecoder` decodes a whole chunk of bytes holding many frames with a handful
+of vectorized numpy operations while :func:`parse_frame` is the straightforward per-line reference implementation.
+Any frame not matching this layout is invalid.
+"""
+import re
+from typing import Tuple, Union
+
+import numpy as np
+
+UNITS = ('g', 'kg', 'mg', 'ct', 'lb', 'oz', 'ozt', 'dwt', 'gn', 'pcs')
+UNKNOWN_UNIT = 255
+
+FRAME_DTYPE = np.dtype([('value', np.float64), ('unit', np.uint8), ('stable', np.bool_), ('net', np.bool_)])
+
+_UNIT_WIDTH = 3
+_POW10 = 10 ** np.arange(19, dtype=np.int64)
+_FRAME_PATTERN = re.compile(rb'([^,]{2}),([^,]{2}), *([+-]?(?:\d+\.?\d*|\.\d+)) +([a-z]+) *')
+_IS_VALUE_CHARACTER = np.zeros((256,), dtype=bool)  # lookup tables indexed by the byte values
+_IS_VALUE_CHARACTER[list(b' +-.0123456789')] = True
+_IS_END_CHARACTER = np.zeros((256,), dtype=bool)
+_IS_END_CHARACTER[list(b'\x00\r\n')] = True
+
+
+def _encode_unit(unit: str) -> np.ndarray:
+    encoded = np.zeros((_UNIT_WIDTH,), dtype=np.uint8)
+    encoded[:len(unit)] = np.frombuffer(unit.encode(), dtype=np.uint8)
+    return encoded
+
+
+_ENCODED_UNITS = np.stack([_encode_unit(unit) for unit in UNITS])
+
+
+def unit_code(unit: str) -> int:
+    """Get the code stored in the unit field of FRAME_DTYPE arrays from the unit string"""
+    try:
+        return UNITS.index(unit)
+    except ValueError:
+        return UNKNOWN_UNIT
+
+
+def parse_frame(line: bytes) -> Tuple[float, int, bool, bool]:
+    """ Parse a single frame, line by line reference implementation
+
+    Parameters
+    ----------
+    line: bytes
+        One frame, with or without its line termination
+
+    Returns
+    -------
+    tuple: value (nan if invalid or overload), unit code, stable flag, net flag
+    """
+    match = _FRAME_PATTERN.fullmatch(line.rstrip(b'\r\n'))
+    if match is None or unit_code(match[4].decode()) == UNKNOWN_UNIT:
+        return float('nan'), UNKNOWN_UNIT, False, False
+    status, kind, value, unit = match.groups()
+    value = float('nan') if status == b'OL' else float(value)
+    return value, unit_code(unit.decode()), status == b'ST', kind == b'NT'
+
+
+class FrameDecoder:
+    """ Bulk decoder of balance frames
+
+    Bytes following the last line termination of a chunk (a partial frame) are kept and prepended to the next chunk.
+    Invalid frames (error messages, garbage...) are decoded as nan values with an unknown unit.
+
+    Examples
+    --------
+    >>> decoder = FrameDecoder()
+    >>> frames = decoder.decode(b'ST,GS,   12.345 g\\r\\nUS,NT,   -0.2')
+    >>> frames['value']
+    array([12.345])
+    >>> decoder.decode(b'1 kg\\r\\n')['value']
+    array([-0.21])
+    """
+
+    def __init__(self):
+        self._remainder = b''
+
+    def reset(self):
+        """Drop the partial frame kept from the previous chunk"""
+        self._remainder = b''
+
+    def decode(self, chunk: Union[bytes, bytearray, memoryview]) -> np.ndarray:
+        """ Decode all the complete frames contained in chunk (and in the partial frame of the previous call)
+
+        Returns
+        -------
+        ndarray: array of FRAME_DTYPE with one element per frame
+        """
+        data = self._remainder + bytes(chunk)
+        end = data.rfind(b'\n')
+        if end < 0:
+            self._remainder = data
+            return np.zeros((0,), dtype=FRAME_DTYPE)
+        self._remainder = data[end + 1:]
+        return self.decode_lines(data[:end])
+
+    @staticmethod
+    def decode_lines(data: bytes) -> np.ndarray:
+        """Decode complete frames separated by line terminations (without partial frame handling)"""
+        frames = _frames_as_array(data)
+        decoded = np.zeros((frames.shape[0],), dtype=FRAME_DTYPE)
+        if frames.shape[1] < 7:
+            decoded['value'] = np.nan
+            decoded['unit'] = UNKNOWN_UNIT
+            return decoded
+
+        status = frames[:, 0].astype(np.uint16) << 8 | frames[:, 1]
+        kind = frames[:, 3].astype(np.uint16) << 8 | frames[:, 4]
+        valid = (frames[:, 2] == ord(',')) & (frames[:, 5] == ord(','))
+        valid &= np.all(frames[:, [0, 1, 3, 4]] != ord(','), axis=1)  # two characters fields
+
+        parsed = _parse_uniform_body(frames[:, 6:])
+        if parsed is None:
+            parsed = _parse_body(frames[:, 6:])
+        values, codes, parsed_ok = parsed
+
+        valid &= parsed_ok
+        values[~valid | (status == (ord('O') << 8 | ord('L')))] = np.nan
+        codes[~valid] = UNKNOWN_UNIT
+
+        decoded['value'] = values
+        decoded['unit'] = codes
+        decoded['stable'] = valid & (status == (ord('S') << 8 | ord('T')))
+        decoded['net'] = valid & (kind == (ord('N') << 8 | ord('T')))
+        return decoded
+
+
+def _frames_as_array(data: bytes) -> np.ndarray:
+    """ Get the frames contained in data as a 2D uint8 array, one frame per row
+
+    Balances usually output fixed width frames: the buffer is then simply reshaped (no copy) otherwise the frames
+    are NUL padded to the longest one. Empty lines are removed.
+    """
+    buffer = np.frombuffer(data + b'\n', dtype=np.uint8)
+    ends = np.flatnonzero(buffer == ord('\n'))
+    width = ends[0] + 1
+    if np.all(np.diff(ends) == width):
+        frames = buffer.reshape((ends.size, width))
+    else:
+        lines = np.array(data.split(b'\n'))
+        frames = lines.view(np.uint8).reshape((lines.shape[0], lines.dtype.itemsize))
+    return frames[(frames[:, 0] != 0) & (frames[:, 0] != ord('\r')) & (frames[:, 0] != ord('\n'))]
+
+
+def _is_lower(array: np.ndarray) -> np.ndarray:
+    return (array >= ord('a')) & (array <= ord('z'))
+
+
+def _parse_uniform_body(body: np.ndarray):
+    """ Fast path when all frames share the layout (and unit) of the first one
+
+    The value field is then parsed in one go by numpy, returns None if the layout is not uniform or if any frame is
+    invalid (left to the general path)
+    """
+    if body.shape[0] == 0:
+        return None
+    first = body[0]
+    letters = np.flatnonzero(_is_lower(first))
+    if letters.size == 0 or letters[0] == 0 or first[letters[0] - 1] != ord(' '):
+        return None
+    unit_start = letters[0]
+    unit_end = unit_start
+    while unit_end < first.size and _is_lower(first[unit_end]):
+        unit_end += 1
+    code = unit_code(bytes(first[unit_start:unit_end]).decode())
+    trailer = first[unit_end:]
+    blanks = np.count_nonzero(np.cumprod(trailer == ord(' ')))
+    if code == UNKNOWN_UNIT or not np.all(_IS_END_CHARACTER[trailer[blanks:]]):
+        return None
+    if not np.all(body[:, unit_start - 1:] == first[unit_start - 1:]):
+        return None
+    value_fields = np.ascontiguousarray(body[:, :unit_start])
+    if not np.all(_IS_VALUE_CHARACTER[value_fields]):  # else float() would accept exponents, nan, inf...
+        return None
+    try:  # blanks only around the value, a single sign and decimal point, as float()
+        values = value_fields.view(f'S{unit_start}').ravel().astype(np.float64)
+    except ValueError:
+        return None
+    return values, np.full(values.shape, code, dtype=np.uint8), np.ones(values.shape, dtype=bool)
+
+
+def _parse_body(body: np.ndarray):
+    """ General path: value and unit fields are located and the digits converted frame by frame but vectorized
+
+    The body of a frame is valid if made of two blank separated fields, the value and the unit, followed only by
+    blanks and line termination (or padding). Returns the values, unit codes and a validity mask
+    """
+    columns = np.arange(body.shape[1])
+    is_end = _IS_END_CHARACTER[body]
+    end_column = np.where(is_end.any(axis=1), is_end.argmax(axis=1), body.shape[1])
+    content = columns < end_column[:, np.newaxis]
+    fields = content & (body != ord(' '))
+    starts = fields & ~np.pad(fields[:, :-1], ((0, 0), (1, 0)))
+    field_index = starts.cumsum(axis=1)
+    valid = (is_end | content).all(axis=1) & (field_index[:, -1] == 2)
+
+    in_value = fields & (field_index == 1)
+    value_start = starts.argmax(axis=1)
+    digits = (body >= ord('0')) & (body <= ord('9')) & in_value
+    dots = (body == ord('.')) & in_value
+    signs = ((body == ord('-')) | (body == ord('+'))) & in_value
+    valid &= (in_value == (digits | dots | signs)).all(axis=1) & digits.any(axis=1) & (dots.sum(axis=1) <= 1)
+    valid &= ~(signs & (columns != value_start[:, np.newaxis])).any(axis=1)  # a sign only ahead of the value
+
+    dot_column = np.where(dots.any(axis=1), dots.argmax(axis=1), body.shape[1])
+    decimals = (digits & (columns > dot_column[:, np.newaxis])).sum(axis=1)
+    # power of ten of each digit: number of digits on its right
+    powers = np.minimum(digits[:, ::-1].cumsum(axis=1)[:, ::-1] - digits, _POW10.size - 1)
+    mantissa = (np.where(digits, body - ord('0'), 0) * _POW10[powers]).sum(axis=1)
+    values = mantissa / _POW10[np.minimum(decimals, _POW10.size - 1)].astype(np.float64)
+    values[((body == ord('-')) & in_value).any(axis=1)] *= -1
+
+    in_unit = fields & (field_index == 2)
+    unit_start = (starts & (field_index == 2)).argmax(axis=1)
+    valid &= (in_unit == (in_unit & _is_lower(body))).all(axis=1) & (in_unit.sum(axis=1) <= _UNIT_WIDTH)
+    unit_columns = unit_start[:, np.newaxis] + np.arange(_UNIT_WIDTH)
+    clipped = np.minimum(unit_columns, body.shape[1] - 1)
+    units = np.take_along_axis(body, clipped, axis=1)
+    units[~np.take_along_axis(in_unit, clipped, axis=1) | (unit_columns >= body.shape[1])] = 0
+    matches = (units[:, np.newaxis, :] == _ENCODED_UNITS[np.newaxis, :, :]).all(axis=2)
+    valid &= matches.any(axis=1)
+    codes = np.where(matches.any(axis=1), matches.argmax(axis=1), UNKNOWN_UNIT).astype(np.uint8)
+    return values, codes, valid
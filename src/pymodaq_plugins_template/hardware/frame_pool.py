@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Preallocated camera frames recycled once the consumers of the emitted data released them
+
+Allocating (and often zeroing) a new megapixel array for every frame, then copying the driver buffer into it, puts
+most of the cost of a fast camera plugin in the memory allocator and the garbage collector. A :class:`FramePool`
+holds a few preallocated frames (double/triple buffering) that the driver reads into directly, the frames being
+emitted as views without any copy. The consumers of the emitted data (viewers, saving) have no release call: a frame
+is free again once the view handed out for it, and so every array derived from it, is gone, which the pool knows from
+a weak reference to the view. The pooled frames are of a private ndarray subclass so that numpy does not collapse the
+base of the derived arrays past the handed out view. When all the frames are in use, the pool grows (up to max_size
+frames, allocating unpooled frames beyond) so that the acquisition never waits for the consumers.
+
+The pymodaq data objects holding reference cycles, the frames they wrap are released when the garbage collector
+collects them, not as soon as the consumers drop them: the pool settles to a few more frames than the consumers
+hold at once. Collecting explicitly when the pool is exhausted would promote the data still held to the oldest
+generation, delaying their release much more.
+"""
+import weakref
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class _PooledFrame(np.ndarray):
+    """Memory of a pooled frame, the arrays derived from its handed out view keeping the view alive"""
+
+
+class FramePool:
+    """ Preallocated frames of a given shape and dtype, handed out as views and recycled when released
+
+    Parameters
+    ----------
+    shape: tuple of int
+        Shape of a frame
+    dtype: numpy dtype
+    size: int
+        Number of frames preallocated
+    max_size: int
+        Maximum number of pooled frames, the pool growing when all its frames are in use
+
+    Attributes
+    ----------
+    allocated: int
+        Number of frames allocated since the creation of the pool (including the unpooled ones)
+    hits: int
+        Number of frames handed out from the pool, without allocation
+    """
+
+    def __init__(self, shape: Tuple[int, ...], dtype=np.float64, size: int = 3, max_size: int = 16):
+        if size < 1 or max_size < size:
+            raise ValueError(f'Invalid FramePool sizes: size={size}, max_size={max_size}')
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.max_size = max_size
+        self._frames: List[np.ndarray] = []
+        self._views: List[Optional[weakref.ref]] = []  # the view handed out for each frame
+        self._next = 0
+        self.allocated = 0
+        self.hits = 0
+        for _ in range(size):
+            self._frames.append(self._allocate())
+            self._views.append(None)
+
+    def __len__(self) -> int:
+        """Number of pooled frames"""
+        return len(self._frames)
+
+    @property
+    def in_use(self) -> int:
+        """Number of pooled frames still referred to by a consumer"""
+        return sum(not self._is_free(index) for index in range(len(self._frames)))
+
+    def _allocate(self) -> np.ndarray:
+        self.allocated += 1
+        return _PooledFrame(self.shape, dtype=self.dtype)  # owning its memory, else the views would skip it
+
+    def _is_free(self, index: int) -> bool:
+        return self._views[index] is None or self._views[index]() is None
+
+    def _hand_out(self, index: int) -> np.ndarray:
+        view = self._frames[index].view(np.ndarray)
+        self._views[index] = weakref.ref(view)
+        return view
+
+    def acquire(self) -> np.ndarray:
+        """ A frame no consumer refers to anymore, with the content of its previous use, to be filled by the driver
+
+        The frames are handed out in turn, so that a frame just emitted is the last one to be reused. The returned
+        array is a view: the frame is in use as long as it, or any array derived from it, is referred to.
+        """
+        for offset in range(len(self._frames)):
+            index = (self._next + offset) % len(self._frames)
+            if self._is_free(index):
+                self._next = index + 1
+                self.hits += 1
+                return self._hand_out(index)
+        frame = self._allocate()  # all the frames are in use
+        if len(self._frames) < self.max_size:
+            self._frames.append(frame)
+            self._views.append(None)
+            return self._hand_out(len(self._frames) - 1)
+        return frame.view(np.ndarray)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-axis moves of the axes of one controller sent as a single transaction
+
+Each axis of a multi-axes controller is its own DAQ_Move plugin instance (a master and its slaves sharing the same
+controller): when DAQ_Scan moves three axes, three commands are sent one after the other and three polling loops
+query the same controller. A :class:`MoveBatcher` is shared by all the plugins of a controller (see
+:meth:`MoveBatcher.shared`): the targets submitted by the axes within a short window (or until every axis has
+submitted one) are sent as a single command, then the positions of all the moving axes are read with a single query
+per poll (the polling interval being adapted as in :class:`AdaptivePolling`) and pushed to each axis plugin, which
+ends its move when its own position is reached. An axis is not polled anymore once it left the batch or its move
+timed out.
+"""
+import math
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from pymodaq_utils.logger import set_logger, get_module_name
+
+from .move_completion import AdaptivePolling
+
+logger = set_logger(get_module_name(__file__))
+
+_batchers: 'weakref.WeakKeyDictionary[Any, MoveBatcher]' = weakref.WeakKeyDictionary()
+_batchers_lock = threading.Lock()
+
+
+class MoveBatcher:
+    """ Collects the targets of several axes of a controller and sends them as one command with one completion wait
+
+    Parameters
+    ----------
+    send_targets: Callable[[Dict[Hashable, float]], None]
+        Sends the absolute targets of several axes (in controller units), as a single command if the protocol allows
+        it. Called from the batcher thread
+    read_positions: Callable[[List[Hashable]], Dict[Hashable, float]]
+        Reads the positions of several axes, with a single query if the protocol allows it. Called from the batcher
+        thread
+    window: float
+        Time in seconds the targets are collected after the first one, unless all the joined axes submitted one
+    polling: AdaptivePolling or None
+        Interval between the position queries while axes are moving
+    on_error: Callable[[Exception], None] or None
+        Called with the exceptions raised by send_targets and read_positions, they are logged if None
+
+    Attributes
+    ----------
+    commands: int
+        Number of commands sent (each holding the targets of one or several axes)
+    queries: int
+        Number of position queries (each for all the moving axes)
+    """
+
+    def __init__(self, send_targets: Callable[[Dict[Hashable, float]], None],
+                 read_positions: Callable[[List[Hashable]], Dict[Hashable, float]],
+                 window: float = 0.005, polling: Optional[AdaptivePolling] = None,
+                 on_error: Optional[Callable[[Exception], None]] = None):
+        self._send_targets = send_targets
+        self._read_positions = read_positions
+        self.window = window
+        self.polling = polling if polling is not None else AdaptivePolling()
+        self._on_error = on_error
+        self._condition = threading.Condition()
+        self._axes: Dict[Hashable, Callable[[float, bool], None]] = {}
+        self._pending: Dict[Hashable, Tuple[float, float, float]] = {}  # target, tolerance, timeout
+        self._first_submit = 0.
+        # target, tolerance and deadline of the moving axes, only used by the batcher thread
+        self._moving: Dict[Hashable, Tuple[float, float, float]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self.commands = 0
+        self.queries = 0
+
+    @classmethod
+    def shared(cls, controller: Any, *args, **kwargs) -> 'MoveBatcher':
+        """ The batcher of the axes of controller, created with the given arguments by the first plugin asking
+
+        The batcher is dropped when its last axis leaves
+        """
+        with _batchers_lock:
+            if controller not in _batchers:
+                _batchers[controller] = cls(*args, **kwargs)
+            return _batchers[controller]
+
+    @property
+    def axes(self) -> List[Hashable]:
+        with self._condition:
+            return list(self._axes)
+
+    def join(self, axis: Hashable, push: Callable[[float, bool], None]):
+        """ Add an axis to the batch
+
+        Parameters
+        ----------
+        axis: Hashable
+            The axis identifier, as expected by send_targets and read_positions
+        push: Callable[[float, bool], None]
+            Called (from the batcher thread) with the position of the axis and whether it is still moving, at each
+            poll until its target is reached
+        """
+        with self._condition:
+            self._axes[axis] = push
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='move_batcher', daemon=True)
+                self._thread.start()
+
+    def leave(self, axis: Hashable):
+        """Remove an axis, the batcher is stopped (and not shared anymore) when no axis is left"""
+        with self._condition:
+            self._axes.pop(axis, None)
+            self._pending.pop(axis, None)
+            if len(self._axes) > 0:
+                return
+            thread, self._thread = self._thread, None
+            self._condition.notify_all()
+        with _batchers_lock:
+            for controller, batcher in list(_batchers.items()):
+                if batcher is self:
+                    del _batchers[controller]
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(1.)
+
+    def submit(self, axis: Hashable, target: float, tolerance: float = 0., timeout: float = math.inf):
+        """ Move axis to target (controller units) with the next command, replacing its previous target if not sent
+
+        Parameters
+        ----------
+        axis: Hashable
+            A joined axis
+        target: float
+        tolerance: float
+            The axis is not moving anymore once within this distance of its target
+        timeout: float
+            Time in seconds after the command the axis is not polled anymore if still not within tolerance
+        """
+        with self._condition:
+            if axis not in self._axes:
+                raise KeyError(f'The axis {axis} did not join the batch')
+            if len(self._pending) == 0:
+                self._first_submit = time.perf_counter()
+            self._pending[axis] = (target, tolerance, timeout)
+            self._condition.notify_all()
+
+    def _error(self, error: Exception):
+        if self._on_error is not None:
+            self._on_error(error)
+        else:
+            logger.exception(f'Multi-axis move failed: {error}')
+
+    def _run(self):
+        thread = threading.current_thread()
+        next_poll = math.inf
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._thread is not thread or len(self._pending) > 0 or
+                    (len(self._moving) > 0 and time.perf_counter() >= next_poll),
+                    max(next_poll - time.perf_counter(), 0.) if len(self._moving) > 0 else None)
+                if self._thread is not thread:  # the last axis left
+                    return
+                batch = {}
+                if len(self._pending) > 0:
+                    # the targets of the other axes are collected until they all submitted one or the window elapsed
+                    self._condition.wait_for(
+                        lambda: self._thread is not thread or self._axes.keys() <= self._pending.keys(),
+                        max(self._first_submit + self.window - time.perf_counter(), 0.))
+                    batch, self._pending = self._pending, {}
+                pushes = dict(self._axes)
+            if len(batch) > 0:
+                try:
+                    self._send_targets({axis: target for axis, (target, tolerance, timeout) in batch.items()})
+                    self.commands += 1
+                except Exception as e:
+                    self._error(e)
+                    continue  # the axes plugins will time out
+                now = time.perf_counter()
+                self._moving.update({axis: (target, tolerance, now + timeout)
+                                     for axis, (target, tolerance, timeout) in batch.items()})
+                next_poll = now + self.polling.start()
+                continue
+            now = time.perf_counter()
+            for axis in [axis for axis, (target, tolerance, deadline) in self._moving.items()
+                         if axis not in pushes or now >= deadline]:
+                del self._moving[axis]  # left the batch or timed out (the axis plugin raises its own timeout)
+            if len(self._moving) == 0:
+                next_poll = math.inf
+                continue
+            try:
+                positions = self._read_positions(list(self._moving))
+                self.queries += 1
+            except Exception as e:
+                self._error(e)
+                self._moving.clear()
+                continue
+            distance = 0.  # the largest distance to target, in tolerances
+            for axis, position in positions.items():
+                if axis not in self._moving:
+                    continue
+                target, tolerance, deadline = self._moving[axis]
+                moving = abs(position - target) > tolerance
+                pushes[axis](position, moving)
+                if moving:
+                    distance = max(distance, abs(position - target) / max(tolerance, 1e-12))
+                else:
+                    del self._moving[axis]
+            next_poll = time.perf_counter() + self.polling.next_interval(distance, 1.)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Detection of the end of a move with less link traffic and less latency than fixed-interval polling
+
+DAQ_Move_base polls the actuator value at a fixed interval until it is within epsilon of the target: each poll is a
+query on the link and the end of the move is detected up to one (in fact two) polling periods late. Two alternatives
+are offered to the actuator plugins:
+
+* controllers pushing their position or status (events, callbacks, status frames) end the move as soon as they
+  report it, without polling at all
+* otherwise :class:`AdaptivePolling` gives the interval until the next poll: it is backed off exponentially while
+  the actuator does not get closer to its target, else set from the velocity estimated over the last two polls so
+  that the next poll happens when the target is expected to be reached, and kept at its minimum once within the
+  tolerance
+"""
+import math
+import time
+from typing import Optional, Tuple
+
+COMPLETION_MODES = ('Polling', 'Adaptive polling', 'Events')
+
+
+class AdaptivePolling:
+    """ Polling interval of a move, long while the target is far and short when it is about to be reached
+
+    Parameters
+    ----------
+    min_interval: float
+        Shortest interval in seconds, used at the start of a move and once within the tolerance of the target
+    max_interval: float
+        Longest interval in seconds
+    backoff: float
+        Factor applied to the interval at each poll while the time to reach the target cannot be estimated
+
+    Attributes
+    ----------
+    interval: float
+        The last interval returned
+    polls: int
+        Number of polls since the start of the move
+    """
+
+    def __init__(self, min_interval: float = 0.005, max_interval: float = 0.5, backoff: float = 2.):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.polls = 0
+        self._last: Optional[Tuple[float, float]] = None
+
+    def start(self) -> float:
+        """Reset at the start of a move, returns the interval until the first poll"""
+        self.interval = self.min_interval
+        self.polls = 0
+        self._last = None
+        return self.interval
+
+    def next_interval(self, distance: float, tolerance: float = 0., now: float = None) -> float:
+        """ Interval until the next poll
+
+        Parameters
+        ----------
+        distance: float
+            Distance to the target at this poll (absolute value)
+        tolerance: float
+            The move is done when the distance is below (the plugin epsilon)
+        now: float
+            Time of the poll in seconds, time.perf_counter() if None
+        """
+        now = time.perf_counter() if now is None else now
+        self.polls += 1
+        time_to_target = math.inf
+        if self._last is not None:
+            last_distance, last_time = self._last
+            if distance < last_distance and now > last_time:
+                velocity = (last_distance - distance) / (now - last_time)
+                time_to_target = (distance - tolerance) / velocity
+        self._last = (distance, now)
+        if distance <= tolerance:
+            interval = self.min_interval
+        elif math.isfinite(time_to_target):
+            interval = time_to_target
+        else:
+            interval = self.interval * self.backoff
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        return self.interval
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Preallocated circular buffer shared between a hardware reader thread and the plugin grabbing methods
+"""
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class RingBuffer:
+    """ Thread-safe, preallocated circular buffer of samples
+
+    A producer (typically a :class:`StreamReader` thread) appends samples as they come out of the instrument while
+    the plugin drains them from ``grab_data`` or ``callback``. Memory is allocated once: when the producer goes faster
+    than the consumer the oldest unread samples are overwritten and counted as overruns.
+
+    Parameters
+    ----------
+    capacity: int
+        Maximum number of samples kept in the buffer
+    sample_shape: tuple of int
+        Shape of a single sample, () for scalar (0D) readings
+    dtype: numpy dtype
+        dtype of the samples, may be a structured dtype
+
+    Attributes
+    ----------
+    overruns: int
+        Number of unread samples that have been overwritten since the creation (or the last clear)
+    """
+
+    def __init__(self, capacity: int, sample_shape: Tuple[int, ...] = (), dtype=np.float64):
+        if capacity < 1:
+            raise ValueError(f'The capacity of a RingBuffer should be strictly positive, not {capacity}')
+        self._data = np.zeros((capacity,) + tuple(sample_shape), dtype=dtype)
+        self._timestamps = np.zeros((capacity,), dtype=np.float64)
+        self._condition = threading.Condition(threading.Lock())
+        self._written = 0  # total number of samples ever written
+        self._read = 0  # total number of samples consumed
+        self.overruns = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._data.shape[0]
+
+    @property
+    def sample_shape(self) -> Tuple[int, ...]:
+        return self._data.shape[1:]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._data.dtype
+
+    @property
+    def total_written(self) -> int:
+        """Number of samples appended since the creation (or the last clear) of the buffer"""
+        return self._written
+
+    def __len__(self):
+        """Number of unread samples"""
+        with self._condition:
+            return self._written - self._read
+
+    def clear(self):
+        with self._condition:
+            self._written = 0
+            self._read = 0
+            self.overruns = 0
+
+    def append(self, sample, timestamp: Optional[float] = None):
+        """Append a single sample"""
+        self.extend(np.asarray(sample, dtype=self.dtype)[np.newaxis, ...],
+                    None if timestamp is None else np.array([timestamp]))
+
+    def extend(self, samples: np.ndarray, timestamps: Optional[np.ndarray] = None):
+        """ Append a block of samples with at most two vectorized copies
+
+        Parameters
+        ----------
+        samples: ndarray
+            Array of shape (N,) + sample_shape
+        timestamps: ndarray or None
+            N timestamps (in seconds since the epoch). If None, all samples are stamped with the current time
+        """
+        samples = np.asarray(samples, dtype=self.dtype)
+        n_samples = samples.shape[0]
+        if n_samples == 0:
+            return
+        if timestamps is None:
+            timestamps = np.full((n_samples,), time.time())
+        capacity = self.capacity
+        lost = max(0, n_samples - capacity)  # only the most recent samples can be kept
+        samples = samples[lost:]
+        timestamps = timestamps[lost:]
+        with self._condition:
+            start = (self._written + lost) % capacity
+            size = samples.shape[0]
+            first = min(size, capacity - start)
+            self._data[start:start + first] = samples[:first]
+            self._timestamps[start:start + first] = timestamps[:first]
+            if first < size:
+                self._data[:size - first] = samples[first:]
+                self._timestamps[:size - first] = timestamps[first:]
+            self._written += n_samples
+            unread = self._written - self._read
+            if unread > capacity:
+                self.overruns += unread - capacity
+                self._read = self._written - capacity
+            self._condition.notify_all()
+
+    def _ordered(self, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Copy of the samples of absolute indexes [start, stop[ in chronological order, lock must be held"""
+        indexes = np.arange(start, stop) % self.capacity
+        return self._data[indexes], self._timestamps[indexes]
+
+    def drain(self, max_samples: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ Get the unread samples (and their timestamps) in chronological order and mark them as read
+
+        Parameters
+        ----------
+        max_samples: int or None
+            Get at most the max_samples oldest unread samples, the others staying unread. None for all of them
+        """
+        with self._condition:
+            stop = self._written if max_samples is None else min(self._written, self._read + max_samples)
+            data, timestamps = self._ordered(self._read, stop)
+            self._read = stop
+        return data, timestamps
+
+    def latest(self, n_samples: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the last n_samples written (read or not) without consuming anything"""
+        with self._condition:
+            n_samples = min(n_samples, self._written, self.capacity)
+            return self._ordered(self._written - n_samples, self._written)
+
+    def wait(self, n_samples: int = 1, timeout: Optional[float] = None) -> bool:
+        """ Block until at least n_samples unread samples are available
+
+        Parameters
+        ----------
+        n_samples: int
+        timeout: float or None
+            Maximum waiting time in seconds, None to wait forever
+
+        Returns
+        -------
+        bool: True if the samples are available, False if the timeout expired
+        """
+        n_samples = min(n_samples, self.capacity)
+        with self._condition:
+            return self._condition.wait_for(lambda: self._written - self._read >= n_samples, timeout)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Cropping and binning of camera images before their emission
+
+When the consumers of a camera only use a region of its images (beam monitoring, PID on a spot), emitting and
+saving the full images wastes most of the bandwidth. A :class:`RoiBinning` crops each image to a region of interest
+by slicing (a view, without copy), then sums blocks of binning pixels by adding x_binning * y_binning strided views
+in place. This is several times faster than a reduction over the axes of a reshaped image, which numpy performs
+pixel by pixel along non contiguous axes. The emitted data are reduced by the area of the ROI times the binning
+factors. The reduced axes are computed once, when the ROI, the binning or the sensor axes change, not for each image.
+"""
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+class RoiBinning:
+    """ Region of interest (in pixels) and binning applied to images of a given sensor
+
+    Parameters
+    ----------
+    x: np.ndarray
+        Axis of the image columns
+    y: np.ndarray
+        Axis of the image rows
+    roi: tuple of int
+        (x0, y0, width, height) in pixels, a width or height of 0 extending to the edge of the sensor. The ROI is
+        clipped to the sensor and its size truncated to a multiple of the binning. None for the whole sensor
+    binning: tuple of int
+        (x_binning, y_binning), numbers of consecutive pixels summed into a single pixel along each axis
+
+    Attributes
+    ----------
+    x: np.ndarray
+        Axis of the reduced image columns (centers of the binned pixels)
+    y: np.ndarray
+        Axis of the reduced image rows
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, roi: Sequence[int] = None, binning: Sequence[int] = (1, 1)):
+        self.sensor_shape = (len(y), len(x))
+        x0, y0, width, height = (0, 0, 0, 0) if roi is None else roi
+        x_binning, y_binning = (max(int(bin_size), 1) for bin_size in binning)
+        self.binning = (x_binning, y_binning)
+        self._columns = self._slice(x0, width, len(x), x_binning)
+        self._rows = self._slice(y0, height, len(y), y_binning)
+        self.x = self._bin_axis(np.asarray(x, dtype=float)[self._columns], x_binning)
+        self.y = self._bin_axis(np.asarray(y, dtype=float)[self._rows], y_binning)
+
+    def __repr__(self):
+        return f'RoiBinning(roi={self.roi}, binning={self.binning})'
+
+    @staticmethod
+    def _slice(start: int, size: int, length: int, binning: int) -> slice:
+        start = min(max(int(start), 0), length)
+        stop = length if size <= 0 else min(start + int(size), length)
+        return slice(start, start + (stop - start) // binning * binning)
+
+    @staticmethod
+    def _bin_axis(axis: np.ndarray, binning: int) -> np.ndarray:
+        return axis.reshape((-1, binning)).mean(axis=1) if binning > 1 else axis
+
+    @property
+    def roi(self) -> Tuple[int, int, int, int]:
+        """The (x0, y0, width, height) actually applied, in pixels"""
+        return (self._columns.start, self._rows.start, self._columns.stop - self._columns.start,
+                self._rows.stop - self._rows.start)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Shape of the reduced images"""
+        return len(self.y), len(self.x)
+
+    @property
+    def identity(self) -> bool:
+        """True if the images are emitted as they are"""
+        return self.shape == self.sensor_shape
+
+    def reduce(self, image: np.ndarray, quadrature: bool = False) -> np.ndarray:
+        """ Crop then bin an image of the sensor shape
+
+        Without binning, the returned image is a view of the given one. The binned pixels of integer images are
+        summed as 64 bits integers.
+
+        Parameters
+        ----------
+        image: np.ndarray
+        quadrature: bool
+            Sum the binned pixels in quadrature (square root of the sum of the squares), to bin standard deviations
+        """
+        cropped = image[self._rows, self._columns]
+        x_binning, y_binning = self.binning
+        if x_binning == 1 and y_binning == 1:
+            return cropped
+        if quadrature:
+            return np.sqrt(self._bin(np.square(cropped, dtype=float)))
+        return self._bin(cropped, np.int64 if np.issubdtype(image.dtype, np.integer) else cropped.dtype)
+
+    def _bin(self, cropped: np.ndarray, dtype=None) -> np.ndarray:
+        x_binning, y_binning = self.binning
+        binned = cropped[::y_binning, ::x_binning].astype(dtype)
+        for row in range(y_binning):
+            for column in range(x_binning):
+                if row or column:
+                    binned += cropped[row::y_binning, column::x_binning]
+        return binned
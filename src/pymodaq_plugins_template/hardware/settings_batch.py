@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Debounced application of the plugin settings changes to the controller
+
+commit_settings is called for each changed parameter: loading a preset or dragging a spinbox fires dozens of calls,
+each one becoming a controller command (some of them, like a change of the acquisition configuration, needing the
+acquisition to be stopped and the instrument to re-stabilize). A :class:`SettingsBatch` collects the changed
+parameters over a short window (started by the first change), a parameter changed several times being applied once
+with its last value, and hands them over to the plugin in a single call applying them as one controller transaction,
+with the acquisition paused at most once. The window is a timer of the plugin thread, so that the batch is applied
+between two grabs or moves, never concurrently with them.
+"""
+from typing import Callable, Dict, List, Optional
+
+from qtpy import QtCore
+
+from pymodaq_gui.parameter import Parameter
+from pymodaq_utils.logger import set_logger, get_module_name
+
+logger = set_logger(get_module_name(__file__))
+
+
+def settings_batch_params(window: float = 50.) -> List[dict]:
+    """ The settings group of the batch window, to be appended to the params of a plugin
+
+    Parameters
+    ----------
+    window: float
+        Default window in milliseconds
+    """
+    return [{'title': 'Settings batch:', 'name': 'settings_batch', 'type': 'group', 'children': [
+        {'title': 'Window (ms):', 'name': 'settings_window', 'type': 'float', 'value': window, 'min': 0.,
+         'tip': 'The settings changed within this time are applied to the controller together, each with its last '
+                'value (0: each change is applied immediately)'},
+    ]}]
+
+
+class SettingsBatch(QtCore.QObject):
+    """ Collects the changed parameters and applies them together when the window elapsed
+
+    Parameters
+    ----------
+    apply: Callable[[List[Parameter]], None]
+        Applies the changed parameters (their current value) to the controller, in the order of their first change
+    window: float
+        Time in seconds the changes are collected after the first one, 0 to apply each change immediately
+    on_error: Callable[[Exception], None] or None
+        Called with the exception raised by apply, it is logged if None
+    parent: QtCore.QObject
+        The plugin, the batch is applied from its thread
+
+    Attributes
+    ----------
+    batches: int
+        Number of batches applied
+    merged: int
+        Number of changes merged with a previous change of the same parameter
+    """
+
+    def __init__(self, apply: Callable[[List[Parameter]], None], window: float = 0.05,
+                 on_error: Optional[Callable[[Exception], None]] = None, parent: QtCore.QObject = None):
+        super().__init__(parent)
+        self._apply = apply
+        self._on_error = on_error
+        self._pending: Dict[Parameter, None] = {}  # ordered set
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+        self.window = window
+        self.batches = 0
+        self.merged = 0
+
+    @property
+    def window(self) -> float:
+        return self._window
+
+    @window.setter
+    def window(self, window: float):
+        self._window = window
+        self._timer.setInterval(int(round(window * 1000)))
+        if window <= 0.:
+            self.flush()
+
+    @property
+    def pending(self) -> List[Parameter]:
+        """The changed parameters not applied yet"""
+        return list(self._pending)
+
+    def submit(self, param: Parameter) -> bool:
+        """ Apply the change of param with the next batch
+
+        Returns
+        -------
+        bool: True if it has been merged with a previous change of param not applied yet
+        """
+        merged = param in self._pending
+        if merged:
+            self.merged += 1
+        else:
+            self._pending[param] = None
+        if self._window <= 0.:
+            self.flush()
+        elif not self._timer.isActive():
+            self._timer.start()
+        return merged
+
+    def flush(self):
+        """Apply the pending changes now, for instance before a grab or a move that should use them"""
+        self._timer.stop()
+        if len(self._pending) == 0:
+            return
+        params, self._pending = list(self._pending), {}
+        self.batches += 1
+        try:
+            self._apply(params)
+        except Exception as e:
+            if self._on_error is not None:
+                self._on_error(e)
+            else:
+                logger.exception(f'Applying the settings {[param.name() for param in params]} failed: {e}')
+
+    def discard(self):
+        """Forget the pending changes, for instance when closing the communication"""
+        self._timer.stop()
+        self._pending = {}
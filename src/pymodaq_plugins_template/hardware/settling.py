@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming settling detector
+
+A reading is considered settled when, over the last window readings, both the standard deviation and the slope of a
+least-squares line fit are below their tolerance. The window sums are updated in O(1) per reading so that the
+criterion can be evaluated on every reading of a fast stream and a scan or an actuator can proceed as soon as it is
+met, instead of waiting a fixed delay.
+"""
+import threading
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+class SettlingDetector:
+    """ Rolling standard deviation and slope over a window of readings
+
+    Parameters
+    ----------
+    window: int
+        Number of consecutive readings the criterion is evaluated on
+    max_std: float
+        Maximum standard deviation of the readings in the window (in the readings units)
+    max_slope: float
+        Maximum absolute drift of the readings in the window (in the readings units per second). If the readings have
+        no meaningful timestamps (all identical), it is compared to the drift per reading
+
+    Attributes
+    ----------
+    std: float
+        Standard deviation of the current window (nan until the window is full)
+    slope: float
+        Slope of the current window in units per second (nan until the window is full)
+    """
+    _resync_period = 10000  # the running sums are recomputed exactly every so many readings to avoid rounding drift
+
+    def __init__(self, window: int = 20, max_std: float = 1e-3, max_slope: float = 1e-3):
+        self.window = window
+        self.max_std = max_std
+        self.max_slope = max_slope
+        self._values = np.zeros(window)
+        self._timestamps = np.zeros(window)
+        self._settled_event = threading.Event()
+        self.reset()
+
+    def reset(self):
+        """Forget the readings, for instance after the actuator started a new move"""
+        self._count = 0
+        self._head = 0  # index of the oldest reading in the circular window
+        self._reference = 0.
+        self._sum = 0.
+        self._sum_squares = 0.
+        self._sum_index = 0.  # sum of i * y_i, i being the position of the reading in the window (oldest is 0)
+        self._updates = 0
+        self.std = np.nan
+        self.slope = np.nan
+        self._settled_event.clear()
+
+    @property
+    def settled(self) -> bool:
+        """True if the last reading satisfies the settling criterion"""
+        return self._settled_event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the readings are settled, returns False if they are not after timeout seconds"""
+        return self._settled_event.wait(timeout)
+
+    def update(self, value: float, timestamp: float = None) -> bool:
+        """ Add one reading to the window
+
+        Parameters
+        ----------
+        value: float
+        timestamp: float
+            Time of the reading in seconds, time.time() if None
+
+        Returns
+        -------
+        bool: the settling state after this reading
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if self._count == 0:
+            self._reference = value  # readings are summed relative to the first one to limit cancellation errors
+        y = value - self._reference
+        n = self.window
+        if self._count < n:
+            self._sum_index += self._count * y
+            self._sum += y
+            self._sum_squares += y * y
+            self._values[self._count] = y
+            self._timestamps[self._count] = timestamp
+            self._count += 1
+        else:
+            oldest = self._values[self._head]
+            self._sum_index += -(self._sum - oldest) + (n - 1) * y  # every index shifts by one, the newest is n - 1
+            self._sum += y - oldest
+            self._sum_squares += y * y - oldest * oldest
+            self._values[self._head] = y
+            self._timestamps[self._head] = timestamp
+            self._head = (self._head + 1) % n
+            self._updates += 1
+            if self._updates % self._resync_period == 0:
+                self._resync()
+        return self._evaluate()
+
+    def extend(self, values: Sequence[float], timestamps: Sequence[float] = None) -> np.ndarray:
+        """ Add several readings, returns the settling state after each one as a boolean array"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if timestamps is None:
+            timestamps = np.full(values.shape, time.time())
+        return np.array([self.update(value, timestamp) for value, timestamp in zip(values.tolist(),
+                                                                                  np.asarray(timestamps).tolist())],
+                        dtype=bool)
+
+    def _resync(self):
+        ordered = np.roll(self._values, -self._head)
+        self._sum = ordered.sum()
+        self._sum_squares = (ordered * ordered).sum()
+        self._sum_index = (np.arange(self.window) * ordered).sum()
+
+    def _evaluate(self) -> bool:
+        n = self._count
+        if n < self.window or n < 2:
+            return False
+        mean = self._sum / n
+        self.std = np.sqrt(max(self._sum_squares / n - mean * mean, 0.))
+        mean_index = (n - 1) / 2
+        slope = (self._sum_index - n * mean_index * mean) / (n * (n * n - 1) / 12)  # per reading
+        span = self._timestamps[self._head - 1] - self._timestamps[self._head]  # newest - oldest
+        self.slope = slope * (n - 1) / span if span > 0 else slope
+        settled = self.std <= self.max_std and abs(self.slope) <= self.max_slope
+        if settled:
+            self._settled_event.set()
+        else:
+            self._settled_event.clear()
+        return settled
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Simulated balance on a pseudo-terminal (Linux/macOS)
+
+:class:`BalanceSimulator` opens a pty and answers on its master side the commands of the balance protocol, so that
+the real wrapper (:class:`~pymodaq_plugins_template.hardware.balance.Balance`) or any serial terminal can open its
+port (for instance /dev/pts/3) as if it was the serial port of the instrument. It is a repeatable stand-in for tests
+and throughput/latency benchmarks on machines without hardware.
+
+Protocol: ASCII commands terminated by CR LF, answered by one line terminated by CR LF
+
+* ``Q``: weigh, answers one fixed width frame such as ``ST,GS,   +12.345 g`` (see frame_decoder)
+* ``T``: tare, answers ``T,OK`` or the error frame ``EC,E2`` if the weight is not stable
+* ``Z``: zero, answers ``Z,OK`` or ``EC,E3`` if the weight is out of the zero range
+* ``C``: continuous output, answers ``C,OK`` then outputs frames at the continuous rate
+* ``S``: stop the continuous output, answers ``S,OK``
+* anything else: ``EC,E0``
+
+Run it from a terminal with: python -m pymodaq_plugins_template.hardware.simulator
+"""
+import os
+import select
+import threading
+import time
+import tty
+from typing import Optional
+
+import numpy as np
+
+from pymodaq_utils.logger import set_logger, get_module_name
+
+logger = set_logger(get_module_name(__file__))
+
+ERROR_UNKNOWN_COMMAND = b'EC,E0'
+ERROR_UNSTABLE = b'EC,E2'
+ERROR_ZERO_RANGE = b'EC,E3'
+
+
+class BalanceSimulator:
+    """ Balance speaking the frame protocol on a pseudo-terminal
+
+    Parameters
+    ----------
+    baudrate: int
+        Simulated baud rate, each byte takes 10 bits (8N1) to be transmitted
+    latency: float
+        Delay in seconds between the reception of a command and the start of its answer
+    noise: float
+        Standard deviation of the gaussian noise added to each reading
+    drift: float
+        Drift of the readings in units per second
+    drop_rate: float
+        Probability for each transmitted byte to be lost
+    rate: float
+        Number of frames per second in continuous output (limited by the baud rate)
+    capacity: float
+        Readings above are reported as overload (OL frames)
+    resolution: float
+        Readings are rounded to the resolution
+    unit: str
+    settling_time: float
+        Time constant in seconds of the exponential settling after a load change
+    stable_band: float
+        The readings are flagged stable (and a tare is accepted) once the settling residual is below this band
+    seed: int or None
+        Seed of the random generator, for reproducible noise and dropped bytes
+    """
+
+    def __init__(self, baudrate: int = 9600, latency: float = 0.005, noise: float = 0.0005, drift: float = 0.,
+                 drop_rate: float = 0., rate: float = 10., capacity: float = 220., resolution: float = 0.001,
+                 unit: str = 'g', settling_time: float = 0.1, stable_band: float = 0.005,
+                 seed: Optional[int] = None):
+        self.baudrate = baudrate
+        self.latency = latency
+        self.noise = noise
+        self.drift = drift
+        self.drop_rate = drop_rate
+        self.rate = rate
+        self.capacity = capacity
+        self.resolution = resolution
+        self.unit = unit
+        self.settling_time = settling_time
+        self.stable_band = stable_band
+        self.commands_received = 0
+        self.lines_sent = 0
+        self._decimals = max(int(round(-np.log10(resolution))), 0)
+        self._random = np.random.default_rng(seed)
+        self._origin = time.perf_counter()
+        self._load = 0.
+        self._previous_load = 0.
+        self._load_time = self._origin
+        self._zero = 0.
+        self._tare = 0.
+        self._continuous = False
+        self._master: Optional[int] = None
+        self._slave: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def port(self) -> str:
+        """Path of the pty to be opened as a serial port"""
+        return os.ttyname(self._slave)
+
+    @property
+    def load(self) -> float:
+        """Mass put on the pan, the readings settle exponentially towards it"""
+        return self._load
+
+    @load.setter
+    def load(self, load: float):
+        now = time.perf_counter()
+        self._previous_load = self._mass(now)
+        self._load = load
+        self._load_time = now
+
+    def start(self) -> 'BalanceSimulator':
+        """Open the pty and start answering on it"""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # no echo nor line processing, like a real serial port
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='balance_simulator', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop answering and close the pty"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def __enter__(self) -> 'BalanceSimulator':
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _mass(self, now: float) -> float:
+        """Noiseless mass seen by the cell at time now, settling after the last load change"""
+        settling = np.exp(-(now - self._load_time) / self.settling_time) if self.settling_time > 0 else 0.
+        return self._load + (self._previous_load - self._load) * settling + self.drift * (now - self._origin)
+
+    def _is_stable(self, now: float) -> bool:
+        return abs(self._mass(now) - self._load - self.drift * (now - self._origin)) < self.stable_band
+
+    def frame(self) -> bytes:
+        """The frame corresponding to the current reading"""
+        now = time.perf_counter()
+        gross = self._mass(now) + self._random.normal(0., self.noise) if self.noise > 0 else self._mass(now)
+        if gross - self._zero > self.capacity:
+            status = b'OL'
+        else:
+            status = b'ST' if self._is_stable(now) else b'US'
+        kind = b'NT' if self._tare != 0 else b'GS'
+        value = round((gross - self._zero - self._tare) / self.resolution) * self.resolution
+        return b'%s,%s,%+10.*f %s' % (status, kind, self._decimals, value, self.unit.encode())
+
+    def handle(self, command: bytes) -> bytes:
+        """Answer a command (without its line termination)"""
+        self.commands_received += 1
+        now = time.perf_counter()
+        command = command.strip().upper()
+        if command == b'Q':
+            return self.frame()
+        elif command == b'T':
+            if not self._is_stable(now):
+                return ERROR_UNSTABLE
+            self._tare = self._mass(now) - self._zero
+            return b'T,OK'
+        elif command == b'Z':
+            gross = self._mass(now)
+            if abs(gross) > 0.02 * self.capacity:
+                return ERROR_ZERO_RANGE
+            self._zero = gross
+            self._tare = 0.
+            return b'Z,OK'
+        elif command == b'C':
+            self._continuous = True
+            return b'C,OK'
+        elif command == b'S':
+            self._continuous = False
+            return b'S,OK'
+        return ERROR_UNKNOWN_COMMAND
+
+    def _write(self, line: bytes):
+        data = line + b'\r\n'
+        if self.drop_rate > 0:
+            kept = self._random.random(len(data)) >= self.drop_rate
+            data = bytes(np.frombuffer(data, dtype=np.uint8)[kept])
+        time.sleep(len(line + b'\r\n') * 10 / self.baudrate)  # transmission time at the simulated baud rate
+        os.write(self._master, data)
+        self.lines_sent += 1
+
+    def _run(self):
+        received = b''
+        next_frame = time.perf_counter()
+        while not self._stop_event.is_set():
+            timeout = max(next_frame - time.perf_counter(), 0.) if self._continuous else 0.05
+            readable, _, _ = select.select([self._master], [], [], min(timeout, 0.05))
+            if readable:
+                try:
+                    received += os.read(self._master, 1024)
+                except OSError:  # no process has the slave side open
+                    time.sleep(0.01)
+                    continue
+                *commands, received = received.replace(b'\r', b'\n').split(b'\n')
+                for command in commands:
+                    if command:
+                        if self.latency > 0:
+                            time.sleep(self.latency)
+                        self._write(self.handle(command))
+            if self._continuous and time.perf_counter() >= next_frame:
+                self._write(self.frame())
+                next_frame = max(next_frame + 1 / self.rate, time.perf_counter())
+
+
+if __name__ == '__main__':
+    with BalanceSimulator() as simulator:
+        print(f'Simulated balance listening on {simulator.port}, press Ctrl+C to stop')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Background thread continuously reading an instrument put into streaming (auto-print) mode
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from pymodaq_utils.logger import set_logger, get_module_name
+
+from .ring_buffer import RingBuffer
+
+logger = set_logger(get_module_name(__file__))
+
+
+class StreamReader(threading.Thread):
+    """ Daemon thread filling a RingBuffer with whatever the instrument outputs
+
+    The read callable should block at most a short time (a serial read with a timeout for instance) and return the
+    samples decoded since the last call (possibly none), so that stopping the reader is never delayed by more than
+    this timeout. The samples of a chunk being received between the end of the previous read and the end of this one,
+    their timestamps are interpolated evenly over this interval (the last one being stamped with the read time).
+
+    Parameters
+    ----------
+    read: Callable[[], ndarray or None]
+        Method of the instrument wrapper returning the new samples as an array of shape (N,) + sample_shape
+    buffer: RingBuffer
+        The buffer to fill
+    on_data: Callable[[], None] or None
+        Optional function called (from the reader thread) each time new samples have been stored
+    name: str
+        Name of the thread
+
+    Attributes
+    ----------
+    errors: int
+        Number of exceptions raised by the read callable since the start of the thread
+    """
+
+    def __init__(self, read: Callable[[], Optional[np.ndarray]], buffer: RingBuffer,
+                 on_data: Optional[Callable[[], None]] = None, name: str = 'stream_reader'):
+        super().__init__(name=name, daemon=True)
+        self._read = read
+        self.buffer = buffer
+        self._on_data = on_data
+        self._stop_event = threading.Event()
+        self.errors = 0
+
+    def run(self):
+        previous = time.time()  # end of the previous read
+        while not self._stop_event.is_set():
+            try:
+                samples = self._read()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f'Error while reading the instrument stream: {str(e)}')
+                self._stop_event.wait(0.1)  # do not spin on a persistent error
+                previous = time.time()
+                continue
+            now = time.time()
+            if samples is not None and len(samples) > 0:
+                self.buffer.extend(samples, self.interpolate_timestamps(previous, now, len(samples)))
+                if self._on_data is not None:
+                    self._on_data()
+            previous = now
+
+    @staticmethod
+    def interpolate_timestamps(start: float, stop: float, n_samples: int) -> np.ndarray:
+        """n_samples timestamps evenly spread over ]start, stop], the last one being stop"""
+        return start + (stop - start) * np.arange(1, n_samples + 1) / n_samples
+
+    def stop(self, timeout: Optional[float] = 1.):
+        """Ask the thread to terminate and wait (at most timeout seconds) for it"""
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
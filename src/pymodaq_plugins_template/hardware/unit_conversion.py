@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Float fast path of the unit conversions and scaling of the actuator positions
+
+DAQ_Move_base converts the positions with pint (DataActuator.value(units), get_position_with_scaling,
+set_position_with_scaling), that is hundreds of microseconds per conversion, on every move and every poll. The
+conversion between two units being affine, its factor and offset are evaluated once with pint (see
+:func:`unit_factor`) and an :class:`AxisConversion` combines them with the plugin scaling so that the hot path is
+plain float arithmetic. The plugin creates a new AxisConversion when the axis, its units or the scaling change.
+
+Relative values (moves, differences) are converted with the factor only: a delta of 1 K is a delta of 1 °C.
+"""
+import functools
+from typing import Tuple
+
+from pint import DimensionalityError  # raised for units not compatible with the axis ones
+
+from pymodaq_data import Q_
+
+
+@functools.lru_cache(maxsize=256)
+def unit_factor(from_units: str, to_units: str) -> Tuple[float, float]:
+    """ Factor and offset such that value_in_to_units = value_in_from_units * factor + offset
+
+    Evaluated once per couple of units with pint (a DimensionalityError is raised if they are not compatible). A value
+    without units is considered as already in to_units.
+    """
+    if from_units == to_units or from_units == '':
+        return 1., 0.
+    offset = Q_(0., from_units).m_as(to_units)
+    return Q_(1., from_units).m_as(to_units) - offset, offset
+
+
+class AxisConversion:
+    """ Conversions between the positions of an axis (in its units, scaled) and the controller values
+
+    As in DAQ_Move_base: controller value = position / scaling + offset
+
+    Parameters
+    ----------
+    units: str
+        The units of the axis (the controller units)
+    scaling: float
+    offset: float
+        Offset in controller units
+    """
+
+    def __init__(self, units: str, scaling: float = 1., offset: float = 0.):
+        self.units = units
+        self.scaling = scaling
+        self.offset = offset
+
+    def __repr__(self):
+        return f'AxisConversion({self.units!r}, scaling={self.scaling}, offset={self.offset})'
+
+    def to_axis(self, value: float, units: str = None) -> float:
+        """A value in units (the axis units if None) converted to the axis units"""
+        if units is None or units == self.units:
+            return value
+        factor, offset = unit_factor(units, self.units)
+        return value * factor + offset
+
+    def relative_to_axis(self, value: float, units: str = None) -> float:
+        """A relative value (a move, a difference) in units (the axis units if None) converted to the axis units"""
+        if units is None or units == self.units:
+            return value
+        return value * unit_factor(units, self.units)[0]
+
+    def to_controller(self, value: float, units: str = None) -> float:
+        """Controller value of an absolute position in units (the axis units if None)"""
+        return self.to_axis(value, units) / self.scaling + self.offset
+
+    def relative_to_controller(self, value: float, units: str = None) -> float:
+        """Controller value of a relative move in units (the axis units if None)"""
+        return self.relative_to_axis(value, units) / self.scaling
+
+    def from_controller(self, value: float) -> float:
+        """Position in the axis units of a controller value"""
+        return (value - self.offset) * self.scaling
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Static manifest of the instrument plugins of this package
+
+The manifest lists every DAQ_Move_xxx and DAQ_xDViewer_xxx class with its module and its main class attributes
+(axis names, controller units, multiaxes, dimensionality, parameters...). It is built by inspecting the source code
+(AST) without importing anything, written as json by the hatch build hook (see hatch_build.py) and can then be used
+to populate menus without importing the plugins and their dependencies.
+
+This module only depends on the standard library as it is loaded by path from the build hook.
+"""
+import ast
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MANIFEST_VERSION = 1
+MANIFEST_FILE = 'resources/plugin_manifest.json'
+VIEWER_DIMS = ('0D', '1D', '2D', 'ND')
+
+# class attribute: (manifest key, default value of the base class)
+_MOVE_ATTRIBUTES = {'_axis_names': ('axis_names', None), '_controller_units': ('controller_units', None),
+                    'is_multiaxes': ('is_multiaxes', False), '_epsilon': ('epsilon', None)}
+_VIEWER_ATTRIBUTES = {'hardware_averaging': ('hardware_averaging', False),
+                      'live_mode_available': ('live_mode_available', False)}
+
+
+def _literal(node: ast.AST) -> Any:
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, RecursionError):
+        return None
+
+
+def _param_names(node: ast.AST) -> List[str]:
+    """Names of the parameters declared as dict literals in a params class attribute (nested groups included)"""
+    names = []
+    for child in ast.walk(node):
+        if isinstance(child, ast.Dict):
+            for key, value in zip(child.keys, child.values):
+                if isinstance(key, ast.Constant) and key.value == 'name' and isinstance(value, ast.Constant):
+                    names.append(value.value)
+    return names
+
+
+def _class_attributes(klass: ast.ClassDef) -> Dict[str, ast.AST]:
+    attributes = {}
+    for statement in klass.body:
+        if isinstance(statement, ast.Assign):
+            for target in statement.targets:
+                if isinstance(target, ast.Name):
+                    attributes[target.id] = statement.value
+        elif isinstance(statement, ast.AnnAssign) and isinstance(statement.target, ast.Name) and \
+                statement.value is not None:
+            attributes[statement.target.id] = statement.value
+    return attributes
+
+
+def inspect_plugin_file(file: Path, module: str, plugin_type: str) -> Optional[Dict[str, Any]]:
+    """ Get the manifest entry of a plugin file from its source code
+
+    Parameters
+    ----------
+    file: Path
+        The plugin source file, for instance daq_move_Template.py
+    module: str
+        The fully qualified name of the corresponding module
+    plugin_type: str
+        Either 'daq_move', 'daq_0Dviewer', 'daq_1Dviewer', 'daq_2Dviewer' or 'daq_NDviewer'
+
+    Returns
+    -------
+    dict or None: None if the file doesn't define the plugin class matching its name
+    """
+    name = file.stem[len(plugin_type) + 1:]
+    class_name = f'DAQ_Move_{name}' if plugin_type == 'daq_move' else f'DAQ_{plugin_type[4:6]}Viewer_{name}'
+    tree = ast.parse(file.read_text(encoding='utf-8'), filename=str(file))
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == class_name:
+            break
+    else:
+        return None
+
+    attributes = _class_attributes(node)
+    entry = dict(name=name, type=plugin_type, class_name=class_name, module=module)
+    if plugin_type != 'daq_move':
+        entry['dim'] = plugin_type[4:6]
+    for attribute, (key, default) in (_MOVE_ATTRIBUTES if plugin_type == 'daq_move' else _VIEWER_ATTRIBUTES).items():
+        entry[key] = _literal(attributes[attribute]) if attribute in attributes else default
+    entry['params'] = _param_names(attributes['params']) if 'params' in attributes else []
+    return entry
+
+
+def build_manifest(package_path: Path) -> Dict[str, Any]:
+    """Inspect all the plugin files of the package located at package_path"""
+    package_path = Path(package_path)
+    package = package_path.name
+    folders = [('daq_move', package_path.joinpath('daq_move_plugins'), f'{package}.daq_move_plugins')]
+    folders += [(f'daq_{dim}viewer', package_path.joinpath('daq_viewer_plugins', f'plugins_{dim}'),
+                 f'{package}.daq_viewer_plugins.plugins_{dim}') for dim in VIEWER_DIMS]
+    plugins = []
+    for plugin_type, folder, module in folders:
+        for file in sorted(folder.glob(f'{plugin_type}_*.py')):
+            entry = inspect_plugin_file(file, f'{module}.{file.stem}', plugin_type)
+            if entry is not None:
+                plugins.append(entry)
+    return dict(version=MANIFEST_VERSION, package=package, plugins=plugins)
+
+
+def write_manifest(package_path: Path) -> Path:
+    """Build the manifest of the package located at package_path and save it in its resources folder"""
+    manifest_path = Path(package_path).joinpath(MANIFEST_FILE)
+    manifest_path.write_text(json.dumps(build_manifest(package_path), indent=2), encoding='utf-8')
+    return manifest_path
+
+
+def load_manifest(package_path: Path = None) -> Dict[str, Any]:
+    """ Load the manifest saved at build time
+
+    If it is missing (for instance from a source checkout never built), it is built from the sources, still without
+    importing anything
+    """
+    package_path = Path(__file__).parent if package_path is None else Path(package_path)
+    try:
+        manifest = json.loads(package_path.joinpath(MANIFEST_FILE).read_text(encoding='utf-8'))
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return build_manifest(package_path)
+
+
+def get_plugins(plugin_type: str = None, package_path: Path = None) -> List[Dict[str, Any]]:
+    """ Get the manifest entries of all plugins or of a given type ('daq_move', 'daq_0Dviewer'...)"""
+    return [entry for entry in load_manifest(package_path)['plugins']
+            if plugin_type is None or entry['type'] == plugin_type]
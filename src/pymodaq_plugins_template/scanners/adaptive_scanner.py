@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptive-refinement 1D scanner for DAQ_Scan
+
+The scan starts from a coarse uniform grid then, each time all the planned points have been measured, adds the middle
+of the intervals where the measured signal varies too much (gradient criterion) or departs too much from a straight
+line (curvature criterion), until the criteria are met everywhere, the intervals reach the minimum step or the point
+budget is spent. The points are thus concentrated where the signal changes (for instance the transition of a
+dose-response curve) instead of being spread uniformly.
+
+:class:`AdaptiveGrid` holds the refinement logic and can be used without DAQ_Scan, :class:`Scan1DAdaptive` is the
+scanner registered in DAQ_Scan (Scan1D / Adaptive). As the positions are only known during the scan, the scan shape
+is the point budget and the actuator position of each point is saved with the detectors data, in the Adaptive data
+(see Scan1DAdaptive.process_data).
+"""
+from typing import List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from pymodaq_data.data import Axis, DataDistribution, DataToExport
+from pymodaq_gui.parameter import Parameter
+from pymodaq_utils.logger import set_logger, get_module_name
+
+from pymodaq.utils.data import DataCalculated
+from pymodaq.utils.scanner.scan_factory import ScannerFactory
+from pymodaq.utils.scanner.scanners._1d_scanners import Scan1DBase
+from pymodaq.utils.scanner.scan_selector import Selector
+
+if TYPE_CHECKING:
+    from pymodaq.control_modules.daq_move import DAQ_Move
+
+logger = set_logger(get_module_name(__file__))
+
+
+class AdaptiveGrid:
+    """ 1D sampling refined where a measured signal varies
+
+    Parameters
+    ----------
+    start: float
+    stop: float
+    n_initial: int
+        Number of points of the initial uniform grid (including start and stop)
+    max_points: int
+        Point budget, initial grid included
+    gradient_threshold: float
+        An interval is refined if the signal varies over it by more than this fraction of the signal range
+    curvature_threshold: float
+        An interval is refined if, at one of its ends, the signal departs from the straight line joining its
+        neighbours by more than this fraction of the signal range
+    min_step: float
+        Intervals shorter than twice this value are never refined
+
+    Attributes
+    ----------
+    positions: ndarray
+        All the planned positions, in the order they are (or will be) measured
+    values: ndarray
+        The measured values, in the order of the positions (nan if not measured yet)
+    """
+
+    def __init__(self, start: float = 0., stop: float = 1., n_initial: int = 11, max_points: int = 101,
+                 gradient_threshold: float = 0.05, curvature_threshold: float = 0.02, min_step: float = 0.):
+        if n_initial < 2 or max_points < n_initial:
+            raise ValueError('The initial grid needs at least 2 points and the point budget should be larger')
+        self.max_points = max_points
+        self.gradient_threshold = gradient_threshold
+        self.curvature_threshold = curvature_threshold
+        self.min_step = min_step
+        self.positions = np.linspace(start, stop, n_initial)
+        self.values = np.full((n_initial,), np.nan)
+        self.done = False
+
+    def __len__(self) -> int:
+        """Number of planned positions"""
+        return self.positions.size
+
+    @property
+    def n_measured(self) -> int:
+        return int(np.count_nonzero(~np.isnan(self.values)))
+
+    def set_value(self, index: int, value: float) -> bool:
+        """ Store the value measured at positions[index], refine the grid if all the planned positions are measured
+
+        Returns
+        -------
+        bool: True if new positions have been planned
+        """
+        self.values[index] = value
+        if self.n_measured == len(self):
+            return self.refine()
+        return False
+
+    def interval_losses(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Sorted measured positions and the loss of each interval between them (the larger of its gradient and
+        curvature criteria normalized by their thresholds, the interval is refined if above 1)"""
+        measured = ~np.isnan(self.values)
+        order = np.argsort(self.positions[measured])
+        x = self.positions[measured][order]
+        y = self.values[measured][order]
+        span = np.ptp(y) if y.size > 0 else 0.
+        if span == 0 or not np.isfinite(span):
+            return x, np.zeros((max(x.size - 1, 0),))
+        dx = np.diff(x)
+        dy = np.diff(y)
+        losses = np.abs(dy) / span / self.gradient_threshold if self.gradient_threshold > 0 else np.zeros_like(dy)
+        if self.curvature_threshold > 0 and x.size > 2:
+            # deviation of the inner points from the line joining their neighbours
+            linear = y[:-2] + (y[2:] - y[:-2]) * (x[1:-1] - x[:-2]) / (x[2:] - x[:-2])
+            curvature = np.abs(y[1:-1] - linear) / span / self.curvature_threshold
+            losses[:-1] = np.maximum(losses[:-1], curvature)
+            losses[1:] = np.maximum(losses[1:], curvature)
+        losses[dx < 2 * self.min_step] = 0.
+        return x, losses
+
+    def refine(self) -> bool:
+        """ Plan the middles of the intervals whose loss is above 1, the largest losses first within the budget
+
+        Returns
+        -------
+        bool: True if new positions have been planned, else the scan is done
+        """
+        x, losses = self.interval_losses()
+        budget = self.max_points - len(self)
+        refined = np.flatnonzero(losses > 1)
+        if budget <= 0 or refined.size == 0:
+            self.done = True
+            return False
+        refined = refined[np.argsort(losses[refined])[::-1][:budget]]
+        middles = np.sort((x[refined] + x[refined + 1]) / 2)  # measured in a single sweep
+        last = self.positions[-1]  # where the actuator is, the sweep starts from the closest end
+        if abs(last - middles[-1]) < abs(last - middles[0]):
+            middles = middles[::-1]
+        self.positions = np.concatenate((self.positions, middles))
+        self.values = np.concatenate((self.values, np.full(middles.shape, np.nan)))
+        return True
+
+    def interpolate(self, x: np.ndarray) -> np.ndarray:
+        """Linear interpolation of the measured values"""
+        measured = ~np.isnan(self.values)
+        order = np.argsort(self.positions[measured])
+        return np.interp(x, self.positions[measured][order], self.values[measured][order])
+
+
+@ScannerFactory.register()
+class Scan1DAdaptive(Scan1DBase):
+    """ Scan starting from a coarse grid between start and stop, adding points where the signal varies the most
+
+    Each time all the planned points have been measured, the middles of the intervals where the signal (a channel of
+    a 0D data) varies by more than the gradient threshold or departs from a straight line by more than the curvature
+    threshold (fractions of the signal range) are added, until the point budget is reached.
+    """
+
+    scan_subtype = 'Adaptive'
+    do_process_data = True  # the refinement is fed with each measured point
+    distribution = DataDistribution.spread
+    params = [
+        {'title': 'Start:', 'name': 'start', 'type': 'float', 'value': 0.},
+        {'title': 'Stop:', 'name': 'stop', 'type': 'float', 'value': 1.},
+        {'title': 'Initial points:', 'name': 'n_initial', 'type': 'int', 'value': 11, 'min': 2},
+        {'title': 'Max points:', 'name': 'max_points', 'type': 'int', 'value': 51, 'min': 2,
+         'tip': 'Point budget, the initial points included'},
+        {'title': 'Gradient threshold:', 'name': 'gradient_threshold', 'type': 'float', 'value': 0.05, 'min': 0.,
+         'tip': 'Refine the intervals over which the signal varies by more than this fraction of its range '
+                '(0 to disable)'},
+        {'title': 'Curvature threshold:', 'name': 'curvature_threshold', 'type': 'float', 'value': 0.02, 'min': 0.,
+         'tip': 'Refine around the points departing from the line joining their neighbours by more than this '
+                'fraction of the signal range (0 to disable)'},
+        {'title': 'Min step:', 'name': 'min_step', 'type': 'float', 'value': 0., 'min': 0.},
+        {'title': 'Signal:', 'name': 'signal', 'type': 'str', 'value': '',
+         'tip': 'Full name (detector/data) of the 0D data driving the refinement, the first 0D data if empty'},
+        {'title': 'Channel:', 'name': 'channel', 'type': 'int', 'value': 0, 'min': 0},
+    ]
+
+    def __init__(self, actuators: List['DAQ_Move'] = None, settings: Parameter = None, **_ignored):
+        self.grid: AdaptiveGrid = None
+        super().__init__(actuators=actuators, settings=settings)
+
+    def to_dict(self) -> dict:
+        return {name: self.settings[name] for name in ('start', 'stop', 'n_initial', 'max_points', 'gradient_threshold',
+                                                       'curvature_threshold', 'min_step', 'signal', 'channel')}
+
+    def from_dict(self, scanner_dict: dict):
+        for name, value in scanner_dict.items():
+            self.settings[name] = value
+
+    def set_units(self):
+        """ Update settings units depending on the scanner type and the display_units boolean"""
+        for name in ('start', 'stop', 'min_step'):
+            self.settings.child(name).setOpts(suffix='' if not self.display_units else self.actuators[0].units)
+
+    def set_settings_titles(self):
+        if len(self.actuators) == 1:
+            for name in ('start', 'stop'):
+                self.settings.child(name).setOpts(title=f'{self.actuators[0].title} {name}:')
+
+    def set_scan(self):
+        self.grid = AdaptiveGrid(self.settings['start'], self.settings['stop'],
+                                 n_initial=self.settings['n_initial'],
+                                 max_points=max(self.settings['max_points'], self.settings['n_initial']),
+                                 gradient_threshold=self.settings['gradient_threshold'],
+                                 curvature_threshold=self.settings['curvature_threshold'],
+                                 min_step=self.settings['min_step'])
+        self.get_info_from_positions(self.grid.positions)
+
+    def evaluate_steps(self) -> int:
+        """Number of planned points, growing during the scan (DAQ_Scan checks it at each step)"""
+        return len(self.grid) if self.grid is not None else self.settings['n_initial']
+
+    def get_scan_shape(self) -> Tuple[int]:
+        return (self.grid.max_points,)  # the saved arrays are allocated for the whole budget
+
+    def get_nav_axes(self) -> List[Axis]:
+        """Planned positions when the scan starts, nan for the points refined later"""
+        data = np.full((self.grid.max_points,), np.nan)
+        data[:len(self.grid)] = self.grid.positions
+        return [Axis(label=f'{self.actuators[0].title}', units=f'{self.actuators[0].units}', data=data, index=0,
+                     spread_order=0)]
+
+    def signal(self, dte: DataToExport) -> Optional[float]:
+        """The value of the refined signal within the grabbed data"""
+        if self.settings['signal']:
+            dwa = dte.get_data_from_full_name(self.settings['signal'])
+        else:
+            data0D = dte.get_data_from_dim('Data0D')
+            dwa = data0D[0] if len(data0D) > 0 else None
+        if dwa is None or self.settings['channel'] >= len(dwa):
+            return None
+        return float(np.mean(dwa[self.settings['channel']]))
+
+    def process_data(self, dte: DataToExport) -> DataToExport:
+        """ Feed the refinement with the signal measured at the current position
+
+        Returns
+        -------
+        DataToExport: the actuator position and the signal used by the refinement, saved along the detectors data
+        """
+        index = self.current_scan_index
+        position = float(self.grid.positions[index])
+        value = self.signal(dte)
+        if value is None:
+            logger.warning(f'No signal {self.settings["signal"]} to refine the scan on, the initial grid is kept')
+            value = 0.
+        if self.grid.set_value(index, value):
+            self.get_info_from_positions(self.grid.positions)
+        return DataToExport('Adaptive', data=[
+            DataCalculated('Adaptive', data=[np.array([position]), np.array([value])],
+                           labels=[self.actuators[0].title if self.actuators else 'position', 'signal'])])
+
+    def update_from_scan_selector(self, scan_selector: Selector):
+        coordinates = scan_selector.get_coordinates()
+        if coordinates.shape == (2, 2) or coordinates.shape == (2, 1):
+            self.settings.child('start').setValue(coordinates[0, 0])
+            self.settings.child('stop').setValue(coordinates[1, 0])
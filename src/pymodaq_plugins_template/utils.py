@@ -4,12 +4,142 @@ Created the 31/08/2023
 
 @author: Sebastien Weber
 """
+import atexit
+import importlib
+import logging
+import pkgutil
+import threading
+import time
 from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
 
-from pymodaq_utils.config import BaseConfig, USER
+from pymodaq_utils.config import BaseConfig, ReaderWriterLock, USER
 
 
 class Config(BaseConfig):
-    """Main class to deal with configuration values for this plugin"""
+    """ Main class to deal with configuration values for this plugin
+
+    There is a single instance per process (as for all the pymodaq configs), loaded the first time one of its values
+    is accessed and not when it is created (at the import of the modules using it), then reloaded only if the
+    system-wide or the user toml file has been modified (checked at most every check_interval seconds). The values
+    set since the last save are applied again on top of the reloaded files, so that they are not lost.
+    """
     config_template_path = Path(__file__).parent.joinpath('resources/config_template.toml')
     config_name = f"config_{__package__.split('pymodaq_plugins_')[1]}"
+    check_interval = 1.  # minimum time in seconds between two checks of the modification time of the files
+
+    def __init__(self):
+        # BaseConfig.__init__ would load the files right away
+        self._lock = ReaderWriterLock()
+        self._load_lock = threading.Lock()
+        self._config = {}
+        self._modified_config = {}
+        self._unsaved: Dict[Any, Any] = {}  # values set since the last save, in the order they were set
+        self._mtimes: Optional[Tuple[int, int]] = None  # None until loaded
+        self._last_check = -float('inf')
+        atexit.register(self.save)
+
+    def _file_mtimes(self) -> Tuple[int, int]:
+        return tuple(path.stat().st_mtime_ns if path.is_file() else 0
+                     for path in (self.system_config_path, self.config_path))
+
+    @property
+    def loaded(self) -> bool:
+        return self._mtimes is not None
+
+    def _check_loaded(self):
+        """Load the files at the first access, then again if they have been modified since"""
+        now = time.monotonic()
+        if self._mtimes is not None and now - self._last_check < self.check_interval:
+            return
+        with self._load_lock:
+            self._last_check = now
+            if self._mtimes is None or self._file_mtimes() != self._mtimes:
+                self.load()
+
+    def load(self):
+        super().load()
+        for key, value in self._unsaved.items():
+            super().__setitem__(key, value)
+        self._mtimes = self._file_mtimes()
+        self._last_check = time.monotonic()
+
+    def save(self):
+        if not self.loaded:  # nothing read nor modified, the user file should not be overwritten with an empty one
+            return
+        with self._load_lock:
+            super().save()
+            self._unsaved.clear()
+            self._mtimes = self._file_mtimes()  # not to reload what has just been written
+
+    def __call__(self, *args):
+        self._check_loaded()
+        return super().__call__(*args)
+
+    def __contains__(self, item):
+        self._check_loaded()
+        return super().__contains__(item)
+
+    def __getitem__(self, item):
+        self._check_loaded()
+        return super().__getitem__(item)
+
+    def __setitem__(self, key, value):
+        self._check_loaded()
+        with self._load_lock:
+            super().__setitem__(key, value)
+            self._unsaved.pop(key, None)  # moved last, to be applied after the values set before it
+            self._unsaved[key] = value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        self._check_loaded()
+        return super().to_dict()
+
+    def get_children(self, *path):
+        self._check_loaded()
+        return super().get_children(*path)
+
+
+class PluginRegistry:
+    """ Lazy registry of the instrument plugin modules of a folder
+
+    Listing the plugins only reads the folder content, a plugin module (and whatever vendor SDK it depends on) is
+    imported the first time it is accessed as an attribute of its package: the ``__init__`` of the plugin packages
+    defines a module level ``__getattr__`` calling the ``load`` method of the registry.
+
+    Parameters
+    ----------
+    package: str
+        The name of the package holding the plugin modules
+    folder: Path
+        The folder of this package
+    logger: logging.Logger
+        Logger used to report plugins that couldn't be imported
+    """
+
+    def __init__(self, package: str, folder: Path, logger: logging.Logger):
+        self._package = package
+        self._logger = logger
+        self.names: List[str] = sorted(module.name for module in pkgutil.iter_modules([str(folder)]))
+        self._failed: Dict[str, str] = {}
+
+    def load(self, name: str) -> ModuleType:
+        """Import (once) and return the plugin module called name, raise AttributeError if not possible"""
+        if name not in self.names:
+            raise AttributeError(f'module {self._package!r} has no attribute {name!r}')
+        if name in self._failed:
+            raise AttributeError(f'{name} plugin couldn\'t be loaded: {self._failed[name]}')
+        try:
+            return importlib.import_module(f'.{name}', self._package)
+        except Exception as e:
+            self._failed[name] = str(e)
+            self._logger.warning("{:} plugin couldn't be loaded due to some missing packages or errors: {:}".format(
+                name, str(e)))
+            raise AttributeError(f'{name} plugin couldn\'t be loaded: {str(e)}') from e
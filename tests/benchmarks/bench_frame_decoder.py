@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the balance frame decoding: vectorized FrameDecoder against the per-line parse_frame
+
+Run it with: python tests/benchmarks/bench_frame_decoder.py
+"""
+import time
+
+import numpy as np
+
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+from pymodaq_plugins_template.hardware.frame_decoder import FrameDecoder, parse_frame, FRAME_DTYPE
+
+
+def make_chunk(n_frames: int, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    values = rng.normal(100, 50, n_frames)
+    status = rng.choice(['ST', 'US'], n_frames)
+    return ''.join(f'{st},GS,{value:9.3f} g\r\n' for st, value in zip(status, values)).encode()
+
+
+def naive_decode(chunk: bytes) -> np.ndarray:
+    return np.array([parse_frame(line) for line in chunk.splitlines() if line], dtype=FRAME_DTYPE)
+
+
+def bench(decode, chunk: bytes, n_frames: int, repeat: int = 5) -> float:
+    """Best frames/second rate over repeat runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(chunk)
+        best = min(best, time.perf_counter() - start)
+    return n_frames / best
+
+
+def main(chunk_sizes=(100, 1000, 10000, 100000)):
+    print(f'{"frames/chunk":>12} {"naive (frames/s)":>18} {"vectorized (frames/s)":>22} {"speedup":>8}')
+    for n_frames in chunk_sizes:
+        chunk = make_chunk(n_frames)
+        naive = bench(naive_decode, chunk, n_frames)
+        vectorized = bench(FrameDecoder().decode, chunk, n_frames)
+        print(f'{n_frames:>12} {naive:>18.3g} {vectorized:>22.3g} {vectorized / naive:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Cold import time of a plugin package holding many plugin files: eager __init__ (importing every plugin module)
+against the lazy PluginRegistry one
+
+Two throw-away plugin packages are generated in a temporary folder, each with the same number of copies of the
+daq_move_Template plugin, and imported from fresh interpreters with ``python -X importtime``.
+
+Run it with: python tests/benchmarks/bench_import_time.py [number_of_plugins]
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import pymodaq_plugins_template
+
+PACKAGE_PATH = Path(pymodaq_plugins_template.__file__).parent
+
+EAGER_INIT = '''import importlib
+from pathlib import Path
+from .. import set_logger
+logger = set_logger('move_plugins', add_to_console=False)
+
+for path in Path(__file__).parent.iterdir():
+    try:
+        if '__init__' not in str(path):
+            importlib.import_module('.' + path.stem, __package__)
+    except Exception as e:
+        logger.warning("{:} plugin couldn't be loaded due to some missing packages or errors: {:}".format(path.stem,
+                                                                                                          str(e)))
+        pass
+'''
+
+
+def make_package(root: Path, name: str, n_plugins: int, eager: bool):
+    package = root.joinpath(name)
+    plugins = package.joinpath('daq_move_plugins')
+    plugins.mkdir(parents=True)
+    package.joinpath('__init__.py').write_text('from pymodaq_utils.logger import set_logger\n')
+    shutil.copy(PACKAGE_PATH.joinpath('utils.py'), package.joinpath('utils.py'))
+    if eager:
+        plugins.joinpath('__init__.py').write_text(EAGER_INIT)
+    else:
+        shutil.copy(PACKAGE_PATH.joinpath('daq_move_plugins', '__init__.py'), plugins.joinpath('__init__.py'))
+    template = PACKAGE_PATH.joinpath('daq_move_plugins', 'daq_move_Template.py').read_text()
+    for ind in range(n_plugins):
+        plugins.joinpath(f'daq_move_Bench{ind}.py').write_text(
+            template.replace('DAQ_Move_Template', f'DAQ_Move_Bench{ind}'))
+
+
+def import_time(root: Path, module: str, repeat: int = 3) -> float:
+    """Best cumulated import time (in ms) of module measured in fresh interpreters"""
+    env = dict(os.environ, PYTHONPATH=str(root) + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    best = float('inf')
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                capture_output=True, text=True, env=env, check=True)
+        for line in result.stderr.splitlines():
+            match = re.match(r'import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)$', line)
+            if match and match.group(2) == module:
+                best = min(best, int(match.group(1)) / 1000)
+    return best
+
+
+def main(n_plugins: int = 50):
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_package(root, 'pymodaq_plugins_bencheager', n_plugins, eager=True)
+        make_package(root, 'pymodaq_plugins_benchlazy', n_plugins, eager=False)
+        eager = import_time(root, 'pymodaq_plugins_bencheager.daq_move_plugins')
+        lazy = import_time(root, 'pymodaq_plugins_benchlazy.daq_move_plugins')
+    print(f'{n_plugins} plugin files, cold import of the daq_move_plugins package:')
+    print(f'  eager: {eager:8.1f} ms')
+    print(f'  lazy:  {lazy:8.1f} ms  ({eager / lazy:.0f}x faster)')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,505 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite of the plugin hot paths, compared against a machine-readable baseline
+
+The move and 0D viewer templates are driven against simulated controllers (see simulated_plugins.py and
+hardware/simulator.py) to measure:
+
+* the cold import time of the plugin packages
+* the ini_detector and ini_stage latencies
+* the grab_data -> dte_signal latency percentiles (continuous acquisition)
+* the sustained number of readings per second going through the viewer acquisition path
+* the move_abs -> move_done latency
+* the delay between the end of a real (finite velocity) move and move_done, and the number of position queries per
+  move, for each completion mode of the move template (fixed polling, adaptive polling, controller events)
+* the cost of the unit conversions and scaling of each poll of the move template (float fast path), compared with
+  the same poll through the pint based DataActuator conversions of DAQ_Move_base
+* the duration of the 2D viewer template callback for megapixel images read into its frame pool and emitted
+  without copy, compared with images allocated and copied for each frame, and the fraction of the images read into
+  a recycled pool image while the consumers hold the last emitted data, then the duration of the callback and the
+  size of the emitted data with the images cropped and binned in the plugin
+* the time to apply a burst of settings changes (preset loading) to the 0D viewer template, with the changes
+  batched over the settings window and applied one by one
+* the memory growth over a long acquisition run
+* the append latency, the throughput and the memory growth of the streaming HDF5 log writer fed at 1 kHz
+
+The results are compared with baseline.json: the run fails (exit code 1) if any metric is worse than its baseline
+value by more than its tolerance. Timings depend on the machine, regenerate the baseline on the machine running the
+benchmarks (for instance the CI runner) with --update.
+
+Run it with: python tests/benchmarks/run_benchmarks.py [--update] [--output results.json] [metric names...]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from collections import deque
+
+import numpy as np
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from qtpy import QtWidgets
+
+from pymodaq.control_modules.move_utility_classes import DAQ_Move_base
+from pymodaq.utils.data import DataActuator, DataFromPlugins
+from pymodaq_data.data import Axis
+
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+from pymodaq_plugins_template.exporters.h5_log_exporter import H5LogWriter
+from pymodaq_plugins_template.hardware.connection_pool import controller_pool
+from pymodaq_plugins_template.hardware.ring_buffer import RingBuffer
+from pymodaq_plugins_template.hardware.simulator import BalanceSimulator
+
+from simulated_plugins import (load_template, SimulatedBalance, SimulatedCamera, SimulatedStage, MOVE_TEMPLATE,
+                               VIEWER_0D_TEMPLATE, VIEWER_2D_TEMPLATE)
+
+PACKAGE = 'pymodaq_plugins_template'
+BASELINE_PATH = Path(__file__).parent.joinpath('baseline.json')
+DEFAULT_TOLERANCE = 0.5  # relative degradation allowed before a metric is considered a regression
+
+# metric name: (unit, True if higher is better)
+METRICS = {
+    'import_time_ms': ('ms', False),
+    'ini_detector_ms': ('ms', False),
+    'ini_stage_ms': ('ms', False),
+    'grab_latency_p50_ms': ('ms', False),
+    'grab_latency_p95_ms': ('ms', False),
+    'grab_latency_p99_ms': ('ms', False),
+    'sustained_readings_per_s': ('1/s', True),
+    'move_done_latency_ms': ('ms', False),
+    'move_done_delay_polling_ms': ('ms', False),
+    'move_done_delay_adaptive_ms': ('ms', False),
+    'move_done_delay_events_ms': ('ms', False),
+    'queries_per_move_polling': ('', False),
+    'queries_per_move_adaptive': ('', False),
+    'queries_per_move_events': ('', False),
+    'poll_conversion_us': ('us', False),
+    'poll_conversion_pint_us': ('us', False),
+    'frame_callback_ms': ('ms', False),
+    'frame_callback_copy_ms': ('ms', False),
+    'frame_pool_hit_ratio': ('', True),
+    'frame_callback_roi_ms': ('ms', False),
+    'frame_emitted_roi_kb': ('kB', False),
+    'settings_burst_ms': ('ms', False),
+    'settings_burst_unbatched_ms': ('ms', False),
+    'memory_growth_kb': ('kB', False),
+    'h5_log_append_p99_us': ('us', False),
+    'h5_log_readings_per_s': ('1/s', True),
+    'h5_log_memory_growth_kb': ('kB', False),
+}
+
+
+def application() -> QtWidgets.QApplication:
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+
+def bench_import_time(repeat: int = 3) -> Dict[str, float]:
+    """Best cumulated cold import time of the package and of its plugin packages, in fresh interpreters"""
+    modules = [PACKAGE, f'{PACKAGE}.daq_move_plugins'] + \
+              [f'{PACKAGE}.daq_viewer_plugins.plugins_{dim}' for dim in ('0D', '1D', '2D', 'ND')]
+    best = float('inf')
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {", ".join(modules)}'],
+                                capture_output=True, text=True, check=True)
+        total = 0
+        for line in result.stderr.splitlines():
+            match = re.match(r'import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)$', line)
+            if match and match.group(2) in modules:
+                total += int(match.group(1))
+        best = min(best, total / 1000)
+    return dict(import_time_ms=best)
+
+
+class ViewerBench:
+    """A 0D viewer template plugin streaming from a simulated balance"""
+
+    def __init__(self, simulator: BalanceSimulator):
+        SimulatedBalance.port = simulator.port
+        SimulatedBalance.baudrate = simulator.baudrate
+        self.module = load_template(VIEWER_0D_TEMPLATE, SimulatedBalance)
+        self.emitted: List[float] = []
+        self.plugin = None
+
+    def init(self) -> float:
+        """Initialize a new plugin instance, returns the ini_detector duration in s"""
+        self.plugin = self.module.DAQ_0DViewer_Template(None, None)
+        self.plugin.settings.child('link', 'port').setValue(SimulatedBalance.port)
+        self.plugin.dte_signal.connect(lambda dte: self.emitted.append(time.perf_counter()))
+        start = time.perf_counter()
+        info, initialized = self.plugin.ini_detector()
+        duration = time.perf_counter() - start
+        assert initialized
+        return duration
+
+    def close(self):
+        self.plugin.close()
+
+    def grab(self, naverage: int = 1) -> float:
+        """grab_data -> dte_signal latency in s"""
+        self.emitted.clear()
+        start = time.perf_counter()
+        self.plugin.grab_data(Naverage=naverage)
+        return self.emitted[-1] - start if self.emitted else float('nan')
+
+
+def bench_viewer(n_inits: int = 5, n_grabs: int = 500, duration: float = 3., n_memory_grabs: int = 3000) -> \
+        Dict[str, float]:
+    application()
+    controller_pool.linger = 0.  # measure full initializations, opening the port each time
+    with BalanceSimulator(baudrate=921600, latency=0.001, rate=2000., seed=0) as simulator:
+        bench = ViewerBench(simulator)
+        inits = []
+        for _ in range(n_inits):
+            inits.append(bench.init())
+            bench.close()
+
+        bench.init()
+        try:
+            for _ in range(50):  # warm up
+                bench.grab()
+            latencies = np.array([bench.grab() for _ in range(n_grabs)]) * 1000
+
+            readings = 0
+            start = time.perf_counter()
+            while time.perf_counter() - start < duration:
+                bench.grab(naverage=100)
+                readings += 100
+            rate = readings / (time.perf_counter() - start)
+
+            tracemalloc.start()
+            for _ in range(200):
+                bench.grab()
+            before, _ = tracemalloc.get_traced_memory()
+            for _ in range(n_memory_grabs):
+                bench.grab()
+            after, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            bench.close()
+    return dict(ini_detector_ms=float(np.median(inits)) * 1000,
+                grab_latency_p50_ms=float(np.nanpercentile(latencies, 50)),
+                grab_latency_p95_ms=float(np.nanpercentile(latencies, 95)),
+                grab_latency_p99_ms=float(np.nanpercentile(latencies, 99)),
+                sustained_readings_per_s=rate,
+                memory_growth_kb=max(after - before, 0) / 1024)
+
+
+def bench_move(n_inits: int = 5, n_moves: int = 20, timeout: float = 5.) -> Dict[str, float]:
+    app = application()
+    controller_pool.linger = 0.
+    module = load_template(MOVE_TEMPLATE, SimulatedStage)
+    inits = []
+    latencies = []
+    for ind in range(n_inits):
+        plugin = module.DAQ_Move_Template(None, None)
+        start = time.perf_counter()
+        info, initialized = plugin.ini_stage()
+        inits.append(time.perf_counter() - start)
+        assert initialized
+        if ind < n_inits - 1:
+            plugin.close()
+
+    done = []
+    plugin.move_done_signal.connect(lambda position: done.append(time.perf_counter()))
+    for ind in range(n_moves):
+        done.clear()
+        plugin.move_is_done = False  # as done by the DAQ_Move worker before a move
+        start = time.perf_counter()
+        plugin.move_abs(DataActuator(data=float(ind % 2), units=plugin.axis_unit))
+        plugin.poll_moving()
+        while not done and time.perf_counter() - start < timeout:
+            app.processEvents()
+            time.sleep(0.0005)
+        latencies.append(done[0] - start if done else float('nan'))
+    plugin.close()
+    return dict(ini_stage_ms=float(np.median(inits)) * 1000,
+                move_done_latency_ms=float(np.nanmedian(latencies)) * 1000)
+
+
+def bench_move_completion(n_moves: int = 10, velocity: float = 2., timeout: float = 5.) -> Dict[str, float]:
+    """ Moves of one unit at velocity units/s in each completion mode, the delay is measured from the time the stage
+    actually reaches its target"""
+    app = application()
+    controller_pool.linger = 0.
+    module = load_template(MOVE_TEMPLATE, type('SlowStage', (SimulatedStage,), dict(velocity=velocity)))
+    results = {}
+    for mode, suffix in (('Polling', 'polling'), ('Adaptive polling', 'adaptive'), ('Events', 'events')):
+        plugin = module.DAQ_Move_Template(None, None)
+        plugin.settings.child('completion', 'completion_mode').setValue(mode)
+        plugin.epsilon = 1e-6  # done when actually arrived, not within 0.1 unit
+        plugin.ini_stage()
+        stage = plugin.controller.controller  # the wrapper within the shared link
+        done = []
+        plugin.move_done_signal.connect(lambda position: done.append(time.perf_counter()))
+        delays = []
+        queries = []
+        for ind in range(n_moves):
+            done.clear()
+            plugin.move_is_done = False
+            start_queries = stage.queries
+            start = time.perf_counter()
+            plugin.move_abs(DataActuator(data=float((ind + 1) % 2), units=plugin.axis_unit))
+            plugin.poll_moving()
+            while not done and time.perf_counter() - start < timeout:
+                app.processEvents()
+                time.sleep(0.0005)
+            delays.append(done[0] - stage.arrival_time if done else float('nan'))
+            queries.append(stage.queries - start_queries)
+        plugin.close()
+        results[f'move_done_delay_{suffix}_ms'] = float(np.nanmedian(delays)) * 1000
+        results[f'queries_per_move_{suffix}'] = float(np.mean(queries))
+    return results
+
+
+def bench_poll_conversion(n_polls: int = 2000) -> Dict[str, float]:
+    """ Duration of the conversions of a poll (get_actuator_value then the epsilon condition) with a scaled axis, with
+    the float fast path of the template and with the pint based conversions of DAQ_Move_base"""
+    application()
+    controller_pool.linger = 0.
+    module = load_template(MOVE_TEMPLATE, SimulatedStage)
+    plugin = module.DAQ_Move_Template(None, None)
+    plugin.settings.child('scaling', 'use_scaling').setValue(True)
+    plugin.settings.child('scaling', 'scaling').setValue(2.)
+    plugin.settings.child('scaling', 'offset').setValue(0.5)
+    plugin.settings.child('settling', 'wait_settled').setValue(True)
+    plugin.ini_stage()
+    plugin.target_value = DataActuator(data=1., units=plugin.axis_unit)
+    stage = plugin.controller
+
+    def fast_poll():
+        plugin.current_value = plugin.get_actuator_value()
+        return plugin.absolute_difference_condition_to_reach_target()
+
+    def pint_poll():
+        position = plugin.get_position_with_scaling(
+            DataActuator(data=stage.your_method_to_get_the_actuator_value(), units=plugin.axis_unit))
+        plugin.settling.update(position.value(plugin.axis_unit))
+        plugin.current_value = position
+        return DAQ_Move_base.absolute_difference_condition_to_reach_target(plugin)
+
+    results = {}
+    for name, poll in (('poll_conversion_us', fast_poll), ('poll_conversion_pint_us', pint_poll)):
+        durations = []
+        for _ in range(n_polls):
+            start = time.perf_counter()
+            poll()
+            durations.append(time.perf_counter() - start)
+        results[name] = float(np.median(durations)) * 1e6
+    plugin.close()
+    return results
+
+
+def bench_frame_callback(n_frames: int = 300, n_held: int = 2,
+                         roi: Dict[str, int] = None) -> Dict[str, float]:
+    """ Callback of the 2D viewer template for each megapixel image, the consumers of dte_signal holding the last
+    n_held emitted data (display, saving), compared with the same emission of images allocated and copied from the
+    driver buffer for each frame (reduced from a stack of one image, as without the pool), then with the images
+    cropped and binned following the roi settings (a 256x256 region binned 2x2 by default)"""
+    if roi is None:
+        roi = dict(roi_x0=384, roi_y0=384, roi_width=256, roi_height=256, x_binning=2, y_binning=2)
+    application()
+    module = load_template(VIEWER_2D_TEMPLATE, SimulatedCamera)
+    plugin = module.DAQ_2DViewer_Template(None, None)
+    camera = plugin.controller = SimulatedCamera()
+    plugin.x_axis = Axis(data=camera.your_method_to_get_the_x_axis(), index=1)
+    plugin.y_axis = Axis(data=camera.your_method_to_get_the_y_axis(), index=0)
+    plugin.update_roi()
+    plugin.prepare_averaging(1)
+    held = deque(maxlen=n_held)
+    plugin.dte_signal.connect(held.append)
+    frames = RingBuffer(1, sample_shape=camera.shape)
+
+    def copy_callback():
+        frames.append(camera.your_method_to_get_data_from_buffer())
+        images, _ = frames.drain()
+        plugin.emit_data([DataFromPlugins(name='Mock1', data=[images.mean(axis=0)], dim='Data2D',
+                                          x_axis=plugin.x_axis, y_axis=plugin.y_axis),
+                          DataFromPlugins(name='Mock1_std', data=[images.std(axis=0)], dim='Data2D',
+                                          x_axis=plugin.x_axis, y_axis=plugin.y_axis)])
+
+    def pool_callback():
+        plugin.prepare_averaging(1)
+        plugin.callback()
+
+    def roi_callback():
+        if plugin.roi.identity:
+            for name, value in roi.items():
+                plugin.settings.child('roi', name).setValue(value)
+            plugin.update_roi()
+        pool_callback()
+
+    results = {}
+    for name, callback in (('frame_callback_ms', pool_callback), ('frame_callback_copy_ms', copy_callback),
+                           ('frame_callback_roi_ms', roi_callback)):
+        hits = plugin.pool.hits
+        durations = []
+        for _ in range(n_frames):
+            start = time.perf_counter()
+            callback()
+            durations.append(time.perf_counter() - start)
+        results[name] = float(np.median(durations)) * 1000
+        if callback is pool_callback:
+            results['frame_pool_hit_ratio'] = (plugin.pool.hits - hits) / n_frames
+        if callback is roi_callback:
+            results['frame_emitted_roi_kb'] = sum(array.nbytes for dwa in held[-1] for array in dwa) / 1024
+        held.clear()
+    return results
+
+
+def bench_settings_burst(n_changes: int = 10, repeat: int = 5, timeout: float = 5.) -> Dict[str, float]:
+    """ n_changes of the streaming buffer size (each one restarting the instrument continuous output) as when loading
+    a preset or dragging a spinbox, timed until they are all applied, batched and with a zero settings window"""
+    app = application()
+    controller_pool.linger = 0.
+    results = {}
+    with BalanceSimulator(baudrate=921600, latency=0.001, rate=2000., seed=0) as simulator:
+        bench = ViewerBench(simulator)
+        bench.init()
+        plugin = bench.plugin
+        try:
+            for metric, window in (('settings_burst_ms', 20.), ('settings_burst_unbatched_ms', 0.)):
+                plugin.settings.child('settings_batch', 'settings_window').setValue(window)
+                plugin.commit_settings(plugin.settings.child('settings_batch', 'settings_window'))
+                durations = []
+                for ind in range(repeat):
+                    batches = plugin.settings_batch.batches
+                    start = time.perf_counter()
+                    for change in range(n_changes):
+                        param = plugin.settings.child('streaming', 'buffer_size')
+                        param.setValue(10000 + 100 * (ind * n_changes + change))
+                        plugin.commit_settings(param)
+                    while plugin.settings_batch.pending and time.perf_counter() - start < timeout:
+                        app.processEvents()
+                        time.sleep(0.0005)
+                    durations.append(time.perf_counter() - start)
+                    assert plugin.settings_batch.batches > batches
+                # the window itself is part of the duration, as for a user loading a preset
+                results[metric] = float(np.median(durations)) * 1000
+        finally:
+            bench.close()
+    return results
+
+
+def bench_h5_log(rate: float = 1000., duration: float = 3., n_readings: int = 1_000_000) -> Dict[str, float]:
+    """ Log writer fed reading by reading at rate Hz (append latency and memory growth), then as fast as possible
+    (throughput)"""
+    with tempfile.TemporaryDirectory() as directory:
+        with H5LogWriter(Path(directory).joinpath('paced.h5'), chunk_size=1024, flush_interval=1.) as writer:
+            latencies = []
+            tracemalloc.start()
+            before, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+            for ind in range(int(rate * duration)):
+                while time.perf_counter() < start + ind / rate:
+                    pass
+                tick = time.perf_counter()
+                writer.append(float(ind), stable=True)
+                latencies.append(time.perf_counter() - tick)
+            latencies = np.array(latencies)  # allocated before measuring the memory growth
+            after, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        with H5LogWriter(Path(directory).joinpath('throughput.h5')) as writer:
+            start = time.perf_counter()
+            for ind in range(n_readings):
+                writer.append(float(ind))
+            writer.wait()
+            throughput = n_readings / (time.perf_counter() - start)
+    return dict(h5_log_append_p99_us=float(np.percentile(latencies, 99)) * 1e6,
+                h5_log_readings_per_s=throughput,
+                h5_log_memory_growth_kb=max(after - before - latencies.nbytes, 0) / 1024)
+
+
+# benchmark function: metrics it produces
+BENCHMARKS: Dict[Callable[[], Dict[str, float]], List[str]] = {
+    bench_import_time: ['import_time_ms'],
+    bench_viewer: ['ini_detector_ms', 'grab_latency_p50_ms', 'grab_latency_p95_ms', 'grab_latency_p99_ms',
+                   'sustained_readings_per_s', 'memory_growth_kb'],
+    bench_move: ['ini_stage_ms', 'move_done_latency_ms'],
+    bench_move_completion: ['move_done_delay_polling_ms', 'move_done_delay_adaptive_ms', 'move_done_delay_events_ms',
+                            'queries_per_move_polling', 'queries_per_move_adaptive', 'queries_per_move_events'],
+    bench_poll_conversion: ['poll_conversion_us', 'poll_conversion_pint_us'],
+    bench_frame_callback: ['frame_callback_ms', 'frame_callback_copy_ms', 'frame_pool_hit_ratio',
+                           'frame_callback_roi_ms', 'frame_emitted_roi_kb'],
+    bench_settings_burst: ['settings_burst_ms', 'settings_burst_unbatched_ms'],
+    bench_h5_log: ['h5_log_append_p99_us', 'h5_log_readings_per_s', 'h5_log_memory_growth_kb'],
+}
+
+
+def compare(results: Dict[str, float], baseline: Dict) -> List[str]:
+    """Messages describing the metrics worse than their baseline by more than their tolerance"""
+    regressions = []
+    for name, value in results.items():
+        reference = baseline.get('metrics', {}).get(name)
+        if reference is None:
+            continue
+        tolerance = reference.get('tolerance', baseline.get('tolerance', DEFAULT_TOLERANCE))
+        slack = reference.get('slack', 0.)
+        higher_is_better = METRICS[name][1]
+        if higher_is_better:
+            limit = reference['value'] * (1 - tolerance) - slack
+            failed = not value >= limit
+        else:
+            limit = reference['value'] * (1 + tolerance) + slack
+            failed = not value <= limit
+        if failed:
+            regressions.append(f'{name}: {value:.4g} {METRICS[name][0]} (baseline {reference["value"]:.4g}, '
+                               f'limit {limit:.4g})')
+    return regressions
+
+
+def update_baseline(results: Dict[str, float], path: Path):
+    baseline = json.loads(path.read_text()) if path.exists() else dict(tolerance=DEFAULT_TOLERANCE, metrics={})
+    for name, value in results.items():
+        metric = baseline['metrics'].setdefault(name, {})
+        metric.update(value=float(f'{value:.4g}'), unit=METRICS[name][0], higher_is_better=METRICS[name][1])
+    path.write_text(json.dumps(baseline, indent=2) + '\n')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('metrics', nargs='*', help='run only the benchmarks producing these metrics')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--update', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--output', type=Path, help='also save the results in this json file')
+    args = parser.parse_args(argv)
+
+    unknown = set(args.metrics) - set(METRICS)
+    if unknown:
+        parser.error(f'Unknown metrics {sorted(unknown)}, available: {list(METRICS)}')
+    results = {}
+    for benchmark, metrics in BENCHMARKS.items():
+        if not args.metrics or set(args.metrics) & set(metrics):
+            with contextlib.redirect_stdout(io.StringIO()):  # status messages of the plugins without parent
+                results.update(benchmark())
+    if args.metrics:
+        results = {name: value for name, value in results.items() if name in args.metrics}
+
+    for name, value in results.items():
+        print(f'{name:>26}: {value:10.4g} {METRICS[name][0]}')
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2) + '\n')
+    if args.update:
+        update_baseline(results, args.baseline)
+        print(f'Baseline updated: {args.baseline}')
+        return 0
+
+    regressions = compare(results, json.loads(args.baseline.read_text())) if args.baseline.exists() else []
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Runnable versions of the instrument plugin templates driven by simulated controllers, for the benchmarks
+
+The template modules are loaded from their source with the ``raise NotImplementedError`` placeholders removed (as
+instructed by their "remove this line" comments) and with PythonWrapperOfYourInstrument replaced by a simulated
+controller exposing the placeholder method names: the benchmarks then exercise the actual template code paths.
+"""
+import threading
+import time
+import types
+from pathlib import Path
+
+import numpy as np
+
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import pymodaq_plugins_template
+from pymodaq_plugins_template.hardware.balance import Balance
+
+PACKAGE_PATH = Path(pymodaq_plugins_template.__file__).parent
+MOVE_TEMPLATE = PACKAGE_PATH.joinpath('daq_move_plugins', 'daq_move_Template.py')
+VIEWER_0D_TEMPLATE = PACKAGE_PATH.joinpath('daq_viewer_plugins', 'plugins_0D', 'daq_0Dviewer_Template.py')
+VIEWER_1D_TEMPLATE = PACKAGE_PATH.joinpath('daq_viewer_plugins', 'plugins_1D', 'daq_1Dviewer_Template.py')
+VIEWER_2D_TEMPLATE = PACKAGE_PATH.joinpath('daq_viewer_plugins', 'plugins_2D', 'daq_2Dviewer_Template.py')
+
+
+def load_template(file: Path, wrapper: type) -> types.ModuleType:
+    """ Load a template plugin module without its NotImplementedError placeholders
+
+    Parameters
+    ----------
+    file: Path
+        The template source file
+    wrapper: type
+        Class used in place of PythonWrapperOfYourInstrument
+    """
+    lines = [line for line in file.read_text(encoding='utf-8').splitlines()
+             if not line.strip().startswith('raise NotImplementedError')]
+    module = types.ModuleType(f'simulated_{file.stem}')
+    module.__file__ = str(file)
+    exec(compile('\n'.join(lines), str(file), 'exec'), module.__dict__)
+    module.PythonWrapperOfYourInstrument = wrapper
+    module.arg1 = module.arg2 = None  # placeholder arguments of the wrapper instantiation
+    return module
+
+
+class SimulatedBalance(Balance):
+    """Balance wrapper exposing the placeholder method names of the 0D viewer template"""
+    port = ''  # set to the BalanceSimulator port before initializing the plugin
+    baudrate = 115200
+
+    def open_communication(self, *args, **kwargs):
+        super().open_communication(self.port, baudrate=self.baudrate, timeout=0.05)
+
+    def a_method_or_atttribute_to_check_if_init(self) -> bool:
+        return self.is_open
+
+    def your_method_to_select_the_address(self, address: int):
+        pass  # a single balance on the port
+
+    your_method_to_terminate_the_communication = Balance.close_communication
+    your_method_to_start_continuous_output = Balance.start_continuous
+    your_method_to_read_the_output_stream = Balance.read_stream
+    your_method_to_stop_continuous_output = Balance.stop_continuous
+    your_method_to_start_a_grab_snap = Balance.weigh
+    your_method_to_stop_acquisition = Balance.stop_continuous
+
+
+class SimulatedStage:
+    """ Stage moving at constant velocity (instantly if infinite), with the placeholder method names of the actuator
+    template
+
+    The position queries are counted (link traffic) and the registered callback is called with the position when a
+    move ends (status push)
+    """
+    velocity = float('inf')
+
+    def __init__(self, *args):
+        self._start = 0.
+        self._target = 0.
+        self._start_time = time.perf_counter()
+        self._callback = None
+        self._push_timer: threading.Timer = None
+        self.queries = 0
+        self.arrival_time = self._start_time
+
+    def a_method_or_atttribute_to_check_if_init(self) -> bool:
+        return True
+
+    def your_method_to_select_the_address(self, address: int):
+        pass  # a single stage on the port
+
+    def your_method_to_register_a_position_callback(self, callback):
+        self._callback = callback
+
+    def your_method_to_get_the_actuator_value(self) -> float:
+        self.queries += 1
+        return self._position()
+
+    def _position(self) -> float:
+        travel = abs(self._target - self._start)
+        elapsed = time.perf_counter() - self._start_time
+        if travel == 0 or elapsed * self.velocity >= travel:
+            return self._target
+        return self._start + (self._target - self._start) * elapsed * self.velocity / travel
+
+    def your_method_to_set_an_absolute_value(self, value: float):
+        self._start = self._position()
+        self._target = value
+        self._start_time = time.perf_counter()
+        duration = abs(self._target - self._start) / self.velocity
+        self.arrival_time = self._start_time + duration
+        if self._push_timer is not None:
+            self._push_timer.cancel()
+        if self._callback is not None:
+            self._push_timer = threading.Timer(duration, self._callback, (value, False))
+            self._push_timer.start()
+
+    def your_method_to_set_a_relative_value(self, value: float):
+        self.your_method_to_set_an_absolute_value(self._target + value)
+
+    def your_method_to_get_to_a_known_reference(self):
+        self.your_method_to_set_an_absolute_value(0.)
+
+    def your_method_to_stop_positioning(self):
+        self.your_method_to_set_an_absolute_value(self._position())
+
+    def your_method_to_terminate_the_communication(self):
+        if self._push_timer is not None:
+            self._push_timer.cancel()
+
+
+class SimulatedCamera:
+    """ Camera with the placeholder method names of the 2D viewer template, its driver buffer holding a fixed image
+
+    The acquisition is instantaneous: the callback of an asynchronous grab is called immediately
+    """
+    shape = (1024, 1024)
+
+    def __init__(self, *args):
+        self.buffer = np.random.default_rng(0).random(self.shape)
+
+    def a_method_or_atttribute_to_check_if_init(self) -> bool:
+        return True
+
+    def your_method_to_get_the_x_axis(self) -> np.ndarray:
+        return np.arange(self.shape[1], dtype=float)
+
+    def your_method_to_get_the_y_axis(self) -> np.ndarray:
+        return np.arange(self.shape[0], dtype=float)
+
+    def your_method_to_start_a_grab_snap(self, callback=None):
+        if callback is not None:
+            callback()
+
+    def your_method_to_get_data_from_buffer(self, out: np.ndarray = None) -> np.ndarray:
+        """Copy of the driver buffer, into out if given"""
+        if out is None:
+            return self.buffer.copy()
+        np.copyto(out, self.buffer)
+        return out
+
+    def your_method_to_stop_acquisition(self):
+        pass
@@ -0,0 +1,89 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import numpy as np
+import pytest
+from qtpy import QtCore
+
+from pymodaq_data.data import DataToExport, DataRaw
+from pymodaq_gui.utils import DockArea
+
+from pymodaq_plugins_template.extensions.acquisition_scheduler import AcquisitionScheduler
+
+
+class Detector(QtCore.QObject):
+    """Stands for a DAQ_Viewer answering a grab command after delay ms"""
+    grab_done_signal = QtCore.Signal(DataToExport)
+
+    def __init__(self, title: str, delay: int):
+        super().__init__()
+        self.title = title
+        self.delay = delay
+        self.grabs = 0
+
+    def grab(self):
+        self.grabs += 1
+        QtCore.QTimer.singleShot(self.delay, lambda: self.grab_done_signal.emit(
+            DataToExport(self.title, data=[DataRaw(self.title, data=[np.array([float(self.grabs)])],
+                                                   origin=self.title)])))
+
+
+class ModulesManager(QtCore.QObject):
+    """The parts of the ModulesManager used by the scheduler"""
+    det_done_signal = QtCore.Signal(DataToExport)
+    timeout_signal = QtCore.Signal(list)
+
+    def __init__(self, detectors):
+        super().__init__()
+        self.detectors = detectors
+        self._received = DataToExport('ModulesManager')
+        self._n_received = 0
+
+    def connect_detectors(self, connect=True):
+        for detector in self.detectors:
+            if connect:
+                detector.grab_done_signal.connect(self.det_done)
+            else:
+                detector.grab_done_signal.disconnect(self.det_done)
+
+    def grab_data_with_callback(self, callback=None, do_connect_modules=True):
+        self._received = DataToExport('ModulesManager')
+        self._n_received = 0
+        self.det_done_signal.connect(callback)
+        for detector in self.detectors:
+            detector.grab()
+
+    def forget_callback(self, callback, disconnect_modules=True):
+        try:
+            self.det_done_signal.disconnect(callback)
+        except TypeError:
+            pass
+        if disconnect_modules:
+            self.connect_detectors(False)
+
+    def det_done(self, dte: DataToExport):
+        self._received.append(dte)
+        self._n_received += 1
+        if self._n_received == len(self.detectors):
+            self.det_done_signal.emit(self._received)
+
+
+def test_synchronized_cycles(qtbot):
+    area = DockArea()
+    scheduler = AcquisitionScheduler(area, None)
+    detectors = [Detector('balance_1', 5), Detector('balance_2', 20)]
+    scheduler._modules_manager = ModulesManager(detectors)
+    scheduler.settings.child('n_cycles').setValue(5)
+    merged = []
+    scheduler.merged_signal.connect(merged.append)
+
+    scheduler.start()
+    qtbot.waitUntil(lambda: not scheduler._running, timeout=5000)
+
+    assert len(merged) == 5
+    assert all(detector.grabs == 5 for detector in detectors)
+    for dte in merged:
+        assert len(dte) == 2
+        assert len({dwa.timestamp for dwa in dte}) == 1  # common timestamp of the cycle
+    assert scheduler.lags['balance_2'].mean > scheduler.lags['balance_1'].mean
+    assert scheduler.lags['balance_2'].count == 5
+    assert scheduler.settings['statistics', 'cycles_done'] == 5
+    assert 'mean=' in scheduler.settings['statistics', 'lags', 'balance_1']
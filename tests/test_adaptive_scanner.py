@@ -0,0 +1,60 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import numpy as np
+import pytest
+
+from pymodaq_plugins_template.scanners.adaptive_scanner import AdaptiveGrid, Scan1DAdaptive
+
+
+def dose_response(x):
+    return 1 / (1 + np.exp(-(x - 0.6) / 0.02))
+
+
+def run(grid: AdaptiveGrid, function) -> AdaptiveGrid:
+    index = 0
+    while index < len(grid):  # as DAQ_Scan, checking the number of steps at each step
+        grid.set_value(index, function(grid.positions[index]))
+        index += 1
+    return grid
+
+
+def max_error(x, y, function):
+    samples = np.linspace(0, 1, 10001)
+    return np.max(np.abs(np.interp(samples, x, y) - function(samples)))
+
+
+def test_refines_where_the_signal_varies():
+    grid = run(AdaptiveGrid(0, 1, n_initial=11, max_points=200, gradient_threshold=0.02, curvature_threshold=0.01),
+               dose_response)
+    assert grid.done
+    assert len(grid) < 200
+    refined = grid.positions[11:]
+    assert np.all(np.abs(refined - 0.6) < 0.2)  # only around the transition
+
+    adaptive_error = max_error(np.sort(grid.positions), grid.values[np.argsort(grid.positions)], dose_response)
+    uniform = np.linspace(0, 1, len(grid))
+    assert max_error(uniform, dose_response(uniform), dose_response) > 2 * adaptive_error
+    uniform = np.linspace(0, 1, 2 * len(grid))  # twice the moves and readings for a similar fidelity
+    assert max_error(uniform, dose_response(uniform), dose_response) > 0.5 * adaptive_error
+
+
+def test_budget_and_flat_signal():
+    grid = run(AdaptiveGrid(0, 1, n_initial=5, max_points=20, gradient_threshold=0.001), dose_response)
+    assert len(grid) == 20
+    grid = run(AdaptiveGrid(0, 1, n_initial=5, max_points=20), lambda x: 1.)
+    assert len(grid) == 5 and grid.done
+
+
+def test_min_step():
+    grid = run(AdaptiveGrid(0, 1, n_initial=11, max_points=1000, gradient_threshold=0.001, min_step=0.02),
+               dose_response)
+    assert np.min(np.diff(np.sort(grid.positions))) >= 0.02
+
+
+def test_invalid_grid():
+    with pytest.raises(ValueError):
+        AdaptiveGrid(0, 1, n_initial=10, max_points=5)
+
+
+def test_scanner_is_registered():
+    from pymodaq.utils.scanner.scan_factory import ScannerFactory
+    assert ScannerFactory.get_builder('Scan1D', 'Adaptive') is Scan1DAdaptive
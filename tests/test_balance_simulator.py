@@ -0,0 +1,65 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import sys
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip('serial')
+pytestmark = pytest.mark.skipif(sys.platform.startswith('win'), reason='the simulator runs on a pseudo-terminal')
+
+from pymodaq_plugins_template.hardware.balance import Balance, BalanceError
+from pymodaq_plugins_template.hardware.frame_decoder import FrameDecoder, unit_code
+
+
+@pytest.fixture
+def simulator():
+    from pymodaq_plugins_template.hardware.simulator import BalanceSimulator
+    with BalanceSimulator(baudrate=115200, latency=0., noise=0., seed=0, rate=100.) as simulator:
+        yield simulator
+
+
+@pytest.fixture
+def balance(simulator):
+    balance = Balance()
+    balance.open_communication(simulator.port, baudrate=115200, timeout=1.)
+    yield balance
+    balance.close_communication()
+
+
+def test_weigh_tare_zero(simulator, balance):
+    simulator.load = 12.345
+    simulator.settling_time = 0.
+    reading = FrameDecoder().decode(balance.weigh())[0]
+    assert reading['value'] == pytest.approx(12.345)
+    assert reading['unit'] == unit_code('g') and reading['stable'] and not reading['net']
+
+    balance.tare()
+    reading = FrameDecoder().decode(balance.weigh())[0]
+    assert reading['value'] == pytest.approx(0.) and reading['net']
+    with pytest.raises(BalanceError):
+        balance.zero()  # out of the zero range
+
+
+def test_errors(simulator, balance):
+    with pytest.raises(BalanceError, match='E0'):
+        balance.request(b'X')
+    simulator.settling_time = 10.
+    simulator.load = 100.
+    with pytest.raises(BalanceError, match='E2'):
+        balance.tare()
+    assert not FrameDecoder().decode(balance.weigh())[0]['stable']
+
+
+def test_continuous_output(simulator, balance):
+    simulator.load = 1.
+    balance.start_continuous()
+    decoder = FrameDecoder()
+    readings = []
+    start = time.perf_counter()
+    while len(readings) < 20 and time.perf_counter() - start < 5:
+        readings.extend(decoder.decode(balance.read_stream()))
+    balance.stop_continuous()
+    assert len(readings) >= 20
+    assert not np.isnan([reading['value'] for reading in readings]).any()
+    assert FrameDecoder().decode(balance.weigh()).size == 1  # back to request/response
@@ -0,0 +1,62 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import threading
+import time
+
+from pymodaq_plugins_template.hardware.coalescer import TargetCoalescer
+
+
+class SlowController:
+    def __init__(self, duration: float = 0.02):
+        self.duration = duration
+        self.targets = []
+        self.release = threading.Event()
+
+    def set_target(self, target):
+        self.release.wait(1.)
+        time.sleep(self.duration)
+        self.targets.append(target)
+
+
+def test_only_the_latest_target_is_sent():
+    controller = SlowController()
+    coalescer = TargetCoalescer(controller.set_target)
+    overwritten = [coalescer.submit(target) for target in range(100)]  # the first one is in flight
+    controller.release.set()
+    assert coalescer.wait(1.)
+    assert controller.targets[-1] == 99
+    assert len(controller.targets) <= 2  # not a backlog of 100 commands
+    assert coalescer.overwritten == sum(overwritten) >= 98
+    assert coalescer.sent == len(controller.targets)
+    assert not coalescer.busy
+    coalescer.close()
+
+
+def test_discard_and_close():
+    controller = SlowController()
+    coalescer = TargetCoalescer(controller.set_target)
+    coalescer.submit(1)
+    time.sleep(0.01)
+    coalescer.submit(2)
+    assert coalescer.discard()
+    controller.release.set()
+    assert coalescer.wait(1.)
+    assert controller.targets == [1]
+    coalescer.close()
+
+    coalescer.submit(3)  # a new thread after close
+    assert coalescer.wait(1.)
+    assert controller.targets == [1, 3]
+    coalescer.close()
+
+
+def test_errors_are_reported():
+    errors = []
+
+    def fail(target):
+        raise IOError('no answer')
+
+    coalescer = TargetCoalescer(fail, errors.append)
+    coalescer.submit(1)
+    assert coalescer.wait(1.)
+    assert len(errors) == 1 and coalescer.sent == 0
+    coalescer.close()
@@ -0,0 +1,68 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import os
+
+import pytest
+import toml
+from pymodaq_utils import config as config_mod
+
+from pymodaq_plugins_template.utils import Config
+
+
+class LazyConfig(Config):
+    config_name = 'config_lazy_test'
+    check_interval = 0.
+
+
+@pytest.fixture
+def lazy_config(tmp_path, monkeypatch):
+    def get_set_config_dir(config_name='config', user=False):
+        folder = tmp_path.joinpath('user' if user else 'system', config_name)
+        folder.mkdir(parents=True, exist_ok=True)
+        return folder
+
+    monkeypatch.setattr(config_mod, 'get_set_config_dir', get_set_config_dir)
+    monkeypatch.setattr(LazyConfig, '_allow_direct_call', True)
+    yield LazyConfig()
+    config_mod.Singleton.unregister(LazyConfig)
+
+
+def test_loaded_at_first_access(lazy_config, monkeypatch):
+    assert LazyConfig() is lazy_config
+    assert not lazy_config.loaded
+    lazy_config.save()  # never loaded, nothing written
+    assert not lazy_config.config_path.is_file()
+    loads = []
+    load = Config.load
+    monkeypatch.setattr(LazyConfig, 'load', lambda self: (loads.append(1), load(self)))
+
+    assert 'title' in lazy_config  # from the template
+    lazy_config('title')
+    lazy_config.get('unknown')
+    assert lazy_config.loaded and len(loads) == 1
+
+
+def test_reloaded_when_modified(lazy_config):
+    lazy_config['test_value'] = 1
+    lazy_config.save()
+    assert lazy_config['test_value'] == 1
+
+    path = lazy_config.config_path
+    path.write_text(toml.dumps(dict(test_value=2)))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))  # whatever the file system resolution
+    assert lazy_config['test_value'] == 2
+
+
+def test_unsaved_values_kept_on_reload(lazy_config):
+    lazy_config['test_value'] = 1
+    lazy_config.save()
+    lazy_config['unsaved_value'] = 3
+
+    path = lazy_config.config_path
+    path.write_text(toml.dumps(dict(test_value=2)))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert lazy_config['test_value'] == 2  # reloaded
+    assert lazy_config['unsaved_value'] == 3
+    lazy_config.save()
+    assert toml.load(path) == dict(test_value=2, unsaved_value=3)
@@ -0,0 +1,162 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from pymodaq_plugins_template.hardware.connection_pool import ControllerPool
+
+
+class FakeBus:
+    def __init__(self):
+        self.opened = True
+        self.in_use = False
+        self.overlaps = 0
+        self.requests = []
+
+    def query(self, address, command, duration=0.001):
+        if self.in_use:
+            self.overlaps += 1
+        self.in_use = True
+        time.sleep(duration)
+        self.requests.append((address, command))
+        self.in_use = False
+        return f'{address}:{command}'
+
+
+def test_requests_are_serialized():
+    pool = ControllerPool(linger=0)
+    links = [pool.acquire('COM1', FakeBus) for _ in range(4)]
+    assert all(link.link is links[0].link for link in links)  # one shared link, a handle per plugin
+
+    def worker(address):
+        for ind in range(10):
+            assert links[address].query(address, ind) == f'{address}:{ind}'
+
+    threads = [threading.Thread(target=worker, args=(address,)) for address in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    bus = links[0].controller
+    assert len(bus.requests) == 40
+    assert bus.overlaps == 0
+
+
+def test_pipelined_requests_keep_order():
+    pool = ControllerPool(linger=0)
+    link = pool.acquire('COM1', FakeBus)
+    futures = [link.submit(lambda bus, ind=ind: bus.query(0, ind)) for ind in range(5)]
+    assert [future.result() for future in futures] == [f'0:{ind}' for ind in range(5)]
+
+
+def test_request_timeout():
+    pool = ControllerPool(linger=0)
+    link = pool.acquire('COM1', FakeBus)
+    with pytest.raises(TimeoutError):
+        link.request(lambda bus: bus.query(0, 'slow', duration=0.2), timeout=0.01)
+
+
+def test_reinit_reuses_open_link():
+    opened = []
+    closed = []
+
+    def open_bus():
+        opened.append(FakeBus())
+        return opened[-1]
+
+    pool = ControllerPool(linger=0.2)
+    link = pool.acquire('COM1', open_bus, closed.append)
+    pool.release(link)
+    assert pool.acquire('COM1', open_bus, closed.append).link is link.link  # re-init within the linger time
+    assert len(opened) == 1
+    pool.release(link)
+    time.sleep(0.4)
+    assert 'COM1' not in pool
+    assert closed == opened
+
+
+class AddressedBus(FakeBus):
+    def __init__(self):
+        super().__init__()
+        self.selected = None
+        self.selections = 0
+
+    def select(self, address):
+        self.selections += 1
+        self.selected = address
+
+    def read(self, command):
+        return self.query(self.selected, command)
+
+
+def test_links_keyed_by_port_and_wrapper():
+    pool = ControllerPool(linger=0)
+    link = pool.acquire('COM1', FakeBus, wrapper=FakeBus).link
+    assert pool.acquire('COM1', AddressedBus, wrapper=AddressedBus).link is not link
+    assert pool.acquire('COM1', FakeBus, wrapper=FakeBus).link is link
+    assert 'COM1' in pool
+
+
+def test_empty_port_not_shared():
+    closed = []
+    pool = ControllerPool(linger=10.)
+    link = pool.acquire('', FakeBus, closed.append)
+    assert pool.acquire('', FakeBus).link is not link.link
+    assert '' not in pool
+    pool.release(link)
+    assert closed == [link.controller]  # closed right away, whatever the linger time
+
+
+def test_address_sent_with_each_request():
+    pool = ControllerPool(linger=0)
+    balances = [pool.acquire('COM1', AddressedBus, address=address, select_address=AddressedBus.select)
+                for address in range(3)]
+    bus = balances[0].controller
+    for ind in range(2):
+        assert [balance.read(ind) for balance in balances] == [f'{address}:{ind}' for address in range(3)]
+    assert balances[1].request(lambda bus: bus.read('one'), timeout=1.) == '1:one'
+    assert balances[1].submit(lambda bus: bus.read('two')).result() == '1:two'
+    assert bus.selections == 7  # only when another address was selected
+    for balance in balances:
+        pool.release(balance)
+    assert 'COM1' not in pool
+
+
+def test_slow_opening_does_not_block_the_pool():
+    opening = threading.Event()
+    release = threading.Event()
+    opened = []
+
+    def slow_open():
+        opening.set()
+        release.wait(1.)
+        opened.append(FakeBus())
+        return opened[-1]
+
+    pool = ControllerPool(linger=0)
+    links = []
+    threads = [threading.Thread(target=lambda: links.append(pool.acquire('COM1', slow_open))) for _ in range(2)]
+    threads[0].start()
+    assert opening.wait(1.)
+    threads[1].start()
+    start = time.perf_counter()
+    other = pool.acquire('COM2', FakeBus)  # not waiting for COM1
+    assert time.perf_counter() - start < 0.5
+    pool.release(other)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(opened) == 1 and links[0].link is links[1].link and links[0].link.users == 2
+
+
+def test_timeout_per_plugin():
+    pool = ControllerPool(linger=0)
+    patient = pool.acquire('COM1', FakeBus, timeout=1.)
+    hasty = pool.acquire('COM1', FakeBus, timeout=1.)
+    hasty.timeout = 0.01  # as commit_settings on the 'request_timeout' setting of one plugin
+    with pytest.raises(TimeoutError):
+        hasty.query(1, 'slow', duration=0.2)
+    assert patient.query(0, 'slow', duration=0.2) == '0:slow'  # waits for the slow request then its own one
+    assert patient.timeout == 1. and patient.link.timeout == 1.
@@ -0,0 +1,66 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import numpy as np
+import pytest
+
+from pymodaq_plugins_template.hardware.decimation import decimate, decimate_axis, DisplayDecimator, lttb
+
+
+def test_decimate_keeps_small_data():
+    data = np.arange(10.)
+    assert decimate(data, 100) is data
+
+
+def test_decimate_methods():
+    data = np.arange(10.)
+    assert np.all(decimate(data, 4, 'min/max') == [0., 4., 5., 9.])
+    assert np.all(decimate(data, 3, 'mean') == [1.5, 5.5, 8.5])  # last bucket is shorter
+    assert np.all(decimate(data, 2, 'max') == [4., 9.])
+    assert np.all(decimate_axis(data, 4, 'min/max') == [2., 2., 7., 7.])
+    with pytest.raises(ValueError):
+        decimate(data, 2, 'median')
+
+
+def test_decimate_envelope_keeps_glitches():
+    data = np.zeros(100000)
+    data[12345] = 1.
+    data[54321] = -1.
+    reduced = decimate(data, 1000, 'min/max')
+    assert reduced.shape == (1000,)
+    assert reduced.max() == 1. and reduced.min() == -1.
+
+
+def test_decimate_image():
+    image = np.arange(24.).reshape(4, 6)
+    assert decimate(decimate(image, 2, 'mean', axis=0), 3, 'mean', axis=1).shape == (2, 3)
+    assert decimate(decimate(image, 2, 'min/max', axis=0), 4, 'min/max', axis=1).shape == (2, 4)
+
+
+def test_display_decimator():
+    decimator = DisplayDecimator(refresh_rate=10.)
+    assert decimator.ready(now=0.)
+    assert not decimator.ready(now=0.05)
+    assert decimator.ready(now=0.1)
+    decimator.force_refresh()
+    assert decimator.ready(now=0.12)
+    assert not decimator.ready(now=0.15)
+
+    decimator.accumulate(np.array([[1., 10.], [3., 30.]]))
+    decimator.accumulate([2., 20.])
+    assert decimator.labels(['a', 'b']) == ['a_min', 'a_max', 'b_min', 'b_max']
+    assert [array[0] for array in decimator.reduce()] == [1., 3., 10., 30.]
+    assert decimator.reduce() == []
+
+    decimator.method = 'mean'
+    decimator.accumulate([[1., 10.], [3., 30.]])
+    assert [array[0] for array in decimator.reduce()] == [2., 20.]
+
+
+def test_lttb_keeps_the_peaks():
+    x = np.arange(1000.)
+    y = np.zeros_like(x)
+    y[[100, 500]] = [5., -3.]
+    indices = lttb(x, y, 50)
+    assert len(indices) == 50 and indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+    assert 100 in indices and 500 in indices
+    assert np.all(lttb(x[:10], y[:10], 50) == np.arange(10))
@@ -0,0 +1,88 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import json
+import time
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_template.hardware.diagnostics import Diagnostics, LatencyHistogram
+
+
+class Instrument:
+    def grab_data(self, duration: float = 0.):
+        if duration:
+            time.sleep(duration)
+        return duration
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram(overrun_threshold=0.05)
+    durations = np.concatenate([np.full(900, 1e-3), np.full(90, 1e-2), np.full(10, 0.1)])
+    for duration in durations:
+        histogram.record(duration)
+    summary = histogram.summary()
+    assert summary['count'] == 1000 and summary['overruns'] == 10
+    step = 10 ** (1 / LatencyHistogram.bins_per_decade)  # relative resolution of the bins
+    assert 1. <= summary['p50_ms'] <= 1. * step
+    assert 10. <= summary['p95_ms'] <= 10. * step
+    assert summary['p99_ms'] == pytest.approx(10., rel=step - 1)
+    assert summary['max_ms'] == pytest.approx(100.)
+    assert summary['mean_ms'] == pytest.approx(durations.mean() * 1000)
+    histogram.record(1e-9)
+    histogram.record(1e4)
+    assert histogram.counts[0] == 1 and histogram.counts[-1] == 1
+
+
+def test_diagnostics_only_wraps_while_enabled(tmp_path):
+    instrument = Instrument()
+    diagnostics = Diagnostics(instrument, ['grab_data'])
+    instrument.grab_data()
+    assert diagnostics.histograms['grab_data'].count == 0
+    assert 'grab_data' not in instrument.__dict__
+
+    diagnostics.enabled = True
+    diagnostics.overrun_threshold = 0.005
+    assert instrument.grab_data(0.01) == 0.01
+    instrument.grab_data()
+    assert diagnostics.summary()['grab_data']['count'] == 2
+    assert diagnostics.summary()['grab_data']['overruns'] == 1
+
+    content = json.loads(diagnostics.dump(tmp_path.joinpath('diagnostics.json')).read_text())
+    assert content['methods']['grab_data']['count'] == 2
+    assert len(content['bin_edges_s']) == len(content['methods']['grab_data']['counts']) - 1
+
+    diagnostics.enabled = False
+    assert 'grab_data' not in instrument.__dict__
+    instrument.grab_data()
+    assert diagnostics.histograms['grab_data'].count == 2
+
+
+def test_counters(tmp_path):
+    from pymodaq_gui.parameter import Parameter
+    from pymodaq_plugins_template.hardware.diagnostics import diagnostics_params
+
+    settings = Parameter.create(name='settings', type='group',
+                                children=diagnostics_params(['grab_data'], ['overwritten_targets']))
+    diagnostics = Diagnostics(Instrument(), ['grab_data'], settings, report_interval=0.,
+                              counters=['overwritten_targets'])
+    diagnostics.count('overwritten_targets')
+    diagnostics.count('overwritten_targets', 2)
+    assert settings['diagnostics', 'counters', 'overwritten_targets'] == 3
+    content = json.loads(diagnostics.dump(tmp_path.joinpath('diagnostics.json')).read_text())
+    assert content['counters'] == {'overwritten_targets': 3}
+    diagnostics.reset()
+    assert settings['diagnostics', 'counters', 'overwritten_targets'] == 0
+
+
+def test_settings_applied_when_built():
+    from pymodaq_gui.parameter import Parameter
+    from pymodaq_plugins_template.hardware.diagnostics import diagnostics_params
+
+    settings = Parameter.create(name='settings', type='group', children=diagnostics_params(['grab_data']))
+    settings.child('diagnostics', 'diagnostics_enabled').setValue(True)
+    settings.child('diagnostics', 'overrun_threshold').setValue(5.)
+    instrument = Instrument()
+    diagnostics = Diagnostics(instrument, ['grab_data'], settings)
+    assert diagnostics.enabled and diagnostics.overrun_threshold == 0.005
+    instrument.grab_data(0.01)
+    assert diagnostics.summary()['grab_data']['overruns'] == 1
@@ -0,0 +1,50 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import numpy as np
+
+from pymodaq_plugins_template.hardware.frame_decoder import (FrameDecoder, parse_frame, unit_code, UNKNOWN_UNIT,
+                                                             FRAME_DTYPE)
+
+FRAMES = [b'ST,GS,   12.345 g\r\n', b'US,NT,  -0.002 kg\r\n', b'EC,E1\r\n', b'OL,GS,  999.999 g\r\n',
+          b'ST,GS,+0001234 pcs\r\n', b'ST,NT,    0.10 ozt\r\n']
+MALFORMED = [b'ST,GS,  1.2.3 g', b'ST,GS, 12 34 g', b'ST,GS,  1.5e3 g', b'ST,GS,12.3g', b'ST,GS,   12.3 G',
+             b'ST,GS,  -1-2 g', b'ST,GS,  12.3 g x', b'ST,GS,  12.3 xyz', b'ST,GS,   nan g', b'ST,GS,      g']
+
+
+def test_decode_matches_parse_frame():
+    decoded = FrameDecoder().decode(b''.join(FRAMES))
+    assert decoded.dtype == FRAME_DTYPE
+    assert len(decoded) == len(FRAMES)
+    for frame, reference in zip(decoded, [parse_frame(line) for line in FRAMES]):
+        assert np.isnan(frame['value']) and np.isnan(reference[0]) or frame['value'] == reference[0]
+        assert bool(frame['stable']) == reference[2]
+        assert bool(frame['net']) == reference[3]
+    assert decoded['unit'][0] == unit_code('g')
+    assert decoded['unit'][2] == UNKNOWN_UNIT
+
+
+def test_malformed_frames_match_parse_frame():
+    for lines in ([b'ST,GS,   12.345 g'] + MALFORMED, [b'ST,GS,  1.5e3 g'] * 3):  # general and uniform layouts
+        decoded = FrameDecoder.decode_lines(b'\r\n'.join(lines))
+        for line, frame in zip(lines, decoded):
+            reference = parse_frame(line)
+            assert np.isnan(frame['value']) and np.isnan(reference[0]) or frame['value'] == reference[0], line
+            assert (frame['unit'], bool(frame['stable']), bool(frame['net'])) == reference[1:], line
+    for line in MALFORMED:
+        value, unit, stable, net = parse_frame(line)
+        assert np.isnan(value) and unit == UNKNOWN_UNIT and not stable and not net, line
+
+
+def test_partial_frames():
+    decoder = FrameDecoder()
+    assert len(decoder.decode(b'ST,GS,   1')) == 0
+    decoded = decoder.decode(b'2.5 g\r\nST,G')
+    assert decoded['value'] == 12.5
+    decoded = decoder.decode(b'S,    3.0 g\r\n\r\n')
+    assert decoded['value'] == 3.
+
+
+def test_reset():
+    decoder = FrameDecoder()
+    decoder.decode(b'garbage')
+    decoder.reset()
+    assert decoder.decode(b'ST,GS,    1.0 g\n')['value'] == 1.
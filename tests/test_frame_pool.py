@@ -0,0 +1,62 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import gc
+
+import numpy as np
+import pytest
+from pymodaq.utils.data import DataFromPlugins
+
+from pymodaq_plugins_template.hardware.frame_pool import FramePool
+
+
+def test_frames_are_recycled_once_released():
+    pool = FramePool((8, 4), dtype=np.uint16, size=2)
+    first = pool.acquire()
+    assert first.shape == (8, 4) and first.dtype == np.uint16
+    second = pool.acquire()
+    assert pool.in_use == 2
+    row = first[2]  # a derived view keeps the frame in use
+    del first
+    assert pool.in_use == 2
+    del row
+    assert pool.in_use == 1
+    third = pool.acquire()
+    assert len(pool) == 2 and pool.allocated == 2 and pool.hits == 3
+    assert not np.shares_memory(third, second)
+
+
+def test_derived_arrays_keep_the_frame_in_use():
+    pool = FramePool((8, 4), size=1)
+    frame = pool.acquire()
+    assert type(frame) is np.ndarray
+    derived = frame[1:, ::2].T[1][::2]  # a chain of views, their base collapsed by numpy
+    del frame
+    assert pool.in_use == 1
+    del derived
+    assert pool.in_use == 0
+
+
+def test_frames_emitted_in_data_objects():
+    pool = FramePool((8, 4), size=2)
+    frame = pool.acquire()
+    frame[:] = 1.
+    data = DataFromPlugins(name='image', data=[frame], dim='Data2D')
+    assert np.shares_memory(data.data[0], frame)  # emitted without copy
+    del frame
+    held = pool.acquire()
+    assert pool.in_use == 2
+    del data
+    gc.collect()  # pymodaq data objects hold reference cycles
+    assert not np.shares_memory(pool.acquire(), held)
+    assert pool.allocated == 2
+
+
+def test_pool_growth():
+    pool = FramePool((2, 2), size=1, max_size=2)
+    frames = [pool.acquire() for _ in range(4)]  # all held by the consumers
+    assert len(pool) == 2
+    assert pool.allocated == 4 and pool.hits == 1
+    del frames
+    gc.collect()
+    assert pool.in_use == 0
+    with pytest.raises(ValueError):
+        FramePool((2, 2), size=4, max_size=2)
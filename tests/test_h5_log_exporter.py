@@ -0,0 +1,55 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import h5py
+import numpy as np
+
+from pymodaq_plugins_template.exporters.h5_log_exporter import H5LogWriter, H5LogExporter
+from pymodaq_plugins_template.hardware.frame_decoder import FRAME_DTYPE, unit_code
+
+
+def test_append_and_extend(tmp_path):
+    path = tmp_path.joinpath('log.h5')
+    with H5LogWriter(path, chunk_size=16, max_pending=2) as writer:
+        for ind in range(10):
+            writer.append(float(ind), timestamp=float(ind), stable=ind % 2 == 0, unit='mg')
+        writer.extend(np.arange(10., 50.), np.arange(10., 50.), stable=False, unit='kg')
+        assert len(writer) == 50
+    assert writer.written == 50
+    with h5py.File(path, 'r') as file:
+        assert np.all(file['log/value'][:] == np.arange(50.))
+        assert np.all(file['log/timestamp'][:] == np.arange(50.))
+        assert np.all(file['log/stable'][:10] == (np.arange(10) % 2 == 0))
+        assert not np.any(file['log/stable'][10:])
+        assert np.all(file['log/unit'][:10] == unit_code('mg'))
+        assert np.all(file['log/unit'][10:] == unit_code('kg'))
+        assert file['log/value'].chunks == (16,)
+        assert file['log/value'].compression == 'gzip'
+
+
+def test_frames_and_reopening(tmp_path):
+    path = tmp_path.joinpath('log.h5')
+    frames = np.zeros((100,), dtype=FRAME_DTYPE)
+    frames['value'] = np.linspace(0, 1, 100)
+    frames['stable'] = True
+    frames['unit'] = unit_code('g')
+    for _ in range(2):  # the second writer appends to the datasets of the first one
+        with H5LogWriter(path, chunk_size=32) as writer:
+            writer.extend(frames, np.arange(100.))
+    with h5py.File(path, 'r') as file:
+        assert file['log/value'].shape == (200,)
+        assert np.all(file['log/value'][100:] == frames['value'])
+        assert np.all(file['log/stable'][:])
+
+
+def test_periodic_flush(tmp_path):
+    writer = H5LogWriter(tmp_path.joinpath('log.h5'), chunk_size=1000, flush_interval=0.)
+    try:
+        writer.append(1.)
+        assert writer.wait(timeout=5.)
+        assert writer.written == 1  # written although the block is far from full
+    finally:
+        writer.close()
+
+
+def test_exporter_is_registered():
+    from pymodaq_data.h5modules.exporter import ExporterFactory
+    assert ExporterFactory.exporters_registry['h5'][H5LogExporter.FORMAT_DESCRIPTION] is H5LogExporter
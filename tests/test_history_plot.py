@@ -0,0 +1,50 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import numpy as np
+import pytest
+
+from pymodaq_plugins_template.app.history_plot import HistoryStore, HistoryPlot
+
+
+@pytest.fixture
+def store():
+    store = HistoryStore(capacity=16, factor=4)
+    x = np.arange(100_000.)
+    y = np.sin(x / 1000)
+    y[54_321] = 10.
+    for start in range(0, len(x), 7_000):  # growing arrays and levels updated chunk by chunk
+        store.extend(x[start:start + 7_000], y[start:start + 7_000])
+    return store
+
+
+def test_levels(store):
+    assert len(store) == 100_000
+    assert store.n_levels > 5
+    level = store._levels[0]
+    assert level.size == 25_000
+    assert np.all(level.y_max[:level.size] == np.max(store.y.reshape((-1, 4)), axis=1))
+
+
+@pytest.mark.parametrize('method', ['lttb', 'min/max'])
+def test_view_is_bounded(store, method):
+    x, y = store.view(n_points=500, method=method)
+    assert len(x) <= 500
+    assert np.all(np.diff(x) >= 0)
+    assert x[0] >= 0. and x[-1] <= 99_999.  # bucket centers with min/max, the ends with lttb
+    assert y.max() == 10.  # the glitch survives the downsampling
+
+    x, y = store.view(1000., 1100., n_points=500, method=method)
+    assert np.all(x == np.arange(999., 1102.))  # a zoom shows the raw points, and the ones around the range
+    with pytest.raises(ValueError):
+        store.view(method='median')
+
+
+def test_plot_follows_the_view(qtbot):
+    plot = HistoryPlot()
+    qtbot.addWidget(plot.widget)
+    plot.extend('balance', np.arange(100_000.), np.arange(100_000.))
+    plot.refresh()
+    n_drawn = len(plot._curves['balance'].xData)
+    assert n_drawn < 5_000
+    plot.view_box.setXRange(10., 20., padding=0)
+    plot.refresh()
+    assert np.all(plot._curves['balance'].xData == np.arange(9., 22.))
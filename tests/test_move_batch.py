@@ -0,0 +1,120 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import threading
+import time
+
+import pytest
+
+from pymodaq_plugins_template.hardware.move_batch import MoveBatcher
+from pymodaq_plugins_template.hardware.move_completion import AdaptivePolling
+
+
+class MultiAxisController:
+    """Axes moving at constant velocity, counting the commands and the queries"""
+
+    def __init__(self, velocity: float = 20.):
+        self.velocity = velocity
+        self.moves = {}  # axis: (start, target, start time)
+        self.commands = []
+        self.queries = 0
+
+    def position(self, axis: str) -> float:
+        start, target, start_time = self.moves.get(axis, (0., 0., 0.))
+        travel = (time.perf_counter() - start_time) * self.velocity
+        return target if travel >= abs(target - start) else start + travel * (1 if target > start else -1)
+
+    def set_targets(self, targets: dict):
+        self.commands.append(dict(targets))
+        now = time.perf_counter()
+        for axis, target in targets.items():
+            self.moves[axis] = (self.position(axis), target, now)
+
+    def get_positions(self, axes: list) -> dict:
+        self.queries += 1
+        return {axis: self.position(axis) for axis in axes}
+
+
+class Axis:
+    def __init__(self):
+        self.positions = []
+        self.done = threading.Event()
+
+    def push(self, position: float, moving: bool):
+        self.positions.append(position)
+        if not moving:
+            self.done.set()
+
+
+@pytest.fixture
+def controller():
+    return MultiAxisController()
+
+
+def test_single_command_and_combined_wait(controller):
+    batcher = MoveBatcher.shared(controller, controller.set_targets, controller.get_positions, window=1.,
+                                 polling=AdaptivePolling(min_interval=0.002))
+    assert MoveBatcher.shared(controller, None, None) is batcher  # shared by the plugins of the controller
+    axes = {name: Axis() for name in ('X', 'Y', 'Z')}
+    for name, axis in axes.items():
+        batcher.join(name, axis.push)
+
+    start = time.perf_counter()
+    for target, name in enumerate(axes):
+        batcher.submit(name, target + 1., tolerance=0.01)
+    assert all(axis.done.wait(2.) for axis in axes.values())
+    assert time.perf_counter() - start < 0.5  # sent as soon as all the axes have a target, not after the window
+    assert controller.commands == [{'X': 1., 'Y': 2., 'Z': 3.}]
+    assert all(abs(axis.positions[-1] - target) <= 0.01 for target, axis in zip((1., 2., 3.), axes.values()))
+    assert batcher.queries == controller.queries < 30  # one query for all the axes at each poll
+
+    for name in axes:
+        batcher.leave(name)
+    assert MoveBatcher.shared(controller, None, None) is not batcher
+
+
+def test_window(controller):
+    batcher = MoveBatcher(controller.set_targets, controller.get_positions, window=0.02)
+    x, y = Axis(), Axis()
+    batcher.join('X', x.push)
+    batcher.join('Y', y.push)
+    start = time.perf_counter()
+    batcher.submit('X', 0.1, tolerance=0.01)  # Y is not moved
+    assert x.done.wait(2.)
+    assert time.perf_counter() - start >= 0.02
+    assert controller.commands == [{'X': 0.1}]
+    assert len(y.positions) == 0
+    with pytest.raises(KeyError):
+        batcher.submit('Z', 1.)
+    batcher.leave('X')
+    batcher.leave('Y')
+
+
+def test_stalled_axis_not_polled_after_timeout(controller):
+    controller.velocity = 0.  # never reaches its target
+    batcher = MoveBatcher(controller.set_targets, controller.get_positions, window=0.,
+                          polling=AdaptivePolling(min_interval=0.002, max_interval=0.005))
+    x = Axis()
+    batcher.join('X', x.push)
+    batcher.submit('X', 1., tolerance=0.01, timeout=0.05)
+    time.sleep(0.1)
+    queries = controller.queries
+    assert queries > 0 and not x.done.is_set()
+    time.sleep(0.05)
+    assert controller.queries == queries
+    batcher.leave('X')
+
+
+def test_axis_leaving_while_moving_not_polled(controller):
+    controller.velocity = 0.
+    batcher = MoveBatcher(controller.set_targets, controller.get_positions, window=0.,
+                          polling=AdaptivePolling(min_interval=0.002, max_interval=0.005))
+    x, y = Axis(), Axis()
+    batcher.join('X', x.push)
+    batcher.join('Y', y.push)
+    batcher.submit('X', 1., tolerance=0.01)
+    time.sleep(0.02)
+    batcher.leave('X')
+    time.sleep(0.02)  # at most one poll in progress when leaving
+    queries = controller.queries
+    time.sleep(0.05)
+    assert controller.queries == queries
+    batcher.leave('Y')
@@ -0,0 +1,21 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import pytest
+
+from pymodaq_plugins_template.hardware.move_completion import AdaptivePolling
+
+
+def test_backoff_while_not_approaching():
+    polling = AdaptivePolling(min_interval=0.005, max_interval=0.1, backoff=2.)
+    assert polling.start() == 0.005
+    intervals = [polling.next_interval(1., now=ind) for ind in range(6)]  # not getting closer
+    assert intervals == pytest.approx([0.01, 0.02, 0.04, 0.08, 0.1, 0.1])
+
+
+def test_poll_when_the_target_is_expected():
+    polling = AdaptivePolling(min_interval=0.005, max_interval=1., backoff=2.)
+    polling.start()
+    polling.next_interval(1., now=0.)
+    # 0.1 unit per 10 ms: the remaining 0.9 unit (within the 0.1 tolerance) in 80 ms
+    assert polling.next_interval(0.9, tolerance=0.1, now=0.01) == pytest.approx(0.08)
+    assert polling.next_interval(0.05, tolerance=0.1, now=0.09) == 0.005  # within the tolerance
+    assert polling.polls == 3
@@ -0,0 +1,41 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import importlib
+import json
+
+from pymodaq_plugins_template import plugin_manifest
+
+
+def get_param_names(params):
+    names = []
+    for param in params:
+        names.append(param['name'])
+        names.extend(get_param_names(param.get('children', [])))
+    return names
+
+
+def test_manifest_matches_plugin_classes():
+    manifest = plugin_manifest.build_manifest(plugin_manifest.Path(plugin_manifest.__file__).parent)
+    assert manifest['package'] == 'pymodaq_plugins_template'
+    for entry in manifest['plugins']:
+        klass = getattr(importlib.import_module(entry['module']), entry['class_name'])
+        if entry['type'] == 'daq_move':
+            assert entry['axis_names'] == klass._axis_names
+            assert entry['controller_units'] == klass._controller_units
+            assert entry['is_multiaxes'] == klass.is_multiaxes
+        else:
+            assert entry['hardware_averaging'] == klass.hardware_averaging
+        assert set(entry['params']) <= set(get_param_names(klass.params))
+
+
+def test_load_manifest_from_file(tmp_path):
+    resources = tmp_path.joinpath('pymodaq_plugins_foo', 'resources')
+    resources.mkdir(parents=True)
+    resources.joinpath('plugin_manifest.json').write_text(json.dumps(
+        dict(version=plugin_manifest.MANIFEST_VERSION, package='pymodaq_plugins_foo',
+             plugins=[dict(name='Bar', type='daq_move')])))
+    assert plugin_manifest.get_plugins('daq_move', resources.parent)[0]['name'] == 'Bar'
+    assert plugin_manifest.get_plugins('daq_0Dviewer', resources.parent) == []
+
+
+def test_build_manifest_without_file(tmp_path):
+    assert plugin_manifest.load_manifest(tmp_path)['plugins'] == []
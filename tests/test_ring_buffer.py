@@ -0,0 +1,82 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import threading
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_template.hardware.ring_buffer import RingBuffer
+from pymodaq_plugins_template.hardware.stream_reader import StreamReader
+
+
+def test_extend_and_drain():
+    buffer = RingBuffer(10)
+    buffer.extend(np.arange(4.))
+    buffer.append(4.)
+    assert len(buffer) == 5
+    data, timestamps = buffer.drain()
+    assert np.all(data == np.arange(5.))
+    assert timestamps.shape == (5,)
+    assert len(buffer) == 0
+
+
+def test_drain_at_most():
+    buffer = RingBuffer(8)
+    buffer.extend(np.arange(6.))
+    assert np.all(buffer.drain(4)[0] == np.arange(4.))
+    assert np.all(buffer.drain(4)[0] == np.arange(4., 6.))
+    assert len(buffer) == 0
+
+
+def test_wrap_around_and_overruns():
+    buffer = RingBuffer(8)
+    buffer.extend(np.arange(6.))
+    buffer.drain()
+    buffer.extend(np.arange(6., 16.))  # 10 new samples in a 8 samples buffer
+    assert buffer.overruns == 2
+    data, _ = buffer.drain()
+    assert np.all(data == np.arange(8., 16.))
+
+
+def test_latest_does_not_consume():
+    buffer = RingBuffer(5)
+    buffer.extend(np.arange(7.))
+    data, _ = buffer.latest(3)
+    assert np.all(data == np.array([4., 5., 6.]))
+    assert len(buffer) == 5
+
+
+def test_sample_shape():
+    buffer = RingBuffer(4, sample_shape=(2, 3))
+    buffer.extend(np.ones((3, 2, 3)))
+    data, _ = buffer.drain()
+    assert data.shape == (3, 2, 3)
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_wait_timeout():
+    buffer = RingBuffer(4)
+    assert not buffer.wait(1, timeout=0.01)
+    buffer.append(1.)
+    assert buffer.wait(1, timeout=0.01)
+
+
+def test_stream_reader():
+    buffer = RingBuffer(1000)
+    event = threading.Event()
+
+    def read():
+        event.wait(0.01)
+        return np.ones((10,))
+
+    reader = StreamReader(read, buffer)
+    reader.start()
+    assert buffer.wait(50, timeout=5.)
+    reader.stop()
+    assert not reader.is_alive()
+    data, timestamps = buffer.drain()
+    assert np.all(data == 1.)
+    assert np.all(np.diff(timestamps) > 0)  # interpolated over each chunk
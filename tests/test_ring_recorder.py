@@ -0,0 +1,53 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import numpy as np
+import pytest
+
+from pymodaq_plugins_template.exporters.ring_recorder import RingRecorder, FLAG_STABLE, FLAG_NET, UNIT_SHIFT
+from pymodaq_plugins_template.hardware.frame_decoder import FRAME_DTYPE, unit_code
+
+
+def test_wrap_around(tmp_path):
+    with RingRecorder(tmp_path.joinpath('test.ring'), capacity=10) as recorder:
+        recorder.extend(np.arange(6.), np.arange(6.))
+        recorder.extend(np.arange(6., 13.), np.arange(6., 13.))
+        recorder.append(13., timestamp=13.)
+        assert recorder.cursor == 14
+        assert len(recorder) == 10
+        older, newer = recorder.segments()
+        assert np.all(older['value'] == np.arange(4., 10.))
+        assert np.all(newer['value'] == np.arange(10., 14.))
+        assert np.shares_memory(older, recorder.records)  # zero-copy views
+        assert np.all(recorder.read(3)['value'] == np.array([11., 12., 13.]))
+
+
+def test_recovery_after_crash(tmp_path):
+    path = tmp_path.joinpath('test.ring')
+    frames = np.zeros((5,), dtype=FRAME_DTYPE)
+    frames['value'] = np.arange(5.)
+    frames['stable'] = [True, False, True, False, True]
+    frames['net'] = True
+    frames['unit'] = unit_code('mg')
+    recorder = RingRecorder(path, capacity=100)
+    recorder.extend(frames, np.arange(5.))
+    del recorder  # no close, as if the process was killed
+
+    recovered = RingRecorder(path, readonly=True)
+    records = np.concatenate(list(recovered.replay(since=2., chunk_size=2)))
+    assert np.all(records['value'] == np.array([2., 3., 4.]))
+    assert np.all(records['flags'] & FLAG_STABLE == np.array([1, 0, 1]))
+    assert np.all(records['flags'] & FLAG_NET)
+    assert np.all(records['flags'] >> UNIT_SHIFT & 0xff == unit_code('mg'))
+    del records
+    recovered.close()
+
+    with RingRecorder(path, capacity=10) as recorder:  # goes on after the recovered readings
+        assert recorder.capacity == 100
+        recorder.append(5.)
+        assert np.all(recorder.read()['value'] == np.arange(6.))
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path.joinpath('test.ring')
+    path.write_bytes(b'not a ring file')
+    with pytest.raises(ValueError):
+        RingRecorder(path, readonly=True)
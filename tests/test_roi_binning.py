@@ -0,0 +1,48 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import numpy as np
+import pytest
+
+from pymodaq_plugins_template.hardware.roi_binning import RoiBinning
+
+
+@pytest.fixture
+def image():
+    return np.arange(8 * 12, dtype=np.uint16).reshape((8, 12))
+
+
+def test_crop_is_a_view(image):
+    roi = RoiBinning(np.arange(12.), np.arange(8.), roi=(2, 1, 5, 3))
+    cropped = roi.reduce(image)
+    assert np.shares_memory(cropped, image)
+    np.testing.assert_array_equal(cropped, image[1:4, 2:7])
+    np.testing.assert_array_equal(roi.x, np.arange(2., 7.))
+    np.testing.assert_array_equal(roi.y, np.arange(1., 4.))
+    assert roi.shape == (3, 5) and not roi.identity
+
+
+def test_binning_sums_blocks(image):
+    roi = RoiBinning(np.arange(12.), np.arange(8.), roi=(0, 0, 0, 0), binning=(3, 2))
+    binned = roi.reduce(image)
+    assert binned.dtype == np.int64 and binned.shape == (4, 4) == roi.shape
+    np.testing.assert_array_equal(binned, image.astype(np.int64).reshape((4, 2, 4, 3)).sum(axis=(1, 3)))
+    np.testing.assert_allclose(roi.x, [1., 4., 7., 10.])
+    np.testing.assert_allclose(roi.y, [.5, 2.5, 4.5, 6.5])
+
+
+def test_binning_in_quadrature(image):
+    roi = RoiBinning(np.arange(12.), np.arange(8.), binning=(2, 2))
+    std = np.full(image.shape, 3.)
+    np.testing.assert_allclose(roi.reduce(std, quadrature=True), np.full((4, 6), 6.))
+
+
+def test_roi_clipped_and_truncated(image):
+    roi = RoiBinning(np.arange(12.), np.arange(8.), roi=(7, 5, 100, 0), binning=(2, 2))
+    assert roi.roi == (7, 5, 4, 2)  # up to the edges, truncated to a multiple of the binning
+    assert roi.reduce(image).shape == (1, 2)
+    assert RoiBinning(np.arange(12.), np.arange(8.), roi=(20, 0, 4, 4)).shape == (4, 0)
+
+
+def test_identity(image):
+    roi = RoiBinning(np.arange(12.), np.arange(8.))
+    assert roi.identity and roi.roi == (0, 0, 12, 8)
+    assert np.shares_memory(roi.reduce(image), image)
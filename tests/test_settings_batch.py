@@ -0,0 +1,57 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+from pymodaq_gui.parameter import Parameter
+
+from pymodaq_plugins_template.hardware.settings_batch import SettingsBatch, settings_batch_params
+
+
+def settings() -> Parameter:
+    return Parameter.create(name='settings', type='group', children=[
+        {'name': 'exposure', 'type': 'float', 'value': 1.},
+        {'name': 'gain', 'type': 'int', 'value': 0},
+    ] + settings_batch_params())
+
+
+def test_changes_are_merged_and_applied_once(qtbot):
+    params = settings()
+    batches = []
+    batch = SettingsBatch(lambda changed: batches.append([(param.name(), param.value()) for param in changed]),
+                          window=0.02)
+    for value in range(10):  # dragging a spinbox
+        params.child('gain').setValue(value)
+        batch.submit(params.child('gain'))
+        params.child('exposure').setValue(value / 10)
+        batch.submit(params.child('exposure'))
+    assert batches == []
+    assert batch.merged == 18
+    qtbot.waitUntil(lambda: len(batches) > 0, timeout=1000)
+    assert batches == [[('gain', 9), ('exposure', 0.9)]]  # last values, in the order of the first changes
+    assert batch.batches == 1
+    assert batch.pending == []
+
+
+def test_flush_and_immediate(qtbot):
+    params = settings()
+    batches = []
+    batch = SettingsBatch(lambda changed: batches.append([param.name() for param in changed]), window=10.)
+    batch.submit(params.child('gain'))
+    batch.flush()  # for instance before a grab
+    assert batches == [['gain']]
+    batch.submit(params.child('exposure'))
+    batch.discard()
+    batch.flush()
+    assert batches == [['gain']]
+
+    batch.submit(params.child('exposure'))
+    batch.window = 0.  # the pending change is applied, then each change immediately
+    batch.submit(params.child('gain'))
+    assert batches == [['gain'], ['exposure'], ['gain']]
+
+
+def test_errors_are_reported(qtbot):
+    errors = []
+
+    def apply(changed):
+        raise IOError('no answer')
+    batch = SettingsBatch(apply, window=0., on_error=errors.append)
+    batch.submit(settings().child('gain'))
+    assert len(errors) == 1 and isinstance(errors[0], IOError)
@@ -0,0 +1,48 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import threading
+
+import numpy as np
+
+from pymodaq_plugins_template.hardware.settling import SettlingDetector
+
+
+def test_window_statistics_match_numpy():
+    rng = np.random.default_rng(0)
+    timestamps = np.arange(1000) * 0.01
+    values = 1e4 + 3. * timestamps + rng.normal(0, 0.1, timestamps.size)
+    detector = SettlingDetector(window=50, max_std=1., max_slope=1.)
+    detector._resync_period = 100  # exercise the exact recomputation too
+    detector.extend(values, timestamps)
+    assert np.isclose(detector.std, values[-50:].std())
+    assert np.isclose(detector.slope, np.polyfit(timestamps[-50:], values[-50:], 1)[0])
+
+
+def test_settles_as_soon_as_criterion_is_met():
+    timestamps = np.arange(400) * 0.01
+    values = 100. + 10. * np.exp(-timestamps / 0.3)
+    detector = SettlingDetector(window=20, max_std=0.01, max_slope=0.05)
+    assert not detector.update(values[0], timestamps[0])
+    settled = detector.extend(values[1:], timestamps[1:])
+    first = np.argmax(settled) + 1
+
+    def criterion(last):
+        window = slice(last - 19, last + 1)
+        return values[window].std() <= 0.01 and abs(np.polyfit(timestamps[window], values[window], 1)[0]) <= 0.05
+
+    assert criterion(first) and not criterion(first - 1)
+    assert settled[first - 1:].all() and not settled[:first - 1].any()
+    assert detector.settled
+
+    detector.update(200., timestamps[-1] + 0.01)  # a step unsettles immediately
+    assert not detector.settled
+    detector.reset()
+    assert np.isnan(detector.std) and not detector.settled
+
+
+def test_wait():
+    detector = SettlingDetector(window=3)
+    assert not detector.wait(0.01)
+    thread = threading.Thread(target=detector.extend, args=([1., 1., 1.], [0., 1., 2.]))
+    thread.start()
+    assert detector.wait(1.)
+    thread.join()
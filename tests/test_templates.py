@@ -0,0 +1,135 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import time
+
+import numpy as np
+import pytest
+
+from pymodaq.utils.data import Axis, DataActuator
+
+from pymodaq_gui.plotting.items.roi import RoiInfo
+
+from benchmarks.simulated_plugins import (load_template, SimulatedCamera, SimulatedStage, MOVE_TEMPLATE,
+                                          VIEWER_0D_TEMPLATE, VIEWER_1D_TEMPLATE, VIEWER_2D_TEMPLATE)
+from pymodaq_plugins_template.hardware.connection_pool import controller_pool
+
+
+class SilentInstrument:
+    """Instrument in continuous output mode that never outputs anything"""
+
+    def __init__(self, *args):
+        self.is_open = True
+
+    def open_communication(self):
+        pass
+
+    def a_method_or_atttribute_to_check_if_init(self) -> bool:
+        return self.is_open
+
+    def your_method_to_select_the_address(self, address: int):
+        pass
+
+    def your_method_to_start_continuous_output(self):
+        pass
+
+    def your_method_to_read_the_output_stream(self) -> bytes:
+        time.sleep(0.005)
+        return b''  # neither frames (0D) nor readings (1D)
+
+    def your_method_to_get_the_x_axis(self) -> np.ndarray:
+        return np.arange(10.)
+
+    def your_method_to_stop_continuous_output(self):
+        pass
+
+    def your_method_to_terminate_the_communication(self):
+        self.is_open = False
+
+
+@pytest.fixture
+def viewer_0D(qapp):
+    controller_pool.linger = 0.
+    plugin = load_template(VIEWER_0D_TEMPLATE, SilentInstrument).DAQ_0DViewer_Template(None, None)
+    plugin.settings.child('acquisition_mode').setValue('Continuous')
+    plugin.settings.child('streaming', 'grab_timeout').setValue(20)
+    plugin.ini_detector()
+    yield plugin
+    plugin.close()
+
+
+def test_0D_grab_from_silent_stream_emits(viewer_0D):
+    emitted = []
+    viewer_0D.dte_signal.connect(emitted.append)
+    viewer_0D.grab_data()
+    assert len(emitted) == 1  # the viewer waits for an emission before grabbing again
+    mean, std, stable, settled = emitted[0][0]
+    assert np.isnan(mean[0]) and stable[0] == 0. and settled[0] == 0.
+
+
+def test_1D_trace_grab_from_silent_stream_emits(qapp):
+    plugin = load_template(VIEWER_1D_TEMPLATE, SilentInstrument).DAQ_1DViewer_Template(None, None)
+    plugin.settings.child('time_trace', 'trace_enabled').setValue(True)
+    plugin.settings.child('time_trace', 'max_latency').setValue(10)
+    plugin.settings.child('time_trace', 'grab_timeout').setValue(20)
+    plugin.ini_detector()
+    emitted = []
+    plugin.dte_signal.connect(emitted.append)
+    try:
+        plugin.grab_data()
+    finally:
+        plugin.close()
+    assert len(emitted) == 1
+    assert np.isnan(emitted[0][0][0]).all()
+    assert plugin.trace_axis.label == 'Time' and plugin.x_axis.label != 'Time'  # the spectral axis is kept
+
+
+def test_1D_decimator_follows_preset_settings(qapp):
+    plugin = load_template(VIEWER_1D_TEMPLATE, SilentInstrument).DAQ_1DViewer_Template(None, None)
+    with plugin.settings.treeChangeBlocker():  # as values loaded from a preset, not committed
+        plugin.settings.child('display', 'method').setValue('mean')
+        plugin.settings.child('display', 'max_points').setValue(100)
+    plugin.ini_detector()
+    plugin.close()
+    assert (plugin.decimator.method, plugin.decimator.max_points) == ('mean', 100)
+
+
+def test_2D_roi_select_updates_the_roi_once(qapp):
+    plugin = load_template(VIEWER_2D_TEMPLATE, SimulatedCamera).DAQ_2DViewer_Template(None, None)
+    plugin.settings.child('roi', 'follow_roi_select').setValue(True)
+    plugin.x_axis = Axis(data=np.arange(32.), index=1)
+    plugin.y_axis = Axis(data=np.arange(16.), index=0)
+    changes = []
+    plugin.settings.sigTreeStateChanged.connect(lambda param, tree_changes: changes.append(tree_changes))
+    updates = []
+    update_roi = plugin.update_roi
+    plugin.update_roi = lambda: updates.append(update_roi())
+    plugin.roi_select(RoiInfo(origin=(2., 4.), size=(3., 5.)))
+    assert len(changes) == 1 and len(changes[0]) == 4 and len(updates) == 1
+    assert plugin.roi.roi == (4, 2, 6, 4)
+
+
+@pytest.fixture
+def stage(qapp):
+    controller_pool.linger = 0.
+    plugin = load_template(MOVE_TEMPLATE, SimulatedStage).DAQ_Move_Template(None, None)
+    yield plugin
+    plugin.close()
+
+
+def test_adaptive_polling_follows_preset_settings(stage):
+    with stage.settings.treeChangeBlocker():
+        stage.settings.child('completion', 'min_interval').setValue(20.)
+        stage.settings.child('completion', 'max_interval').setValue(200.)
+        stage.settings.child('completion', 'backoff').setValue(1.5)
+    stage.ini_stage()
+    assert (stage.polling.min_interval, stage.polling.max_interval, stage.polling.backoff) == (0.02, 0.2, 1.5)
+
+
+def test_move_done_at_once_when_not_polling(stage):
+    stage.settings.child('completion', 'completion_mode').setValue('Events')
+    stage.ini_stage()
+    done = []
+    stage.move_done_signal.connect(done.append)
+    stage.ispolling = False
+    stage.target_value = DataActuator(data=0., units=stage.axis_unit)
+    stage.poll_moving()
+    assert len(done) == 1 and not stage._events_timer.isActive()
@@ -0,0 +1,29 @@
+# todo: replace here *pymodaq_plugins_template* by your plugin package name
+import pytest
+from pymodaq_data import Q_
+
+from pymodaq_plugins_template.hardware.unit_conversion import AxisConversion, unit_factor
+
+
+def test_unit_factor():
+    assert unit_factor('mm', 'mm') == (1., 0.)
+    assert unit_factor('', 'mm') == (1., 0.)
+    assert unit_factor('um', 'mm') == pytest.approx((1e-3, 0.))
+    factor, offset = unit_factor('degC', 'K')
+    assert 20. * factor + offset == pytest.approx(Q_(20., 'degC').m_as('K'))
+
+
+def test_axis_conversion():
+    conversion = AxisConversion('mm', scaling=2., offset=0.5)
+    assert conversion.to_controller(3.) == pytest.approx(3. / 2. + 0.5)  # as set_position_with_scaling
+    assert conversion.from_controller(conversion.to_controller(3.)) == pytest.approx(3.)
+    assert conversion.to_controller(3000., 'um') == pytest.approx(2.)
+    assert conversion.relative_to_controller(1000., 'um') == pytest.approx(0.5)  # no offset for relative moves
+    assert conversion.to_axis(1., 'cm') == pytest.approx(10.)
+
+
+def test_relative_values_without_offset():
+    conversion = AxisConversion('degC')
+    assert conversion.to_axis(274.15, 'K') == pytest.approx(1.)
+    assert conversion.relative_to_axis(1., 'K') == pytest.approx(1.)  # a delta of 1 K is a delta of 1 degC
+    assert conversion.relative_to_controller(1., 'K') == pytest.approx(1.)